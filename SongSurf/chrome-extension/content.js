@@ -18,6 +18,7 @@ console.log('🎵 [SongSurf] Extension simplifiée chargée');
 const CONFIG = {
   serverUrl: 'http://localhost:8080',
   statusPollInterval: 1000, // 1 seconde
+  extractionPollInterval: 300, // Résultat d'une extraction de métadonnées
   debug: true,
 };
 
@@ -88,11 +89,34 @@ async function extractMetadata(url, timeoutMs = 30000) {
       setTimeout(() => reject(new Error('timeout')), timeoutMs)
     );
     
-    const fetchPromise = fetch(`${CONFIG.serverUrl}/api/extract-metadata`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ url })
-    }).then(response => response.json());
+    const fetchPromise = (async () => {
+      // Le serveur répond tout de suite avec un identifiant d'extraction...
+      const response = await fetch(`${CONFIG.serverUrl}/api/extract-metadata`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ url })
+      });
+      const submitted = await response.json();
+      if (!submitted.success || !submitted.extraction_id) {
+        return submitted;
+      }
+      
+      // ...puis on interroge l'extraction jusqu'à son résultat
+      const deadline = Date.now() + timeoutMs;
+      while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, CONFIG.extractionPollInterval));
+        const extraction = await fetch(
+          `${CONFIG.serverUrl}/api/extract-metadata/${submitted.extraction_id}`
+        ).then(r => r.json());
+        if (extraction.state === 'done') {
+          return extraction.result;
+        }
+        if (extraction.success === false) {
+          return extraction;
+        }
+      }
+      throw new Error('timeout');
+    })();
     
     // Course entre le fetch et le timeout
     const result = await Promise.race([fetchPromise, timeoutPromise]);
@@ -173,6 +197,7 @@ async function pingServer() {
 // ============================================
 
 let statusPollingInterval = null;
+let statusEventSource = null;
 let widgetPosition = null; // Sauvegarder la position du widget (persistante entre les recréations)
 
 // Rendre un élément déplaçable
@@ -525,8 +550,8 @@ function showPlaylistConfirmation(playlistData, url) {
       
       if (result.success) {
         showStatus(`✅ ${result.added} chansons ajoutées à la queue`, 'success');
-        // Démarrer le polling du statut
-        startStatusPolling();
+        // Suivre le statut en temps réel
+        startStatusUpdates();
       } else {
         showError(result.error || 'Erreur lors du téléchargement de la playlist');
       }
@@ -678,6 +703,7 @@ function showMetadataForm(metadata) {
       artist: document.getElementById('meta-artist').value,
       album: document.getElementById('meta-album').value,
       year: document.getElementById('meta-year').value,
+      duration: metadata.duration || 0, // Estimation de l'espace disque côté serveur
     };
     confirmDownload(window.location.href, updatedMetadata);
   });
@@ -1135,8 +1161,8 @@ async function confirmDownload(url, metadata) {
   
   log('✅', 'Téléchargement démarré');
   
-  // Démarrer le polling du statut
-  startStatusPolling();
+  // Suivre le statut en temps réel
+  startStatusUpdates();
 }
 
 function updateProgressDetails(progress) {
@@ -1183,30 +1209,111 @@ function updateProgressDetails(progress) {
   `;
 }
 
-function startStatusPolling() {
+function handleStatus(status) {
+  if (status.in_progress && status.current_download) {
+    updateProgressDetails({
+      current_song: status.current_download,
+      queue_remaining: status.queue_size || 0
+    });
+  } else if (!status.in_progress && status.queue_size === 0) {
+    // Téléchargement terminé
+    stopStatusUpdates();
+    if (status.last_completed) {
+      showSuccess(status.last_completed);
+    }
+  } else if (status.last_error) {
+    stopStatusUpdates();
+    showError(status.last_error.error);
+  }
+}
+
+function stopStatusUpdates() {
   if (statusPollingInterval) {
     clearInterval(statusPollingInterval);
+    statusPollingInterval = null;
+  }
+  if (statusEventSource) {
+    statusEventSource.close();
+    statusEventSource = null;
   }
+}
+
+function startStatusPolling() {
+  stopStatusUpdates();
   
   statusPollingInterval = setInterval(async () => {
+    handleStatus(await getStatus());
+  }, CONFIG.statusPollInterval);
+}
+
+// Suivi en temps réel via /events (Server-Sent Events), polling en secours
+function startStatusUpdates() {
+  stopStatusUpdates();
+  
+  if (typeof EventSource === 'undefined') {
+    startStatusPolling();
+    return;
+  }
+  
+  const source = new EventSource(`${CONFIG.serverUrl}/events`);
+  statusEventSource = source;
+  let currentSong = null;
+  
+  source.addEventListener('status', (e) => {
+    const status = JSON.parse(e.data);
+    currentSong = status.current_download;
+    handleStatus(status);
+  });
+  
+  source.addEventListener('job_started', (e) => {
+    const event = JSON.parse(e.data);
+    currentSong = { job_id: event.job_id, metadata: event.metadata };
+    updateProgressDetails({ current_song: currentSong, queue_remaining: event.queue_size || 0 });
+  });
+  
+  // Fin d'un job : un autre worker peut encore en traiter un, seul /status
+  // dit si plus rien n'est en cours ni en attente (comme le polling)
+  source.addEventListener('job_completed', async () => {
     const status = await getStatus();
-    
-    if (status.in_progress && status.current_download) {
-      updateProgressDetails({
-        current_song: status.current_download,
-        queue_remaining: status.queue_size || 0
-      });
-    } else if (!status.in_progress && status.queue_size === 0) {
-      // Téléchargement terminé
-      clearInterval(statusPollingInterval);
-      if (status.last_completed) {
-        showSuccess(status.last_completed);
-      }
-    } else if (status.last_error) {
-      clearInterval(statusPollingInterval);
-      showError(status.last_error.error);
+    if (statusEventSource === source) {
+      handleStatus(status);
     }
-  }, CONFIG.statusPollInterval);
+  });
+  
+  source.addEventListener('job_failed', async (e) => {
+    const event = JSON.parse(e.data);
+    // Job d'une autre session : ignoré
+    if (!currentSong || event.job_id !== currentSong.job_id) {
+      return;
+    }
+    const status = await getStatus();
+    if (statusEventSource !== source) {
+      return;
+    }
+    if (!status.in_progress && status.queue_size === 0) {
+      stopStatusUpdates();
+      showError(event.error);
+    } else if (status.in_progress) {
+      // Un morceau d'une playlist a échoué : la suite continue
+      handleStatus(status);
+    }
+  });
+  
+  source.addEventListener('job_cancelled', (e) => {
+    const event = JSON.parse(e.data);
+    if (currentSong && event.job_id === currentSong.job_id) {
+      stopStatusUpdates();
+      showError(event.error || 'Téléchargement annulé');
+    }
+  });
+  
+  source.onerror = () => {
+    // Serveur sans /events ou connexion perdue : revenir au polling
+    if (source.readyState === EventSource.CLOSED || !currentSong) {
+      log('⚠️', 'Flux /events indisponible, retour au polling');
+      startStatusPolling();
+    }
+  };
 }
 
 // ============================================
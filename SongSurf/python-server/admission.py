@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+admission.py - Contrôle d'admission selon l'espace disque
+
+FONCTIONNALITÉ:
+  - Surveille l'espace libre de temp/ et de music/ (même volume ou non)
+  - Estime la taille d'un job à partir de sa durée (métadonnées extraites)
+  - Refuse les nouveaux jobs quand la queue ne tiendrait plus sur le disque
+  - Met le worker en pause tant que le prochain job ne tient pas ; la
+    pause est enregistrée dans la queue partagée (kv) pour que /status la
+    voie aussi quand les workers sont des processus séparés (serve.py)
+"""
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+
+# Workers en pause faute d'espace disque : {worker: raison} (valeur partagée de la queue)
+PAUSED_KEY = 'admission:paused'
+
+class DiskAdmission:
+    """Décide si un job peut entrer dans la queue ou démarrer"""
+
+    RAW_BYTES_PER_SECOND = 32 * 1024   # Flux audio YouTube (opus/m4a, ≤ 256 kbps)
+    MP3_BYTES_PER_SECOND = 40 * 1024   # MP3 VBR V0 (borne haute : 320 kbps)
+    EXTRA_BYTES = 1024 * 1024          # Pochette, tags ID3
+    DEFAULT_DURATION = 600             # Durée inconnue : on compte 10 minutes
+
+    def __init__(self, temp_dir, music_dir, min_free_bytes=0, cache_seconds=5, store=None):
+        """
+        Args:
+            temp_dir: Dossier temporaire
+            music_dir: Dossier de la bibliothèque
+            min_free_bytes (int): Espace à toujours laisser libre sur chaque volume
+            cache_seconds (float): Durée de validité de la mesure d'espace libre
+            store (JobStore): Queue partagée où les pauses des workers sont
+                enregistrées (None : seulement en mémoire)
+        """
+        self.temp_dir = Path(temp_dir)
+        self.music_dir = Path(music_dir)
+        self.min_free_bytes = min_free_bytes
+        self.cache_seconds = cache_seconds
+        self.same_volume = os.stat(self.temp_dir).st_dev == os.stat(self.music_dir).st_dev
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self.store = store
+        self._paused = {}  # Dernier état enregistré des workers de ce processus : {worker: raison ou None}
+
+    def estimate(self, metadata):
+        """
+        Estime l'espace nécessaire à un job
+
+        Returns:
+            dict: {temp, music} en octets (temp = audio brut + MP3 pendant la conversion)
+        """
+        try:
+            duration = float((metadata or {}).get('duration') or 0)
+        except (TypeError, ValueError):
+            duration = 0
+        if duration <= 0:
+            duration = self.DEFAULT_DURATION
+        mp3 = int(duration * self.MP3_BYTES_PER_SECOND) + self.EXTRA_BYTES
+        raw = int(duration * self.RAW_BYTES_PER_SECOND)
+        return {'temp': raw + mp3, 'music': mp3}
+
+    def free_space(self):
+        """Espace libre (octets) sur les volumes de temp/ et music/, mis en cache quelques secondes"""
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached_at > self.cache_seconds:
+                self._cached = {
+                    'temp': shutil.disk_usage(self.temp_dir).free,
+                    'music': shutil.disk_usage(self.music_dir).free,
+                }
+                self._cached_at = now
+            return dict(self._cached)
+
+    def _fits(self, needed):
+        """Compare un besoin {temp, music} à l'espace libre (marge comprise)"""
+        free = self.free_space()
+        if self.same_volume:
+            available = free['music'] - self.min_free_bytes
+            required = needed['temp'] + needed['music']
+            return required <= available, {
+                'same_volume': True,
+                'free_bytes': free['music'],
+                'required_bytes': required,
+                'min_free_bytes': self.min_free_bytes,
+            }
+
+        ok_temp = needed['temp'] <= free['temp'] - self.min_free_bytes
+        ok_music = needed['music'] <= free['music'] - self.min_free_bytes
+        return ok_temp and ok_music, {
+            'same_volume': False,
+            'temp_free_bytes': free['temp'],
+            'music_free_bytes': free['music'],
+            'temp_required_bytes': needed['temp'],
+            'music_required_bytes': needed['music'],
+            'min_free_bytes': self.min_free_bytes,
+        }
+
+    def can_admit(self, metadata, committed=()):
+        """
+        Un nouveau job peut-il entrer dans la queue ?
+
+        Args:
+            metadata (dict): Métadonnées du nouveau job (avec 'duration')
+            committed (iterable): Métadonnées des jobs déjà en attente ou en cours
+
+        Returns:
+            tuple: (bool, détails)
+        """
+        needed = self.estimate(metadata)
+        for other in committed:
+            estimate = self.estimate(other)
+            needed['temp'] += estimate['temp']
+            needed['music'] += estimate['music']
+        return self._fits(needed)
+
+    def can_dispatch(self, metadata, worker='worker'):
+        """Le job peut-il démarrer maintenant ? Met le worker en pause ou l'en sort."""
+        ok, details = self._fits(self.estimate(metadata))
+        self._set_paused(worker, None if ok else 'Espace disque insuffisant pour le prochain job')
+        return ok, details
+
+    def resume(self, worker='worker'):
+        """Plus de job à démarrer : le worker n'est plus en pause"""
+        self._set_paused(worker, None)
+
+    def _set_paused(self, worker, reason):
+        """Enregistre la pause d'un worker (écriture dans la queue seulement si elle change)"""
+        with self._lock:
+            # Premier appel : toujours écrit (pause laissée par un processus précédent du même worker)
+            if worker in self._paused and self._paused[worker] == reason:
+                return
+            self._paused[worker] = reason
+        if self.store is not None:
+            def change(paused):
+                if reason is None:
+                    paused.pop(worker, None)
+                else:
+                    paused[worker] = reason
+                return paused
+            self.store.update_value(PAUSED_KEY, change, {})
+
+    def paused_workers(self):
+        """Workers en pause faute d'espace disque : {worker: raison}"""
+        if self.store is not None:
+            return self.store.get_value(PAUSED_KEY) or {}
+        with self._lock:
+            return {worker: reason for worker, reason in self._paused.items() if reason is not None}
+
+    def status(self):
+        """Résumé pour /status (pauses décidées par tous les workers)"""
+        free = self.free_space()
+        paused = self.paused_workers()
+        return {
+            'paused': bool(paused),
+            'reason': next(iter(paused.values()), None),
+            'paused_workers': sorted(paused),
+            'same_volume': self.same_volume,
+            'temp_free_bytes': free['temp'],
+            'music_free_bytes': free['music'],
+            'min_free_bytes': self.min_free_bytes,
+        }
@@ -10,9 +10,10 @@ FONCTIONNALITÉ:
   - Retourne le statut en temps réel
   
 UTILISATION:
-  python app.py
+  python app.py        (développement : API + worker dans le même processus)
+  python serve.py      (production : API multi-threads + processus workers)
   
-  Le serveur démarre sur http://localhost:5000
+  Le serveur démarre sur http://localhost:8080
 """
 
 # Fix pour l'encodage Windows
@@ -22,18 +23,53 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
 from flask_cors import CORS
 from pathlib import Path
 from datetime import datetime
+import hmac
+import json
 import threading
 import time
-import queue
-from collections import deque
+import tracemalloc
+import uuid
+from functools import wraps
 
 # Import des modules
+from config import (
+    TEMP_DIR, MUSIC_DIR, STATE_DIR, ARTIST_PHOTOS_DIR, JOBS_DB, HOST, PORT,
+    MAX_QUEUE_SIZE, CONNECTIONS_PER_DOWNLOAD, MAX_CONNECTIONS,
+    TEMP_ORPHAN_MAX_AGE, TEMP_BUDGET_BYTES, JANITOR_INTERVAL, MIN_FREE_BYTES, LIBRARY_SCAN_WORKERS,
+    EVENTS_MIN_INTERVAL, EVENTS_KEEPALIVE, EVENT_RELAY_INTERVAL,
+    EXTRACTION_WORKERS, MAX_PENDING_EXTRACTIONS, EXTRACTION_RESULT_TTL,
+    STALL_TIMEOUT, WORKER_HEARTBEAT_TIMEOUT,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN, BREAKER_MAX_COOLDOWN,
+    GLOBAL_RATE_LIMIT, JOB_RATE_LIMIT, BULK_RATE_LIMIT, OFF_PEAK_WINDOWS, BULK_OFF_PEAK_ONLY,
+    ADMIN_TOKEN, PROFILES_DIR, PROFILE_INTERVAL, PROFILE_MAX_DURATION, PROFILE_RESULT_GRACE, TRACEMALLOC_FRAMES, PROFILES_KEEP,
+    PROFILING_POLL_INTERVAL, LOG_LEVEL, LOG_FORMAT, SEARCH_DB, SEARCH_REFRESH_INTERVAL, SEARCH_MAX_PER_PAGE,
+    CORRECTIONS_DIR, CORRECTION_WORKERS,
+    log_message
+)
+from logs import setup_logging
 from downloader import YouTubeDownloader
 from organizer import MusicOrganizer
+from corrections import BulkCorrections
+from job_store import JobStore, QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED, TERMINAL_STATES
+from janitor import TempJanitor
+from admission import DiskAdmission, PAUSED_KEY as ADMISSION_PAUSED_KEY
+from events import EventBus, StoreEventRelay, format_sse
+from extraction import ExtractionQueue
+from engine import Engine
+from retry_policy import CircuitBreaker
+from bandwidth import BandwidthPolicy
+from concurrency import KEY as CONCURRENCY_KEY
+from metrics import MetricsRegistry, StoreMetrics, label_key, merge_states, render as render_metrics
+from tracing import stage_durations
+from library_index import LibraryIndex
+from profiling import (
+    ProfilingAgent, issue_command, find_command, command_results, prune_profiles,
+    collapsed_stacks, pstats_data, top_functions, memory_diff
+)
 
 # ============================================
 # CONFIGURATION
@@ -51,58 +87,238 @@ CORS(app, resources={
     }
 })
 
-# Dossiers
-# Détecter si on est dans Docker (chemin /app) ou en local
-if Path(__file__).parent == Path('/app'):
-    # Docker: utiliser /data
-    TEMP_DIR = Path('/data/temp')
-    MUSIC_DIR = Path('/data/music')
-else:
-    # Local: utiliser ../temp et ../music
-    BASE_DIR = Path(__file__).parent.parent
-    TEMP_DIR = BASE_DIR / "temp"
-    MUSIC_DIR = BASE_DIR / "music"
-
-# Créer les dossiers s'ils n'existent pas
-TEMP_DIR.mkdir(parents=True, exist_ok=True)
-MUSIC_DIR.mkdir(parents=True, exist_ok=True)
-
-# Dossier pour les photos d'artistes (dans le dossier music à la racine)
-ARTIST_PHOTOS_DIR = MUSIC_DIR / "artist_photos"
-ARTIST_PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
-
-print(f"📁 Temp: {TEMP_DIR}")
-print(f"📁 Music: {MUSIC_DIR}")
-print(f"📁 Artist Photos: {ARTIST_PHOTOS_DIR}")
+# Logs structurés : écrits par un thread dédié, jamais dans le thread de la requête
+setup_logging(LOG_LEVEL, LOG_FORMAT, process='api')
+
+log_message('DEBUG', f"📁 Temp: {TEMP_DIR}")
+log_message('DEBUG', f"📁 Music: {MUSIC_DIR}")
+log_message('DEBUG', f"📁 State: {STATE_DIR}")
+log_message('DEBUG', f"📁 Artist Photos: {ARTIST_PHOTOS_DIR}")
 
 # Instances
-downloader = YouTubeDownloader(TEMP_DIR, MUSIC_DIR)
-organizer = MusicOrganizer(MUSIC_DIR)
-
-# Système de queue
-MAX_QUEUE_SIZE = 50  # Augmenté pour supporter les gros albums
-download_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
-queue_lock = threading.Lock()
-cancel_flag = threading.Event()
-
-# État global
-download_status = {
-    'in_progress': False,
-    'current_download': None,
-    'last_completed': None,
-    'last_error': None,
-    'progress': None,
-    'queue_size': 0,
-    'queue_position': 0
-}
-
-# Logs simplifiés (console uniquement)
-def log_message(level, message, data=None):
-    """Affiche un message dans la console"""
-    emoji = {'INFO': 'ℹ️', 'WARNING': '⚠️', 'ERROR': '❌', 'SUCCESS': '✅'}.get(level, '📝')
-    print(f"{emoji} [{level}] {message}")
-    if data:
-        print(f"   Data: {data}")
+downloader = YouTubeDownloader(
+    TEMP_DIR, MUSIC_DIR,
+    connections_per_download=CONNECTIONS_PER_DOWNLOAD,
+    max_connections=MAX_CONNECTIONS
+)
+organizer = MusicOrganizer(MUSIC_DIR, scan_workers=LIBRARY_SCAN_WORKERS)
+
+# Corrections de featuring en lots transactionnels (journal repris au démarrage)
+bulk_corrections = BulkCorrections(organizer, CORRECTIONS_DIR, workers=CORRECTION_WORKERS)
+
+# Système de queue (persistante, partagée avec les workers : survit aux redémarrages)
+job_store = JobStore(JOBS_DB)
+job_available = threading.Event()  # Réveille le worker intégré quand un job est ajouté
+
+# Nettoyage automatique de temp/ (chaque job travaille dans temp/<job_id>/)
+janitor = TempJanitor(
+    TEMP_DIR, job_store.active_ids,
+    max_age=TEMP_ORPHAN_MAX_AGE,
+    budget_bytes=TEMP_BUDGET_BYTES,
+    interval=JANITOR_INTERVAL
+)
+
+# Contrôle d'admission selon l'espace disque (temp/ et music/)
+admission = DiskAdmission(TEMP_DIR, MUSIC_DIR, min_free_bytes=MIN_FREE_BYTES, store=job_store)
+
+# Disjoncteur partagé par les workers (suspend la distribution après trop d'échecs)
+breaker = CircuitBreaker(
+    job_store,
+    failure_threshold=BREAKER_FAILURE_THRESHOLD,
+    cooldown=BREAKER_COOLDOWN,
+    max_cooldown=BREAKER_MAX_COOLDOWN
+)
+
+# Plafonds de débit (global partagé, par job, heures creuses pour les albums)
+bandwidth = BandwidthPolicy(
+    global_limit=GLOBAL_RATE_LIMIT,
+    job_limit=JOB_RATE_LIMIT,
+    bulk_limit=BULK_RATE_LIMIT,
+    off_peak_windows=OFF_PEAK_WINDOWS,
+    bulk_off_peak_only=BULK_OFF_PEAK_ONLY
+)
+
+# Événements temps réel (/events) : relayés depuis la queue persistante
+event_bus = EventBus(min_interval=EVENTS_MIN_INTERVAL)
+event_relay = StoreEventRelay(job_store, event_bus, interval=EVENT_RELAY_INTERVAL, running_state=RUNNING)
+
+# Métriques (/metrics) : celles des workers sont cumulées dans la queue persistante,
+# celles du serveur API (parcours de la bibliothèque) restent en mémoire
+worker_metrics = StoreMetrics(job_store)
+api_metrics = MetricsRegistry()
+
+# Recherche dans la bibliothèque (/api/search) : index mis à jour après chaque téléchargement
+try:
+    search_index = LibraryIndex(SEARCH_DB, MUSIC_DIR, workers=LIBRARY_SCAN_WORKERS,
+                                refresh_interval=SEARCH_REFRESH_INTERVAL, bus=event_bus)
+except RuntimeError as e:
+    search_index = None
+    log_message('WARNING', f"⚠️ Recherche indisponible: {e}")
+
+# Profilage à la demande (/admin/profiling) : les workers séparés ont chacun leur agent
+profiling_agent = ProfilingAgent(job_store, 'api', PROFILES_DIR, poll_interval=PROFILING_POLL_INTERVAL)
+
+# Les erreurs antérieures à cette date ne sont plus affichées (/cleanup)
+errors_cleared_at = ''
+
+def new_job_id():
+    """Identifiant court et unique d'un job de téléchargement"""
+    return uuid.uuid4().hex[:12]
+
+
+def queue_size():
+    """Nombre de jobs en attente (hors annulations pas encore écartées)"""
+    return job_store.count(QUEUED, cancelled=False)
+
+
+def queue_full():
+    return queue_size() >= MAX_QUEUE_SIZE
+
+
+def enqueue_job(job):
+    """Enregistre un job dans la queue persistante et réveille le worker"""
+    job_store.add(job)
+    job_available.set()
+    publish_job_event('job_queued', job['id'], metadata=job['metadata'], playlist_info=job.get('playlist_info'))
+
+
+def admin_required(view):
+    """Réserve un endpoint à l'administrateur (jeton ADMIN_TOKEN ou machine locale)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+        else:
+            allowed = request.remote_addr in ('127.0.0.1', '::1')
+        if not allowed:
+            return jsonify({'success': False, 'error': 'Accès réservé à l\'administrateur'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def committed_metadata():
+    """Métadonnées des jobs en attente ou en cours (espace disque déjà promis)"""
+    return [job['metadata'] for job in job_store.list(states=(QUEUED, RUNNING))]
+
+
+def build_status():
+    """
+    Statut complet (téléchargements en cours, queue, disque) pour /status et /events
+    
+    Tout est lu dans la queue persistante : les workers peuvent tourner dans
+    d'autres processus.
+    """
+    running = job_store.list(states=(RUNNING,))
+    current = running[0] if running else None
+    
+    status = {
+        'in_progress': current is not None,
+        'current_download': None,
+        'running': [{
+            'job_id': job['id'],
+            'url': job['url'],
+            'metadata': job['metadata'],
+            'stage': job['stage'],
+            'worker': job['worker'],
+            'progress': job['progress']
+        } for job in running],
+        'last_completed': None,
+        'last_error': None,
+        'progress': None,
+        'queue_size': queue_size(),
+        'queue_position': 0
+    }
+    
+    if current is not None:
+        status['current_download'] = {
+            'job_id': current['id'],
+            'url': current['url'],
+            'metadata': current['metadata'],
+            'stage': current['stage'],
+            'worker': current['worker']
+        }
+        # Progression écrite par le worker du job (pas encore de ligne : rien à afficher)
+        status['progress'] = current['progress'] or {}
+    
+    completed = job_store.latest((COMPLETED,))
+    if completed is not None:
+        status['last_completed'] = {
+            'job_id': completed['id'],
+            'success': True,
+            'file_path': completed['final_path'],
+            'metadata': completed['metadata'],
+            'timestamp': completed['updated_at']
+        }
+    
+    # Dernière erreur : seulement si c'est le dernier job terminé
+    last = job_store.latest(TERMINAL_STATES)
+    if last is not None and last['state'] != COMPLETED and last['updated_at'] > errors_cleared_at:
+        status['last_error'] = {
+            'job_id': last['id'],
+            'error': last['error'],
+            'cancelled': last['state'] == CANCELLED,
+            'metadata': last['metadata'],
+            'timestamp': last['updated_at']
+        }
+    
+    # Ajouter les détails de la queue pour le dashboard
+    status['queue'] = job_store.list(states=(QUEUED,), cancelled=False)
+    
+    # Espace disque (pause du worker si insuffisant)
+    status['disk'] = admission.status()
+    
+    # Disjoncteur (distribution suspendue après trop d'échecs)
+    status['breaker'] = breaker.status()
+    
+    # Plafonds de débit et heures creuses
+    status['bandwidth'] = bandwidth.status()
+    
+    # Concurrence adaptative (serve.py --adaptive) : limite et dernières mesures
+    status['concurrency'] = job_store.get_value(CONCURRENCY_KEY)
+    
+    return status
+
+
+def publish_job_event(event_type, job_id, **data):
+    """Publie un événement de cycle de vie d'un job (relayé sur /events)"""
+    job_store.add_event(event_type, {
+        'job_id': job_id,
+        'queue_size': queue_size(),
+        'timestamp': datetime.now().isoformat(),
+        **data
+    })
+
+
+def library_changed():
+    """Bibliothèque modifiée par l'API (déplacement, renommage) : mettre à jour l'index de recherche"""
+    if search_index is not None:
+        search_index.request_refresh()
+
+
+def extraction_done(extraction):
+    """Journalise une extraction terminée et la pousse sur /events"""
+    result = extraction['result']
+    if not result.get('success'):
+        log_message('ERROR', f'❌ Échec extraction: {result.get("error")}', {'extraction_id': extraction['id']})
+    elif extraction['kind'] == 'playlist':
+        log_message('SUCCESS', f'✅ Playlist/Album extrait: {result["total_songs"]} chansons', {
+            'title': result['title'],
+            'artist': result['artist'],
+            'total_songs': result['total_songs']
+        })
+    else:
+        log_message('SUCCESS', f'✅ Métadonnées extraites', result['metadata'])
+    event_bus.publish('metadata_extracted', extraction)
+
+
+extractions = ExtractionQueue(
+    downloader,
+    max_workers=EXTRACTION_WORKERS,
+    max_pending=MAX_PENDING_EXTRACTIONS,
+    result_ttl=EXTRACTION_RESULT_TTL,
+    on_done=extraction_done
+)
+
 
 # ============================================
 # ROUTES
@@ -124,21 +340,138 @@ def ping():
     })
 
 
+@app.route('/health', methods=['GET'])
+def health():
+    """
+    État de santé du moteur de téléchargement
+    
+    Un worker est vivant si son dernier battement de cœur date de moins de
+    WORKER_HEARTBEAT_TIMEOUT secondes ; son job est bloqué s'il n'a pas
+    progressé depuis STALL_TIMEOUT secondes. Répond 503 s'il n'y a aucun
+    worker vivant ou si un job est bloqué.
+    """
+    now = time.time()
+    workers = []
+    for worker in job_store.workers():
+        heartbeat_age = now - (worker['heartbeat_at'] or 0)
+        progress_age = now - worker['progress_at'] if worker['job_id'] and worker['progress_at'] else None
+        workers.append({
+            'name': worker['name'],
+            'pid': worker['pid'],
+            'alive': heartbeat_age < WORKER_HEARTBEAT_TIMEOUT,
+            'heartbeat_age': round(heartbeat_age, 1),
+            'job_id': worker['job_id'],
+            'stage': worker['stage'],
+            'seconds_since_progress': round(progress_age, 1) if progress_age is not None else None,
+            'stalled': progress_age is not None and progress_age > STALL_TIMEOUT,
+            'jobs_done': worker['jobs_done'],
+            'rss_bytes': worker['rss_bytes']
+        })
+    
+    alive = [w for w in workers if w['alive']]
+    stalled = [w['name'] for w in alive if w['stalled']]
+    healthy = bool(alive) and not stalled
+    
+    return jsonify({
+        'status': 'ok' if healthy else 'degraded',
+        'workers_alive': len(alive),
+        'stalled_workers': stalled,
+        'workers': workers,
+        'queue_size': queue_size(),
+        'timestamp': datetime.now().isoformat()
+    }), 200 if healthy else 503
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Métriques au format texte de Prometheus
+    
+      - songsurf_queue_jobs{state} : profondeur de la queue par état
+      - songsurf_jobs_completed_total, songsurf_jobs_failed_total,
+        songsurf_jobs_cancelled_total, songsurf_job_retries_total
+      - songsurf_downloaded_bytes_total
+      - songsurf_stage_duration_seconds{stage} : extract, fetch, transcode, tag, move
+      - songsurf_cover_cache_* : cache des pochettes (requêtes, taux de succès, octets)
+      - songsurf_library_scan_duration_seconds{operation} : stats, structure, search, featuring
+    """
+    counts = job_store.count_by_state()
+    cover = organizer.cover_cache_stats()
+    cover_requests = cover['hits'] + cover['misses']
+    now = time.time()
+    
+    gauges = {
+        'songsurf_queue_jobs': {
+            label_key({'state': state}): counts.get(state, 0)
+            for state in (QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED)
+        },
+        'songsurf_workers': {
+            '': sum(1 for w in job_store.workers() if now - (w['heartbeat_at'] or 0) < WORKER_HEARTBEAT_TIMEOUT)
+        },
+        'songsurf_cover_cache_hit_ratio': {'': cover['hits'] / cover_requests if cover_requests else 0.0},
+        'songsurf_cover_cache_entries': {'': cover['entries']},
+        'songsurf_cover_cache_bytes': {'': cover['bytes']},
+    }
+    
+    # Compteurs présents même à zéro (alertes sur les taux)
+    state = {'counters': {
+        name: {'': 0} for name in (
+            'songsurf_jobs_completed_total', 'songsurf_jobs_failed_total',
+            'songsurf_jobs_cancelled_total', 'songsurf_job_retries_total',
+            'songsurf_downloaded_bytes_total'
+        )
+    }, 'histograms': {}}
+    state['counters']['songsurf_cover_cache_requests_total'] = {
+        label_key({'result': 'hit'}): cover['hits'],
+        label_key({'result': 'miss'}): cover['misses']
+    }
+    merge_states(state, worker_metrics.snapshot())
+    merge_states(state, api_metrics.snapshot())
+    
+    return Response(render_metrics(state, gauges), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/status', methods=['GET'])
 def get_status():
     """Retourne le statut du téléchargement en cours"""
-    with queue_lock:
-        status = download_status.copy()
-        status['queue_size'] = download_queue.qsize()
-        
-        # Ajouter la progression si un téléchargement est en cours
-        if status['in_progress']:
-            status['progress'] = downloader.get_progress()
-        
-        # Ajouter les détails de la queue pour le dashboard
-        status['queue'] = list(download_queue.queue)
-        
-        return jsonify(status)
+    return jsonify(build_status())
+
+
+@app.route('/events', methods=['GET'])
+def events():
+    """
+    Flux d'événements temps réel (Server-Sent Events)
+    
+    Envoie d'abord un événement 'status' (même contenu que /status), puis :
+      - job_queued, job_started, job_stage, job_completed, job_failed,
+        job_cancelled, job_retry : cycle de vie des jobs, envoyés immédiatement
+      - dispatch_paused : disjoncteur ouvert, distribution suspendue
+      - concurrency_changed : limite de jobs simultanés ajustée (mode adaptatif)
+      - progress : dernière progression de chaque job en cours, fusionnée
+        et limitée à EVENTS_MIN_INTERVAL par connexion
+      - metadata_extracted : extraction de métadonnées terminée (résultat inclus)
+    Un commentaire keepalive est envoyé toutes les EVENTS_KEEPALIVE secondes.
+    """
+    subscription = event_bus.subscribe()
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            yield format_sse('status', build_status())
+            while True:
+                batch = subscription.next_batch(timeout=EVENTS_KEEPALIVE)
+                if not batch:
+                    yield ': keepalive\n\n'
+                    continue
+                yield ''.join(format_sse(event_type, data) for event_type, data in batch)
+        finally:
+            # Client déconnecté (GeneratorExit)
+            event_bus.unsubscribe(subscription)
+    
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Désactiver le buffering des proxys (nginx)
+    })
 
 
 @app.route('/download', methods=['POST'])
@@ -152,7 +485,9 @@ def download():
         "artist": "Artist Name",
         "album": "Album Name",
         "title": "Song Title",
-        "year": "2024"
+        "year": "2024",
+        "connections": 4,           (optionnel, plafonné à CONNECTIONS_PER_DOWNLOAD)
+        "rate_limit": 524288        (optionnel, débit maximal du job en octets/s)
     }
     """
     try:
@@ -166,58 +501,81 @@ def download():
             }), 400
         
         # Vérifier si la queue est pleine
-        if download_queue.full():
+        if queue_full():
             return jsonify({
                 'success': False,
                 'error': f'Queue pleine (max {MAX_QUEUE_SIZE} téléchargements)'
             }), 429
         
+        connections = data.get('connections')
+        if connections is not None:
+            try:
+                connections = max(1, int(connections))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'connections doit être un entier'
+                }), 400
+        
+        rate_limit = data.get('rate_limit')
+        if rate_limit is not None:
+            try:
+                rate_limit = max(1, int(rate_limit))
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'rate_limit doit être un entier (octets/s)'
+                }), 400
+        
         url = data['url']
         metadata = {
             'artist': data.get('artist', 'Unknown Artist'),
             'album': data.get('album', 'Unknown Album'),
             'title': data.get('title', 'Unknown Title'),
-            'year': data.get('year', '')
+            'year': data.get('year', ''),
+            'duration': data.get('duration', 0)
         }
         
+        # Vérifier que le job tiendra sur le disque (avec ceux déjà en queue)
+        fits, disk = admission.can_admit(metadata, committed_metadata())
+        if not fits:
+            log_message('WARNING', f"Job refusé: espace disque insuffisant pour {metadata['title']}", disk)
+            return jsonify({
+                'success': False,
+                'status': 'insufficient_storage',
+                'error': 'Espace disque insuffisant pour ce téléchargement',
+                'disk': disk
+            }), 507
+        
         # Ajouter à la queue
-        download_queue.put({
+        job = {
+            'id': new_job_id(),
             'url': url,
             'metadata': metadata,
+            'connections': connections,
+            'rate_limit': rate_limit,
             'added_at': datetime.now().isoformat()
-        })
-        
-        queue_size = download_queue.qsize()
+        }
+        enqueue_job(job)
         
-        print(f"\n{'='*60}")
-        print(f"➕ AJOUTÉ À LA QUEUE (Position {queue_size}/{MAX_QUEUE_SIZE})")
-        print(f"{'='*60}")
-        print(f"URL: {url}")
-        print(f"Artiste: {metadata['artist']}")
-        print(f"Album: {metadata['album']}")
-        print(f"Titre: {metadata['title']}")
-        print(f"Année: {metadata['year']}")
-        print(f"{'='*60}\n")
+        position = queue_size()
         
         # Log
-        log_message('INFO', f"Téléchargement ajouté à la queue: {metadata['title']} - {metadata['artist']}", {
-            'url': url,
-            'metadata': metadata,
-            'queue_position': queue_size,
-            'queue_size': queue_size
-        })
+        log_message('INFO', f"➕ Ajouté à la queue (position {position}/{MAX_QUEUE_SIZE}): "
+                            f"{metadata['title']} - {metadata['artist']}", job_id=job['id'])
+        log_message('DEBUG', 'Job ajouté', {'url': url, 'metadata': metadata}, job_id=job['id'])
         
         return jsonify({
             'success': True,
             'message': 'Ajouté à la queue',
-            'queue_position': queue_size,
-            'queue_size': queue_size,
+            'job_id': job['id'],
+            'queue_position': position,
+            'queue_size': position,
             'timestamp': datetime.now().isoformat()
         })
         
     except Exception as e:
-        print(f"❌ Erreur: {str(e)}")
-        log_message('ERROR', f"Erreur lors de l'ajout à la queue: {str(e)}", {'error': str(e)})
+        log_message('ERROR', f"Erreur lors de l'ajout à la queue: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -226,28 +584,60 @@ def download():
 
 @app.route('/cancel', methods=['POST'])
 def cancel_download():
-    """Annule le téléchargement en cours"""
+    """
+    Annule un téléchargement (en cours ou en attente)
+    
+    Body (optionnel):
+    {
+        "job_id": "..."     (par défaut : le téléchargement en cours)
+    }
+    
+    Le transfert yt-dlp est interrompu depuis le progress hook, FFmpeg est
+    tué et les fichiers partiels sont supprimés par le worker du job. Un job encore en attente
+    est marqué annulé dans la queue et ne démarrera jamais.
+    """
     try:
-        if not download_status['in_progress']:
+        data = request.get_json(silent=True) or {}
+        
+        job_id = data.get('job_id')
+        if not job_id:
+            running_jobs = job_store.list(states=(RUNNING,), limit=1)
+            job_id = running_jobs[0]['id'] if running_jobs else None
+        
+        if not job_id:
             log_message('WARNING', 'Tentative d\'annulation sans téléchargement en cours')
             return jsonify({
                 'success': False,
                 'error': 'Aucun téléchargement en cours'
             }), 400
         
-        print("\n🛑 ANNULATION DU TÉLÉCHARGEMENT EN COURS...")
-        log_message('WARNING', 'Annulation du téléchargement en cours', {
-            'download': download_status['current_download']
+        # En attente : retiré de la queue. En cours : le worker qui le traite
+        # voit la demande (CANCEL_POLL_INTERVAL) et interrompt le job.
+        dequeued = job_store.cancel_if_queued(job_id)
+        running = not dequeued and job_store.request_cancel(job_id)
+        
+        if not dequeued and not running:
+            return jsonify({
+                'success': False,
+                'error': f'Job inconnu ou déjà terminé: {job_id}'
+            }), 404
+        
+        if dequeued:
+            publish_job_event('job_cancelled', job_id)
+        
+        log_message('WARNING', f'🛑 Annulation demandée: job {job_id}', {
+            'job_id': job_id,
+            'running': running
         })
-        cancel_flag.set()
         
         return jsonify({
             'success': True,
-            'message': 'Téléchargement annulé'
+            'job_id': job_id,
+            'message': 'Téléchargement annulé' if running else 'Job retiré de la queue'
         })
         
     except Exception as e:
-        print(f"❌ Erreur: {str(e)}")
+        log_message('ERROR', f"Erreur: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -256,37 +646,34 @@ def cancel_download():
 
 @app.route('/cleanup', methods=['POST'])
 def cleanup():
-    """Nettoie le dossier temp/"""
+    """
+    Nettoie le dossier temp/
+    
+    Supprime immédiatement tous les fichiers orphelins. Les dossiers des
+    jobs en attente ou en cours (temp/<job_id>/) sont conservés.
+    """
     try:
-        print("\n🧹 Nettoyage du dossier temp/...")
-        log_message('INFO', 'Démarrage du nettoyage du dossier temp/')
+        log_message('INFO', '🧹 Nettoyage du dossier temp/...')
         
-        deleted_files = []
+        report = janitor.run_once(max_age=0)
+        deleted_files = report['deleted']
         
-        if TEMP_DIR.exists():
-            for file in TEMP_DIR.iterdir():
-                if file.is_file():
-                    file.unlink()
-                    deleted_files.append(file.name)
-                    print(f"   🗑️ Supprimé: {file.name}")
-        
-        print(f"✅ Nettoyage terminé: {len(deleted_files)} fichier(s) supprimé(s)\n")
-        log_message('SUCCESS', f'Nettoyage terminé: {len(deleted_files)} fichier(s) supprimé(s)', {
-            'deleted_files': deleted_files
-        })
+        log_message('SUCCESS', f'Nettoyage terminé: {len(deleted_files)} fichier(s) supprimé(s)')
+        log_message('DEBUG', 'Fichiers supprimés de temp/', {'deleted_files': deleted_files})
         
         # Reset le statut
-        download_status['in_progress'] = False
-        download_status['current_download'] = None
-        download_status['last_error'] = None
+        global errors_cleared_at
+        errors_cleared_at = datetime.now().isoformat()
         
         return jsonify({
             'success': True,
-            'deleted_files': deleted_files
+            'deleted_files': deleted_files,
+            'freed_bytes': report['freed_bytes'],
+            'temp_bytes': report['temp_bytes']
         })
         
     except Exception as e:
-        print(f"❌ Erreur: {str(e)}")
+        log_message('ERROR', f"Erreur: {str(e)}")
         return jsonify({
             'success': False,
             'error': str(e)
@@ -296,47 +683,90 @@ def cleanup():
 @app.route('/stats', methods=['GET'])
 def get_stats():
     """Retourne les statistiques de la bibliothèque musicale"""
-    stats = organizer.get_stats()
+    with api_metrics.timer('songsurf_library_scan_duration_seconds', operation='stats'):
+        stats = organizer.get_stats()
     return jsonify(stats)
 
 
 @app.route('/api/library', methods=['GET'])
 def get_library():
     """Retourne la structure complète de la bibliothèque"""
-    structure = organizer.get_library_structure()
+    with api_metrics.timer('songsurf_library_scan_duration_seconds', operation='structure'):
+        structure = organizer.get_library_structure()
     return jsonify(structure)
 
 
+@app.route('/api/search', methods=['GET'])
+def search_library():
+    """
+    Recherche dans la bibliothèque (titre, artiste, album, featuring)
+    
+    Query: ?q=beyonce halo&page=1&per_page=20
+    Insensible à la casse et aux accents, préfixes des mots (puis trigrammes
+    si rien ne correspond), résultats classés par pertinence.
+    """
+    if search_index is None:
+        return jsonify({'success': False, 'error': 'Recherche indisponible (SQLite sans FTS5)'}), 503
+    
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Paramètre q manquant'}), 400
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(SEARCH_MAX_PER_PAGE, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'page et per_page doivent être des entiers'}), 400
+    
+    started = time.perf_counter()
+    with api_metrics.timer('songsurf_library_scan_duration_seconds', operation='search'):
+        result = search_index.search(query, page=page, per_page=per_page)
+    return jsonify({
+        'success': True,
+        'query': query,
+        **result,
+        'indexing': not search_index.ready,  # Premier passage en cours : résultats partiels
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
+@app.route('/api/featuring-corrections', methods=['GET'])
+def featuring_corrections():
+    """
+    Propose les corrections de featuring de toute la bibliothèque
+    
+    Les morceaux de l'index de recherche (noms des dossiers et fichiers)
+    sont comparés à ce que l'organisation actuelle en ferait ; chaque
+    correction proposée peut être envoyée telle quelle à /api/apply-corrections.
+    """
+    if search_index is None:
+        return jsonify({'success': False, 'error': 'Index indisponible (SQLite sans FTS5)'}), 503
+    
+    started = time.perf_counter()
+    with api_metrics.timer('songsurf_library_scan_duration_seconds', operation='featuring'):
+        corrections = organizer.featuring_corrections(search_index.tracks())
+    return jsonify({
+        'success': True,
+        'corrections': corrections,
+        'total': len(corrections),
+        'indexing': not search_index.ready,  # Premier passage en cours : bibliothèque pas encore entière
+        'took_ms': round((time.perf_counter() - started) * 1000, 2)
+    })
+
+
 @app.route('/api/album-cover/<path:artist>/<path:album>')
 def get_album_cover(artist, album):
     """Retourne la pochette d'un album"""
     try:
-        # Chercher le premier fichier MP3 dans l'album
-        album_dir = organizer.music_dir / artist / album
-        
-        if not album_dir.exists():
+        # Pochette du premier fichier MP3 de l'album (cache LRU)
+        cover = organizer.get_album_cover(artist, album)
+        if cover is None:
             return '', 404
         
-        mp3_files = list(album_dir.glob('*.mp3'))
-        
-        if not mp3_files:
-            return '', 404
-        
-        # Extraire la pochette du premier fichier
-        from mutagen.mp3 import MP3
-        from mutagen.id3 import ID3, APIC
-        
-        audio = MP3(mp3_files[0], ID3=ID3)
-        
-        # Chercher la pochette
-        for tag in audio.tags.values():
-            if isinstance(tag, APIC):
-                return tag.data, 200, {'Content-Type': tag.mime}
-        
-        return '', 404
+        data, mime = cover
+        return data, 200, {'Content-Type': mime}
         
     except Exception as e:
-        print(f"❌ Erreur récupération pochette: {e}")
+        log_message('ERROR', f"Erreur récupération pochette: {e}")
         return '', 404
 
 
@@ -352,33 +782,16 @@ def get_cover(filename):
         
         artist, album = parts
         
-        # Chercher le premier fichier MP3 dans l'album
-        album_dir = organizer.music_dir / artist / album
-        
-        if not album_dir.exists():
+        # Pochette du premier fichier MP3 de l'album (cache LRU)
+        cover = organizer.get_album_cover(artist, album)
+        if cover is None:
             return '', 404
         
-        mp3_files = list(album_dir.glob('*.mp3'))
-        
-        if not mp3_files:
-            return '', 404
-        
-        # Extraire la pochette du premier fichier
-        from mutagen.mp3 import MP3
-        from mutagen.id3 import ID3, APIC
-        
-        audio = MP3(mp3_files[0], ID3=ID3)
-        
-        # Chercher la pochette
-        if audio.tags:
-            for tag in audio.tags.values():
-                if isinstance(tag, APIC):
-                    return tag.data, 200, {'Content-Type': tag.mime}
-        
-        return '', 404
+        data, mime = cover
+        return data, 200, {'Content-Type': mime}
         
     except Exception as e:
-        print(f"❌ Erreur récupération pochette: {e}")
+        log_message('ERROR', f"Erreur récupération pochette: {e}")
         return '', 404
 
 
@@ -394,7 +807,7 @@ def get_artist_photo(artist_name):
         
         return '', 404
     except Exception as e:
-        print(f"❌ Erreur récupération photo: {e}")
+        log_message('ERROR', f"Erreur récupération photo: {e}")
         return '', 404
 
 
@@ -443,7 +856,13 @@ def upload_artist_photo():
 
 @app.route('/api/extract-metadata', methods=['POST'])
 def extract_metadata():
-    """Extract metadata from YouTube URL using yt-dlp"""
+    """
+    Lance l'extraction des métadonnées d'une URL YouTube (musique ou playlist)
+    
+    Répond immédiatement (202) avec l'identifiant de l'extraction. Le résultat
+    s'obtient via GET /api/extract-metadata/<extraction_id> ou l'événement
+    'metadata_extracted' de /events.
+    """
     try:
         data = request.get_json()
         url = data.get('url')
@@ -451,39 +870,114 @@ def extract_metadata():
         if not url:
             return jsonify({'success': False, 'error': 'URL manquante'})
         
-        log_message('INFO', f'Extraction des métadonnées: {url}')
+        extraction = extractions.submit(url)
+        if extraction is None:
+            return jsonify({
+                'success': False,
+                'error': f'Trop d\'extractions en cours (max {MAX_PENDING_EXTRACTIONS})'
+            }), 429
         
-        # Détecter si c'est une playlist/album ou une musique simple
-        if '/playlist?list=' in url or '/browse/' in url:
-            # C'est une playlist ou un album
-            result = downloader.extract_playlist_metadata(url)
-            
-            if result['success']:
-                log_message('SUCCESS', f'✅ Playlist/Album extrait: {result["total_songs"]} chansons', {
-                    'title': result['title'],
-                    'artist': result['artist'],
-                    'total_songs': result['total_songs']
-                })
-            else:
-                log_message('ERROR', f'❌ Échec extraction playlist: {result.get("error")}')
-            
-            return jsonify(result)
-        else:
-            # C'est une musique simple
-            result = downloader.extract_metadata(url)
-            
-            if result['success']:
-                log_message('SUCCESS', f'✅ Métadonnées extraites', result['metadata'])
-                return jsonify(result)
-            else:
-                log_message('ERROR', f'❌ Échec extraction: {result.get("error")}')
-                return jsonify(result)
+        log_message('INFO', f'Extraction des métadonnées: {url}', {'extraction_id': extraction['id']})
+        
+        return jsonify({
+            'success': True,
+            'extraction_id': extraction['id'],
+            'kind': extraction['kind'],
+            'state': extraction['state']
+        }), 202
             
     except Exception as e:
         log_message('ERROR', f'Erreur extraction métadonnées: {str(e)}')
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/api/extract-metadata/<extraction_id>', methods=['GET'])
+def get_extraction(extraction_id):
+    """
+    Retourne l'état d'une extraction
+    
+    'state' vaut pending, running ou done ; une fois done, 'result' contient
+    la réponse de yt-dlp (même format qu'avant : success, metadata... ou
+    success, title, songs... pour une playlist).
+    """
+    extraction = extractions.get(extraction_id)
+    if extraction is None:
+        return jsonify({
+            'success': False,
+            'error': f'Extraction inconnue ou expirée: {extraction_id}'
+        }), 404
+    return jsonify(extraction)
+
+
+def job_detail(job):
+    """Détail d'un job : état, métadonnées et chronologie de ses étapes"""
+    return {
+        'id': job['id'],
+        'seq': job['seq'],
+        'finished_seq': job.get('finished_seq'),
+        'state': job['state'],
+        'stage': job.get('stage'),
+        'url': job['url'],
+        'metadata': job['metadata'],
+        'attempts': job.get('attempts') or 0,
+        'error': job.get('error'),
+        'added_at': job.get('added_at'),
+        'updated_at': job.get('updated_at'),
+        'trace': job.get('trace') or [],
+        'stage_durations': stage_durations(job.get('trace'))
+    }
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Retourne un job et sa chronologie
+    
+    'trace' liste chaque étape de chaque tentative (queue, extract, fetch,
+    transcode, cover, tag, move) avec son début, sa durée, la tentative et
+    le worker ; 'stage_durations' en donne le total par étape.
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': f'Job inconnu: {job_id}'}), 404
+    return jsonify({'success': True, 'job': job_detail(job)})
+
+
+@app.route('/api/jobs/traces', methods=['GET'])
+def export_traces():
+    """
+    Export des chronologies des jobs terminés, en JSON lines (un job par ligne)
+    
+    Paramètres:
+      - after : ne renvoyer que les jobs dont 'finished_seq' est supérieur
+        (reprise d'un export précédent : passer le 'finished_seq' de la
+        dernière ligne reçue) ; les jobs sont dans l'ordre où ils se sont
+        terminés, un job plus ancien fini plus tard n'est donc pas manqué
+      - limit : nombre maximal de jobs (défaut 1000)
+      - state : completed, failed ou cancelled (défaut : tous les trois)
+    """
+    try:
+        after = int(request.args.get('after', 0))
+        limit = max(1, min(int(request.args.get('limit', 1000)), 10000))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'after et limit doivent être des entiers'}), 400
+    
+    state = request.args.get('state')
+    if state and state not in TERMINAL_STATES:
+        return jsonify({
+            'success': False,
+            'error': f"État invalide: {state} (attendu: {', '.join(TERMINAL_STATES)})"
+        }), 400
+    
+    jobs = job_store.list(states=(state,) if state else TERMINAL_STATES, limit=limit, after_finished_seq=after)
+    
+    def stream():
+        for job in jobs:
+            yield json.dumps(job_detail(job), ensure_ascii=False) + '\n'
+    
+    return Response(stream(), mimetype='application/x-ndjson')
+
+
 @app.route('/api/download-playlist', methods=['POST'])
 def download_playlist():
     """
@@ -496,8 +990,12 @@ def download_playlist():
             "title": "Album Name",
             "artist": "Artist Name",
             "songs": [...]
-        }
+        },
+        "rate_limit": 262144        (optionnel, débit maximal de chaque morceau en octets/s)
     }
+    
+    Les morceaux d'une playlist sont des jobs "en masse" : plafond propre
+    en heures pleines, pleine vitesse en heures creuses (OFF_PEAK_WINDOWS).
     """
     try:
         data = request.get_json()
@@ -507,6 +1005,13 @@ def download_playlist():
         if not url or not playlist_metadata:
             return jsonify({'success': False, 'error': 'URL ou métadonnées manquantes'})
         
+        rate_limit = data.get('rate_limit')
+        if rate_limit is not None:
+            try:
+                rate_limit = max(1, int(rate_limit))
+            except (TypeError, ValueError):
+                return jsonify({'success': False, 'error': 'rate_limit doit être un entier (octets/s)'}), 400
+        
         total_songs = playlist_metadata.get('total_songs', 0)
         
         log_message('INFO', f'Téléchargement playlist: {playlist_metadata.get("title")} ({total_songs} chansons)')
@@ -514,9 +1019,12 @@ def download_playlist():
         # Ajouter chaque chanson à la queue
         songs = playlist_metadata.get('songs', [])
         added = 0
+        job_ids = []
+        committed = committed_metadata()
+        rejected_for_space = 0
         
         for song in songs:
-            if download_queue.full():
+            if queue_full():
                 log_message('WARNING', f'Queue pleine, {len(songs) - added} chansons non ajoutées')
                 break
             
@@ -525,30 +1033,52 @@ def download_playlist():
                 'artist': song.get('artist', playlist_metadata.get('artist', 'Unknown')),
                 'album': playlist_metadata.get('title', 'Unknown Album'),
                 'title': song['title'],
-                'year': playlist_metadata.get('year', '')
+                'year': playlist_metadata.get('year', ''),
+                'duration': song.get('duration', 0)
             }
             
-            download_queue.put({
+            fits, disk = admission.can_admit(metadata, committed)
+            if not fits:
+                rejected_for_space = len(songs) - added
+                log_message('WARNING', f'Espace disque insuffisant, {rejected_for_space} chansons non ajoutées', disk)
+                break
+            committed.append(metadata)
+            
+            job = {
+                'id': new_job_id(),
                 'url': song['url'],
                 'metadata': metadata,
+                'rate_limit': rate_limit,
                 'added_at': datetime.now().isoformat(),
                 'playlist_info': {
                     'playlist_title': playlist_metadata.get('title'),
                     'song_index': added + 1,
                     'total_songs': total_songs
                 }
-            })
+            }
+            enqueue_job(job)
+            job_ids.append(job['id'])
             
             added += 1
         
+        if added == 0 and rejected_for_space:
+            return jsonify({
+                'success': False,
+                'status': 'insufficient_storage',
+                'error': 'Espace disque insuffisant pour cet album',
+                'disk': disk
+            }), 507
+        
         log_message('SUCCESS', f'✅ {added}/{total_songs} chansons ajoutées à la queue')
         
         return jsonify({
             'success': True,
             'message': f'{added} chansons ajoutées à la queue',
             'added': added,
+            'job_ids': job_ids,
+            'rejected_for_space': rejected_for_space,
             'total': total_songs,
-            'queue_size': download_queue.qsize(),
+            'queue_size': queue_size(),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -598,6 +1128,7 @@ def move_song():
         organizer._cleanup_empty_dirs(source_file.parent)
         
         log_message('SUCCESS', f'✅ Déplacé: {source_file.name} → {target_artist}/{target_album}')
+        library_changed()
         
         return jsonify({
             'success': True,
@@ -650,6 +1181,7 @@ def rename_song():
         shutil.move(str(source_file), str(new_path))
         
         log_message('SUCCESS', f'✅ Renommé: {source_file.name} → {new_filename}')
+        library_changed()
         
         return jsonify({
             'success': True,
@@ -663,236 +1195,272 @@ def rename_song():
 
 @app.route('/api/apply-corrections', methods=['POST'])
 def apply_corrections():
-    """Applique les corrections de feat (déplace et renomme les fichiers)"""
+    """
+    Applique les corrections de feat (déplace et renomme les fichiers)
+    
+    Le lot est appliqué entièrement ou pas du tout : une correction
+    impossible (fichier introuvable, collision) ou un échec en cours de
+    route et la bibliothèque reste telle qu'avant.
+    """
     try:
-        data = request.get_json()
-        corrections = data.get('corrections', [])
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Corps JSON attendu: {"corrections": [...]}'}), 400
+        corrections = data.get('corrections')
         
-        if not corrections:
-            return jsonify({'success': False, 'error': 'Aucune correction à appliquer'})
+        if not isinstance(corrections, list) or not corrections:
+            return jsonify({'success': False, 'error': 'corrections doit être une liste non vide'}), 400
         
         log_message('INFO', f'Début de l\'application de {len(corrections)} correction(s)', {
             'count': len(corrections)
         })
         
-        results = []
-        for correction in corrections:
-            song_path = correction.get('song_path')
-            target_artist = correction.get('target_artist')
-            feat_artist = correction.get('feat_artist')
-            
-            log_message('INFO', f'Correction: {song_path} → {target_artist} (feat. {feat_artist})')
-            
-            # Appeler la fonction de l'organizer pour déplacer le fichier
-            result = organizer.move_and_rename_feat(song_path, target_artist, feat_artist)
-            results.append(result)
-            
-            if result['success']:
-                log_message('SUCCESS', f'✅ Correction appliquée: {result["new_path"]}')
-            else:
-                log_message('ERROR', f'❌ Échec: {result.get("error")}')
+        result = bulk_corrections.apply(corrections)
         
-        # Compter les succès
-        success_count = sum(1 for r in results if r['success'])
+        if result['success']:
+            log_message('SUCCESS', f'✅ Corrections appliquées: {result["success_count"]}/{result["total"]}')
+            library_changed()
+        else:
+            log_message('ERROR', f'❌ Aucune correction appliquée: {result["error"]}')
         
-        log_message('INFO', f'Corrections terminées: {success_count}/{len(corrections)} réussies')
-        
-        return jsonify({
-            'success': True,
-            'results': results,
-            'success_count': success_count,
-            'total': len(corrections)
-        })
+        return jsonify(result)
         
     except Exception as e:
         log_message('ERROR', f'Erreur lors de l\'application des corrections: {str(e)}')
         return jsonify({'success': False, 'error': str(e)})
 
 
-# ============================================
-# FONCTIONS
-# ============================================
+@app.route('/admin/profiling/cpu', methods=['POST'])
+@admin_required
+def start_cpu_profile():
+    """
+    Lance un profil CPU par échantillonnage de tous les processus (API et workers)
+    
+    Body JSON (optionnel):
+      - duration : secondes de profilage (défaut 30, max PROFILE_MAX_DURATION)
+      - interval : secondes entre deux relevés des piles (défaut PROFILE_INTERVAL)
+      - threads : ne profiler que les threads dont le nom commence ainsi
+    
+    Le résultat est disponible sur GET /admin/profiling/cpu/<profile_id>
+    une fois la durée écoulée (ou après POST /admin/profiling/cpu/stop).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        duration = float(data.get('duration', 30))
+        interval = float(data.get('interval', PROFILE_INTERVAL))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'duration et interval doivent être des nombres'}), 400
+    if not 0 < duration <= PROFILE_MAX_DURATION or not 0.001 <= interval <= 1:
+        return jsonify({
+            'success': False,
+            'error': f'duration doit être entre 0 et {PROFILE_MAX_DURATION} s, interval entre 0.001 et 1 s'
+        }), 400
+    
+    prune_profiles(PROFILES_DIR, PROFILES_KEEP)
+    command = issue_command(job_store, 'cpu_start', duration=duration, interval=interval,
+                            threads=data.get('threads'))
+    profiling_agent.poll()
+    log_message('INFO', f"Profil CPU #{command['id']} lancé pour {duration:g} s")
+    
+    return jsonify({
+        'success': True,
+        'profile_id': command['id'],
+        'duration': duration,
+        'interval': interval,
+        'ready_at': datetime.fromtimestamp(command['issued_at'] + duration).isoformat()
+    })
+
 
-def queue_worker():
+@app.route('/admin/profiling/cpu/stop', methods=['POST'])
+@admin_required
+def stop_cpu_profile():
+    """Arrête le profil CPU en cours avant la fin de sa durée"""
+    command = issue_command(job_store, 'cpu_stop')
+    profiling_agent.poll()
+    return jsonify({'success': True, 'command_id': command['id']})
+
+
+def profile_lost(result, command, worker):
     """
-    Worker qui traite la queue de téléchargements
-    Tourne en boucle infinie dans un thread séparé
+    Un processus ayant répondu « en cours » n'écrira-t-il jamais son profil ?
+
+    Son worker a disparu ou a été relancé (autre pid), ou la fin prévue
+    du profil est dépassée de plus de PROFILE_RESULT_GRACE.
     """
-    print("🔄 Queue worker démarré\n")
+    now = time.time()
+    if worker is not None and (worker['pid'] != result.get('pid')
+                               or now - (worker['heartbeat_at'] or 0) > WORKER_HEARTBEAT_TIMEOUT):
+        return True
+    if command is not None:
+        ends_at = command['issued_at'] + command['params']['duration']
+    else:
+        ends_at = datetime.fromisoformat(result['at']).timestamp() + PROFILE_MAX_DURATION
+    return now > ends_at + PROFILE_RESULT_GRACE
+
+
+@app.route('/admin/profiling/cpu/<int:profile_id>', methods=['GET'])
+@admin_required
+def get_cpu_profile(profile_id):
+    """
+    Résultat d'un profil CPU, fusionné sur tous les processus
     
-    while True:
-        try:
-            # Attendre un élément dans la queue (bloquant)
-            item = download_queue.get()
-            
-            if item is None:  # Signal d'arrêt
-                break
-            
-            url = item['url']
-            metadata = item['metadata']
-            
-            # Réinitialiser le flag d'annulation
-            cancel_flag.clear()
-            
-            # Marquer comme en cours
-            with queue_lock:
-                download_status['in_progress'] = True
-                download_status['current_download'] = {
-                    'url': url,
-                    'metadata': metadata,
-                    'started_at': datetime.now().isoformat()
-                }
-                download_status['last_error'] = None
-            
-            print(f"\n{'='*60}")
-            print(f"🎵 DÉMARRAGE DU TÉLÉCHARGEMENT")
-            print(f"{'='*60}")
-            print(f"Queue restante: {download_queue.qsize()}")
-            print(f"Artiste: {metadata['artist']}")
-            print(f"Album: {metadata['album']}")
-            print(f"Titre: {metadata['title']}")
-            print(f"{'='*60}\n")
-            
-            log_message('INFO', f"Démarrage du téléchargement: {metadata['title']} - {metadata['artist']}", {
-                'url': url,
-                'metadata': metadata,
-                'queue_remaining': download_queue.qsize()
-            })
-            
-            try:
-                # Étape 1: Télécharger
-                print("📥 Étape 1/2: Téléchargement...")
-                log_message('INFO', '📥 Étape 1/2: Début du téléchargement via yt-dlp', {
-                    'url': url,
-                    'title': metadata['title'],
-                    'artist': metadata['artist']
-                })
-                
-                download_result = downloader.download(url, metadata)
-                
-                log_message('INFO', 'Résultat du téléchargement reçu', {
-                    'success': download_result.get('success'),
-                    'has_file_path': 'file_path' in download_result
-                })
-                
-                # Vérifier annulation
-                if cancel_flag.is_set():
-                    log_message('WARNING', 'Téléchargement annulé par l\'utilisateur')
-                    raise Exception("Téléchargement annulé par l'utilisateur")
-                
-                if not download_result['success']:
-                    error_msg = download_result.get('error', 'Erreur inconnue')
-                    log_message('ERROR', f'Échec du téléchargement: {error_msg}', download_result)
-                    raise Exception(error_msg)
-                
-                file_path = download_result['file_path']
-                print(f"✅ Téléchargement terminé: {file_path}")
-                log_message('SUCCESS', '✅ Téléchargement terminé avec succès', {
-                    'file_path': file_path,
-                    'file_size': download_result.get('file_size', 'unknown')
-                })
-                
-                # Vérifier annulation
-                if cancel_flag.is_set():
-                    log_message('WARNING', 'Annulation détectée avant organisation')
-                    raise Exception("Téléchargement annulé par l'utilisateur")
-                
-                # Étape 2: Organiser
-                print("\n📁 Étape 2/2: Organisation...")
-                log_message('INFO', '📁 Étape 2/2: Début de l\'organisation du fichier', {
-                    'file_path': file_path,
-                    'target_artist': metadata['artist'],
-                    'target_album': metadata['album']
-                })
-                
-                organize_result = organizer.organize(file_path, metadata)
-                
-                log_message('INFO', 'Résultat de l\'organisation reçu', {
-                    'success': organize_result.get('success'),
-                    'has_final_path': 'final_path' in organize_result
-                })
-                
-                if not organize_result['success']:
-                    error_msg = organize_result.get('error', 'Erreur inconnue')
-                    log_message('ERROR', f'Échec de l\'organisation: {error_msg}', organize_result)
-                    raise Exception(error_msg)
-                
-                final_path = organize_result['final_path']
-                print(f"✅ Organisation terminée: {final_path}")
-                log_message('SUCCESS', '✅ Organisation terminée avec succès', {
-                    'final_path': final_path,
-                    'artist_folder': metadata['artist'],
-                    'album_folder': metadata['album']
-                })
-                
-                # Succès
-                with queue_lock:
-                    download_status['in_progress'] = False
-                    download_status['current_download'] = None
-                    download_status['last_completed'] = {
-                        'success': True,
-                        'file_path': final_path,
-                        'metadata': metadata,
-                        'timestamp': datetime.now().isoformat()
-                    }
-                
-                print(f"\n{'='*60}")
-                print(f"✅ TÉLÉCHARGEMENT TERMINÉ AVEC SUCCÈS")
-                print(f"{'='*60}")
-                print(f"Fichier: {final_path}")
-                print(f"Queue restante: {download_queue.qsize()}")
-                print(f"{'='*60}\n")
-                
-                log_message('SUCCESS', f"Téléchargement complet: {metadata['title']} - {metadata['artist']}", {
-                    'final_path': final_path,
-                    'metadata': metadata,
-                    'queue_remaining': download_queue.qsize()
-                })
-                
-            except Exception as e:
-                # Erreur
-                print(f"\n{'='*60}")
-                print(f"❌ ERREUR LORS DU TÉLÉCHARGEMENT")
-                print(f"{'='*60}")
-                print(f"Erreur: {str(e)}")
-                print(f"{'='*60}\n")
-                
-                log_message('ERROR', f"Erreur lors du téléchargement: {str(e)}", {
-                    'error': str(e),
-                    'metadata': metadata,
-                    'url': url
-                })
-                
-                with queue_lock:
-                    download_status['in_progress'] = False
-                    download_status['current_download'] = None
-                    download_status['last_error'] = {
-                        'error': str(e),
-                        'metadata': metadata,
-                        'timestamp': datetime.now().isoformat()
-                    }
-            
-            # Marquer la tâche comme terminée
-            download_queue.task_done()
-            
-        except Exception as e:
-            print(f"❌ Erreur dans le queue worker: {str(e)}")
-            time.sleep(1)
+    Paramètres:
+      - format : json (défaut, fonctions les plus coûteuses), collapsed
+        (piles repliées pour flamegraph.pl / speedscope) ou pstats
+        (fichier pour python -m pstats / snakeviz)
+      - process : un seul processus (api, worker-1...)
+      - limit : nombre de fonctions (format json, défaut 30)
+    
+    Répond 202 tant qu'un processus profile encore. Un processus arrêté
+    avant d'écrire son profil (recyclé, tué) est ignoré.
+    """
+    results = command_results(job_store, profile_id)
+    process = request.args.get('process')
+    if process:
+        results = {name: result for name, result in results.items() if name == process}
+    if not results:
+        return jsonify({'success': False, 'error': f'Profil inconnu: {profile_id}'}), 404
+    
+    command = find_command(job_store, profile_id)
+    workers = {worker['name']: worker for worker in job_store.workers()}
+    lost = {name for name, result in results.items()
+            if result.get('running') and profile_lost(result, command, workers.get(name))}
+    results = {name: ({'error': 'Processus arrêté avant la fin du profil'} if name in lost else result)
+               for name, result in results.items()}
+    running = sorted(name for name, result in results.items() if result.get('running'))
+    if running:
+        return jsonify({'success': True, 'ready': False, 'running': running}), 202
+    
+    profiles = []
+    for name, result in sorted(results.items()):
+        path = PROFILES_DIR / result.get('file', '')
+        if result.get('file') and path.exists():
+            profiles.append(json.loads(path.read_text()))
+    if not profiles:
+        return jsonify({'success': False, 'error': f'Profil expiré ou en échec: {profile_id}'}), 404
+    
+    output = request.args.get('format', 'json')
+    if output == 'collapsed':
+        return Response(collapsed_stacks(profiles), mimetype='text/plain')
+    if output == 'pstats':
+        return Response(pstats_data(profiles), mimetype='application/octet-stream', headers={
+            'Content-Disposition': f'attachment; filename=songsurf-cpu-{profile_id}.pstats'
+        })
+    
+    return jsonify({
+        'success': True,
+        'ready': True,
+        'profile_id': profile_id,
+        'processes': [
+            {key: profile[key] for key in ('process', 'pid', 'started_at', 'seconds', 'sample_count')}
+            for profile in profiles
+        ],
+        'errors': {name: result['error'] for name, result in results.items() if result.get('error')},
+        'top': top_functions(profiles, limit=request.args.get('limit', 30, type=int))
+    })
+
+
+@app.route('/admin/profiling/memory/snapshot', methods=['POST'])
+@admin_required
+def take_memory_snapshot():
+    """
+    Prend un instantané tracemalloc dans tous les processus
+    
+    Le premier instantané démarre le suivi des allocations (TRACEMALLOC_FRAMES
+    niveaux de pile, ou 'frames' dans le body JSON) : il sert de référence.
+    Comparer ensuite deux instantanés avec
+    GET /admin/profiling/memory/<snapshot_id>?base=<snapshot_id>.
+    """
+    data = request.get_json(silent=True) or {}
+    frames = data.get('frames', TRACEMALLOC_FRAMES)
+    if not isinstance(frames, int) or not 1 <= frames <= 100:
+        return jsonify({'success': False, 'error': 'frames doit être un entier entre 1 et 100'}), 400
+    
+    prune_profiles(PROFILES_DIR, PROFILES_KEEP)
+    command = issue_command(job_store, 'memory_snapshot', frames=frames)
+    profiling_agent.poll()
+    
+    return jsonify({
+        'success': True,
+        'snapshot_id': command['id'],
+        'processes': command_results(job_store, command['id'])
+    })
+
+
+@app.route('/admin/profiling/memory/<int:snapshot_id>', methods=['GET'])
+@admin_required
+def get_memory_snapshot(snapshot_id):
+    """
+    Plus grosses allocations d'un instantané, par processus
+    
+    Paramètres:
+      - base : instantané de référence ; la réponse donne alors l'évolution
+        (size_diff, count_diff), triée par croissance
+      - group_by : lineno (défaut), filename ou traceback
+      - limit : nombre d'entrées par processus (défaut 20)
+      - process : un seul processus (api, worker-1...)
+    """
+    group_by = request.args.get('group_by', 'lineno')
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'success': False, 'error': f'group_by invalide: {group_by}'}), 400
+    limit = request.args.get('limit', 20, type=int)
+    base_id = request.args.get('base', type=int)
+    
+    results = command_results(job_store, snapshot_id)
+    base_results = command_results(job_store, base_id) if base_id is not None else {}
+    process = request.args.get('process')
+    if process:
+        results = {name: result for name, result in results.items() if name == process}
+    if not results:
+        return jsonify({'success': False, 'error': f'Instantané inconnu: {snapshot_id}'}), 404
+    
+    processes = {}
+    for name, result in sorted(results.items()):
+        path = PROFILES_DIR / result.get('file', '')
+        if not result.get('file') or not path.exists():
+            processes[name] = {'error': result.get('error') or 'Instantané expiré'}
+            continue
+        base = None
+        if base_id is not None:
+            base_path = PROFILES_DIR / base_results.get(name, {}).get('file', '')
+            if not base_results.get(name, {}).get('file') or not base_path.exists():
+                processes[name] = {'error': f'Pas d\'instantané de référence {base_id} pour ce processus'}
+                continue
+            base = tracemalloc.Snapshot.load(str(base_path))
+        processes[name] = {
+            'traced_bytes': result['traced_bytes'],
+            'peak_bytes': result['peak_bytes'],
+            'taken_at': result['at'],
+            'top': memory_diff(tracemalloc.Snapshot.load(str(path)), base, group_by=group_by, limit=limit)
+        }
+    
+    return jsonify({'success': True, 'snapshot_id': snapshot_id, 'base': base_id, 'processes': processes})
+
+
+@app.route('/admin/profiling/memory/stop', methods=['POST'])
+@admin_required
+def stop_memory_tracing():
+    """Arrête le suivi des allocations dans tous les processus (coût mémoire et CPU)"""
+    command = issue_command(job_store, 'memory_stop')
+    profiling_agent.poll()
+    return jsonify({'success': True, 'command_id': command['id']})
 
 
 # ============================================
-# MAIN
+# FONCTIONS
 # ============================================
 
-if __name__ == '__main__':
+def print_banner(mode):
+    """Affiche la bannière de démarrage et la liste des endpoints"""
     print("\n" + "="*60)
     print("🎵 SongSurf - Serveur Python avec Queue")
     print("="*60)
     print(f"📁 Dossier temporaire: {TEMP_DIR}")
     print(f"📁 Bibliothèque musicale: {MUSIC_DIR}")
     print(f"📊 Taille max de la queue: {MAX_QUEUE_SIZE}")
+    print(f"⚙️  Mode: {mode}")
     print("="*60)
-    print("🚀 Serveur démarré sur http://localhost:8080")
+    print(f"🚀 Serveur démarré sur http://{HOST}:{PORT}")
     print("="*60)
     print("\n⚠️  IMPORTANT - Navigateurs:")
     print("   🛡️  Brave: Désactivez Shields pour YouTube Music")
@@ -903,12 +1471,25 @@ if __name__ == '__main__':
     print("   GET  /                → Dashboard principal")
     print("   GET  /ping           → Test de connexion")
     print("   GET  /status         → Statut du téléchargement + queue")
+    print("   GET  /health         → Santé des workers (battement de cœur, jobs bloqués)")
+    print("   GET  /events         → Événements temps réel (Server-Sent Events)")
+    print("   POST /api/extract-metadata → Lancer une extraction (GET /api/extract-metadata/<id> pour le résultat)")
     print("   POST /download       → Ajouter à la queue")
-    print("   POST /cancel         → Annuler le téléchargement en cours")
-    print("   POST /cleanup        → Nettoyer le dossier temp/")
+    print("   POST /cancel         → Annuler un téléchargement (job_id optionnel)")
+    print("   POST /cleanup        → Supprimer les fichiers temp/ orphelins")
     print("   GET  /stats          → Statistiques de la bibliothèque")
+    print("   GET  /api/search     → Recherche dans la bibliothèque (?q=...)")
+    print("   GET  /api/featuring-corrections → Corrections de featuring proposées (toute la bibliothèque)")
     print("\n" + "="*60 + "\n")
+
+
+def start_services():
+    """
+    Démarre les services d'arrière-plan du serveur API
     
+    À appeler avant de lancer les workers : les jobs interrompus par un
+    arrêt du serveur sont remis en queue.
+    """
     # Log de démarrage
     log_message('SUCCESS', 'Serveur SongSurf démarré', {
         'temp_dir': str(TEMP_DIR),
@@ -916,16 +1497,51 @@ if __name__ == '__main__':
         'max_queue': MAX_QUEUE_SIZE
     })
     
+    # Reprendre les jobs interrompus par un arrêt du serveur
+    job_store.prune()
+    job_store.reset_workers()
+    job_store.set_value(CONCURRENCY_KEY, None)  # Limite d'une exécution précédente
+    job_store.set_value(ADMISSION_PAUSED_KEY, None)  # Pauses des workers d'une exécution précédente
+    requeued = job_store.requeue_interrupted()
+    if requeued or queue_size():
+        log_message('INFO', f'Reprise de la queue: {queue_size()} job(s) en attente, dont {requeued} interrompu(s)')
+    
+    # Lots de corrections interrompus par un arrêt du serveur (terminés ou annulés)
+    bulk_corrections.recover()
+    
+    # Nettoyage périodique de temp/
+    janitor.start()
+    
+    # Événements des workers → connexions /events
+    event_relay.start()
+    
+    # Commandes de profilage (/admin/profiling)
+    profiling_agent.start()
+    
+    # Index de recherche (premier passage en arrière-plan)
+    if search_index is not None:
+        search_index.start()
+
+
+# ============================================
+# MAIN
+# ============================================
+
+if __name__ == '__main__':
+    print_banner('développement (worker intégré)')
+    start_services()
+    
     # Démarrer le queue worker dans un thread séparé
-    worker_thread = threading.Thread(target=queue_worker, daemon=True)
+    engine = Engine(job_store, downloader, organizer, admission, name='worker-1', wakeup=job_available,
+                    breaker=breaker, bandwidth=bandwidth, metrics=worker_metrics)
+    worker_thread = threading.Thread(target=engine.run, daemon=True)
     worker_thread.start()
-    print("✅ Queue worker démarré\n")
     log_message('INFO', 'Queue worker démarré')
     
     # Lancer le serveur
     app.run(
-        host='localhost',
-        port=8080,
+        host=HOST,
+        port=PORT,
         debug=True,
         use_reloader=False  # Éviter le double démarrage en mode debug
     )
\ No newline at end of file
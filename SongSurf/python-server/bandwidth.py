@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bandwidth.py - Contrôle de la bande passante des téléchargements
+
+FONCTIONNALITÉ:
+  - Plafond de débit global, partagé équitablement entre les téléchargements
+    en cours (tous workers confondus : la répartition est calculée depuis
+    la queue persistante)
+  - Plafond par job (réglage global ou valeur propre au job)
+  - Heures creuses : les jobs d'album/playlist y tournent à pleine vitesse ;
+    en heures pleines ils ont leur propre plafond, voire attendent les
+    heures creuses, alors que les morceaux seuls passent toujours
+  - Limiteur de débit modifiable pendant le téléchargement (hook yt-dlp
+    et plages parallèles de RangeDownloader)
+"""
+
+import threading
+import time
+from datetime import datetime
+
+
+def parse_windows(spec):
+    """
+    Lit des plages horaires "HH:MM-HH:MM,HH:MM-HH:MM"
+
+    Une plage peut passer minuit ("23:00-06:00").
+
+    Returns:
+        list: [(début, fin), ...] en minutes depuis minuit
+    """
+    windows = []
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            start, end = (value.strip() for value in part.split('-'))
+            windows.append(tuple(int(h) * 60 + int(m) for h, m in (start.split(':'), end.split(':'))))
+        except ValueError:
+            raise ValueError(f'Plage horaire invalide: {part!r} (attendu HH:MM-HH:MM)')
+    return windows
+
+
+def in_windows(windows, now=None):
+    """L'heure `now` (datetime) tombe-t-elle dans une des plages ?"""
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        if start <= end:
+            if start <= minute < end:
+                return True
+        elif minute >= start or minute < end:
+            return True
+    return False
+
+
+def fair_shares(total, caps):
+    """
+    Répartit un débit total entre des jobs (partage max-min équitable)
+
+    Un job plafonné sous sa part égale ne prend que son plafond ; le reste
+    est redistribué aux autres.
+
+    Args:
+        total (float): Débit à répartir (octets/s)
+        caps (dict): job_id -> plafond propre du job (None = aucun)
+
+    Returns:
+        dict: job_id -> débit attribué (octets/s)
+    """
+    shares = {}
+    remaining = float(total)
+    ordered = sorted(caps.items(), key=lambda item: float('inf') if item[1] is None else item[1])
+    for index, (job_id, cap) in enumerate(ordered):
+        share = remaining / (len(ordered) - index)
+        if cap is not None:
+            share = min(share, cap)
+        shares[job_id] = share
+        remaining -= share
+    return shares
+
+
+class BandwidthPolicy:
+    """Calcule le débit autorisé de chaque job selon les plafonds et l'heure"""
+
+    def __init__(self, global_limit=0, job_limit=0, bulk_limit=0, off_peak_windows='', bulk_off_peak_only=False):
+        """
+        Args:
+            global_limit (int): Débit total, tous téléchargements confondus (octets/s, 0 = illimité)
+            job_limit (int): Débit maximal d'un job (octets/s, 0 = illimité)
+            bulk_limit (int): Débit maximal d'un job d'album/playlist en heures pleines
+            off_peak_windows (str): Heures creuses, "HH:MM-HH:MM,..."
+            bulk_off_peak_only (bool): Ne démarrer les jobs d'album/playlist qu'en heures creuses
+        """
+        self.global_limit = global_limit or None
+        self.job_limit = job_limit or None
+        self.bulk_limit = bulk_limit or None
+        self.windows = parse_windows(off_peak_windows)
+        self.bulk_off_peak_only = bulk_off_peak_only and bool(self.windows)
+
+    @staticmethod
+    def is_bulk(job):
+        """Job d'album/playlist (par opposition à un morceau demandé seul)"""
+        return bool(job.get('playlist_info'))
+
+    def off_peak(self, now=None):
+        return in_windows(self.windows, now)
+
+    def bulk_allowed(self, now=None):
+        """Les jobs d'album/playlist peuvent-ils démarrer maintenant ?"""
+        return not self.bulk_off_peak_only or self.off_peak(now)
+
+    def job_cap(self, job, off_peak):
+        """Plafond propre d'un job (octets/s), ou None"""
+        if self.is_bulk(job) and off_peak:
+            # Heures creuses : seul un plafond demandé explicitement pour ce job s'applique
+            caps = [job.get('rate_limit')]
+        else:
+            caps = [job.get('rate_limit'), self.job_limit]
+            if self.is_bulk(job):
+                caps.append(self.bulk_limit)
+        caps = [cap for cap in caps if cap]
+        return min(caps) if caps else None
+
+    def limit_for(self, job, active_jobs, now=None):
+        """
+        Débit autorisé d'un job (octets/s), ou None pour pleine vitesse
+
+        Args:
+            job (dict): Job concerné
+            active_jobs (list): Jobs en cours de téléchargement (tous workers)
+        """
+        off_peak = self.off_peak(now)
+        cap = self.job_cap(job, off_peak)
+        if self.global_limit is None or (self.is_bulk(job) and off_peak):
+            return cap
+
+        # Les albums en heures creuses ne comptent pas dans le partage du plafond global
+        sharing = {
+            other['id']: self.job_cap(other, off_peak)
+            for other in active_jobs
+            if not (self.is_bulk(other) and off_peak)
+        }
+        sharing[job['id']] = cap
+        return fair_shares(self.global_limit, sharing)[job['id']]
+
+    def status(self, now=None):
+        return {
+            'global_limit': self.global_limit,
+            'job_limit': self.job_limit,
+            'bulk_limit': self.bulk_limit,
+            'off_peak': self.off_peak(now),
+            'bulk_allowed': self.bulk_allowed(now),
+        }
+
+
+class Throttle:
+    """
+    Limiteur de débit d'un téléchargement, modifiable à chaud
+
+    Partagé par toutes les connexions du job : chacune déclare les octets
+    reçus et attend si le débit dépasse la limite (une seconde de crédit
+    est tolérée pour lisser les à-coups).
+    """
+
+    BURST = 1.0  # Secondes de débit accumulables
+
+    def __init__(self, rate=None):
+        self.rate = rate or None
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def set_rate(self, rate):
+        """Change la limite (octets/s, None = illimité) ; appliquée immédiatement"""
+        with self._lock:
+            self.rate = rate or None
+            self._next = time.monotonic()
+
+    def consume(self, nbytes):
+        """Compte des octets reçus et attend le temps nécessaire pour respecter la limite"""
+        with self._lock:
+            if not self.rate or nbytes <= 0:
+                return
+            now = time.monotonic()
+            self._next = max(self._next, now - self.BURST) + nbytes / self.rate
+            delay = self._next - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def progress_hook(self):
+        """
+        Hook yt-dlp qui limite les downloaders natifs (HTTP, fragments)
+
+        Les progressions marquées 'songsurf_throttled' viennent de
+        RangeDownloader, qui limite lui-même chaque plage.
+        """
+        last = [None]
+
+        def hook(d):
+            if d.get('status') != 'downloading' or d.get('songsurf_throttled'):
+                return
+            downloaded = d.get('downloaded_bytes') or 0
+            if last[0] is not None and downloaded >= last[0]:
+                self.consume(downloaded - last[0])
+            # Premier appel (reprise d'un .part) ou nouveau fichier : point de départ
+            last[0] = downloaded
+
+        return hook
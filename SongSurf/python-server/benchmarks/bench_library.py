@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_library.py - Passage à l'échelle de la bibliothèque (organizer.py)
+
+FONCTIONNALITÉ:
+  - Génère des bibliothèques synthétiques (1k, 10k, 100k morceaux) :
+    petits MP3 valides avec tags ID3 et pochette intégrée, rangés en
+    Artiste/Album/Titre.mp3 comme le fait l'organizer
+  - Mesure à froid (organizer neuf, cache disque vidé si possible) et à
+    chaud (mêmes appels répétés) :
+      stats      -> get_stats()              (GET /stats)
+      structure  -> get_library_structure()  (GET /api/library)
+      cover      -> get_album_cover()        (GET /api/cover/...)
+      organize   -> organize()               (fin de chaque téléchargement)
+  - Résultats JSON avec la révision git : compare.py signale les régressions
+    d'un commit à l'autre
+
+UTILISATION:
+  python benchmarks/bench_library.py [--sizes 1000,10000,100000] [--repeat 5]
+                                     [--library-dir dossier] [--drop-caches]
+  python benchmarks/compare.py avant.json après.json
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TDRC, APIC
+
+from common import percentiles, peak_rss_bytes, write_results, format_bytes
+from fake_youtube import jpeg_bytes, mp3_bytes
+
+# Fichier témoin d'une bibliothèque générée (réutilisée si les paramètres sont identiques)
+MARKER = '.songsurf-bench-library.json'
+COVER_VARIANTS = 16  # Pochettes différentes (le reste est réutilisé, comme les données)
+
+
+def drop_page_cache():
+    """Vide le cache disque du noyau (Linux, root) ; False si impossible"""
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as drop:
+            drop.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def tag_bytes(title, artist, album, year, cover):
+    """Tag ID3v2.4 complet (titre, artiste, album, année, pochette)"""
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=title))
+    tags.add(TPE1(encoding=3, text=artist))
+    tags.add(TALB(encoding=3, text=album))
+    tags.add(TDRC(encoding=3, text=year))
+    if cover:
+        tags.add(APIC(encoding=3, mime='image/jpeg', type=3, desc='Cover', data=cover))
+    buffer = io.BytesIO()
+    tags.save(buffer, padding=lambda info: 0)
+    return buffer.getvalue()
+
+
+def generate_library(music_dir, tracks, tracks_per_album=12, albums_per_artist=3,
+                     seconds=0.1, cover_size=64):
+    """
+    Bibliothèque synthétique Artiste/Album/Titre.mp3 (réutilisée si déjà générée)
+
+    Returns:
+        dict: {tracks, albums, artists, bytes, generate_seconds, reused}
+    """
+    music_dir = Path(music_dir)
+    parameters = {'tracks': tracks, 'tracks_per_album': tracks_per_album,
+                  'albums_per_artist': albums_per_artist, 'seconds': seconds, 'cover_size': cover_size}
+    marker = music_dir / MARKER
+    if marker.exists():
+        summary = json.loads(marker.read_text())
+        if summary.get('parameters') == parameters:
+            return {**summary['library'], 'generate_seconds': 0, 'reused': True}
+        shutil.rmtree(music_dir)
+
+    started = time.perf_counter()
+    audio = mp3_bytes(seconds)
+    covers = [jpeg_bytes(cover_size, cover_size, seed) for seed in range(COVER_VARIANTS)] if cover_size else [None]
+    albums = artists = size = 0
+    for index in range(tracks):
+        album_index, track = divmod(index, tracks_per_album)
+        artist_index = album_index // albums_per_artist
+        artist = f'Library Artist {artist_index + 1:05d}'
+        album = f'Album {album_index % albums_per_artist + 1:02d}'
+        album_dir = music_dir / artist / album
+        if track == 0:
+            album_dir.mkdir(parents=True, exist_ok=True)
+            albums += 1
+            artists += album_index % albums_per_artist == 0
+        title = f'Track {track + 1:02d}'
+        data = tag_bytes(title, artist, album, str(1970 + album_index % 50),
+                         covers[album_index % len(covers)]) + audio
+        (album_dir / f'{title}.mp3').write_bytes(data)
+        size += len(data)
+
+    library = {'tracks': tracks, 'albums': albums, 'artists': artists, 'bytes': size}
+    marker.write_text(json.dumps({'parameters': parameters, 'library': library}))
+    return {**library, 'generate_seconds': round(time.perf_counter() - started, 3), 'reused': False}
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def fresh_organizer(music_dir, drop_caches):
+    """Organizer neuf (cache des pochettes vide), cache disque vidé si demandé"""
+    from organizer import MusicOrganizer
+    dropped = drop_page_cache() if drop_caches else False
+    return MusicOrganizer(music_dir), dropped
+
+
+def bench_scan(music_dir, method, repeat, drop_caches):
+    """get_stats / get_library_structure : un appel à froid, puis `repeat` appels à chaud"""
+    organizer, dropped = fresh_organizer(music_dir, drop_caches)
+    cold, result = timed(getattr(organizer, method))
+    if result.get('error'):
+        raise RuntimeError(f"{method}: {result['error']}")
+    warm = [timed(getattr(organizer, method))[0] for _ in range(repeat)]
+    return {'cold': round(cold, 4), 'warm': percentiles(warm), 'page_cache_dropped': dropped}, result
+
+
+def bench_covers(music_dir, albums, drop_caches):
+    """get_album_cover sur un échantillon d'albums : passage à froid (cache vide) puis à chaud"""
+    organizer, dropped = fresh_organizer(music_dir, drop_caches)
+    cold = [timed(organizer.get_album_cover, artist, album)[0] for artist, album in albums]
+    warm = [timed(organizer.get_album_cover, artist, album)[0] for artist, album in albums]
+    stats = organizer.cover_cache_stats()
+    return {'albums': len(albums), 'cold': percentiles(cold), 'warm': percentiles(warm),
+            'cache_hits': stats['hits'], 'cache_misses': stats['misses'], 'page_cache_dropped': dropped}
+
+
+def bench_organize(music_dir, albums, count, seconds, thumbnail_size, drop_caches):
+    """
+    organize() de `count` morceaux vers des albums existants (fichier et
+    miniature comme après yt-dlp) ; les morceaux organisés sont supprimés ensuite
+    """
+    organizer, dropped = fresh_organizer(music_dir, drop_caches)
+    staging = Path(tempfile.mkdtemp(prefix='songsurf-bench-organize-'))
+    organized = []
+    try:
+        durations = []
+        for index in range(count):
+            artist, album = albums[index % len(albums)]
+            job_dir = staging / f'job-{index}'
+            job_dir.mkdir()
+            mp3 = job_dir / f'Organize {index:04d}.mp3'
+            mp3.write_bytes(mp3_bytes(seconds))
+            (job_dir / f'Organize {index:04d}.jpg').write_bytes(jpeg_bytes(*thumbnail_size, index % COVER_VARIANTS))
+            metadata = {'artist': artist, 'album': album, 'title': f'Bench Organize {index:04d}', 'year': '2024'}
+            elapsed, result = timed(organizer.organize, mp3, metadata)
+            if not result['success']:
+                raise RuntimeError(f"organize: {result['error']}")
+            organized.append(Path(music_dir) / result['final_path'])
+            durations.append(elapsed)
+        return {'tracks': count, 'first': round(durations[0], 4) if durations else None,
+                'calls': percentiles(durations), 'page_cache_dropped': dropped}
+    finally:
+        for path in organized:
+            path.unlink(missing_ok=True)
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def run_size(music_dir, tracks, args):
+    print(f"\n📚 Bibliothèque de {tracks} morceaux...")
+    library = generate_library(music_dir, tracks, args.tracks_per_album, args.albums_per_artist,
+                               args.seconds, args.cover_size)
+    action = 'réutilisée' if library['reused'] else f"générée en {library['generate_seconds']:.1f}s"
+    print(f"   {library['artists']} artistes, {library['albums']} albums, "
+          f"{format_bytes(library['bytes'])} ({action})")
+
+    stats, result = bench_scan(music_dir, 'get_stats', args.repeat, args.drop_caches)
+    if result['songs'] != tracks:
+        raise RuntimeError(f"get_stats: {result['songs']} morceaux au lieu de {tracks}")
+    structure, result = bench_scan(music_dir, 'get_library_structure', args.repeat, args.drop_caches)
+    structure['payload_bytes'] = len(json.dumps(result))
+
+    all_albums = sorted(
+        (album_dir.parent.name, album_dir.name)
+        for album_dir in Path(music_dir).glob('*/*') if album_dir.is_dir()
+    )
+    sample = random.Random(tracks).sample(all_albums, min(args.cover_albums, len(all_albums)))
+    covers = bench_covers(music_dir, sample, args.drop_caches)
+    organize = bench_organize(music_dir, sample, args.organize, args.seconds,
+                              args.thumbnail, args.drop_caches)
+
+    return {
+        # Durée de génération : informative, hors mesures comparées (voir compare.py)
+        'library': {key: library[key] for key in ('tracks', 'albums', 'artists', 'bytes', 'generate_seconds')},
+        'stats': stats,
+        'structure': structure,
+        'cover': covers,
+        'organize': organize,
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def print_report(results):
+    print(f"\n{'Morceaux':>10}  {'Opération':<12}{'froid':>10}{'chaud p50':>11}{'chaud p99':>11}")
+    for tracks, result in results['sizes'].items():
+        rows = [
+            ('stats', result['stats']['cold'], result['stats']['warm']),
+            ('structure', result['structure']['cold'], result['structure']['warm']),
+            ('cover', result['cover']['cold'].get('p50'), result['cover']['warm']),
+            ('organize', result['organize']['first'], result['organize']['calls']),
+        ]
+        for name, cold, warm in rows:
+            print(f"{tracks:>10}  {name:<12}{cold or 0:>10.4f}{warm.get('p50', 0):>11.4f}{warm.get('p99', 0):>11.4f}")
+    print("\n(secondes ; cover : p50 par album, à froid = cache des pochettes vide ; "
+          "organize : à froid = premier appel)")
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height or width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - benchmark de la bibliothèque (1k, 10k, 100k morceaux)')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Tailles de bibliothèque (morceaux)')
+    parser.add_argument('--tracks-per-album', type=int, default=12)
+    parser.add_argument('--albums-per-artist', type=int, default=3)
+    parser.add_argument('--seconds', type=float, default=0.1, help='Durée de chaque MP3 (taille des fichiers)')
+    parser.add_argument('--cover-size', type=int, default=64, help='Côté des pochettes intégrées (0 = aucune)')
+    parser.add_argument('--repeat', type=int, default=5, help='Appels à chaud de stats et structure')
+    parser.add_argument('--cover-albums', type=int, default=200, help='Albums interrogés pour les pochettes')
+    parser.add_argument('--organize', type=int, default=50, help='Morceaux organisés par taille')
+    parser.add_argument('--thumbnail', type=parse_size, default=(1280, 720), help='Miniature yt-dlp (LxH)')
+    parser.add_argument('--drop-caches', action='store_true',
+                        help='Vider le cache disque avant chaque mesure à froid (Linux, root)')
+    parser.add_argument('--library-dir', default=None,
+                        help='Dossier des bibliothèques générées, conservé et réutilisé (défaut: temporaire)')
+    parser.add_argument('--output', default=None, help='Fichier JSON des résultats')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    root = Path(args.library_dir) if args.library_dir else Path(tempfile.mkdtemp(prefix='songsurf-bench-library-'))
+    if args.drop_caches and not drop_page_cache():
+        print("⚠️ Impossible de vider le cache disque (root requis) : mesures à froid avec cache chaud")
+
+    try:
+        results = {
+            'parameters': {
+                'sizes': sizes, 'tracks_per_album': args.tracks_per_album,
+                'albums_per_artist': args.albums_per_artist, 'seconds_per_track': args.seconds,
+                'cover_size': args.cover_size, 'repeat': args.repeat, 'cover_albums': args.cover_albums,
+                'organize': args.organize, 'thumbnail': list(args.thumbnail), 'drop_caches': args.drop_caches,
+            },
+            'sizes': {str(tracks): run_size(root / str(tracks), tracks, args) for tracks in sizes},
+        }
+    finally:
+        if not args.library_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_report(results)
+    path = write_results('library', results, args.output)
+    print(f"\n💾 Résultats: {path}")
+
+
+if __name__ == '__main__':
+    main()
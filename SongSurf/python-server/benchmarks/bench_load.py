@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_load.py - Test de charge de l'API (N clients simultanés)
+
+FONCTIONNALITÉ:
+  - Lance le serveur de test (load_server.py : vraie API servie par
+    waitress, téléchargeur factice) dans un processus séparé, ou vise un
+    serveur déjà lancé (--url)
+  - Simule N clients simultanés selon un scénario (benchmarks/scenarios/*.json) :
+    chaque client enchaîne des requêtes tirées au sort (poids), séparées
+    d'un temps de réflexion, sur une connexion keep-alive
+  - Paliers de clients (--clients 10,50,100) : débit, p50/p99 par endpoint,
+    et le palier où la latence s'effondre
+  - Résultats JSON avec la révision git (compare.py)
+
+UTILISATION:
+  python benchmarks/bench_load.py [--scenario mixed] [--clients 10,50,100]
+                                  [--duration 30] [--threads 16] [--url http://localhost:8080]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote, urlparse
+
+from common import (
+    BENCH_DIR, use_data_dir, remove_data_dir, percentiles, process_peak_rss, write_results, format_bytes
+)
+
+SCENARIOS_DIR = BENCH_DIR / "scenarios"
+
+
+def load_scenario(name):
+    """Scénario par nom (benchmarks/scenarios/<nom>.json) ou par chemin"""
+    path = Path(name)
+    if not path.exists():
+        path = SCENARIOS_DIR / f'{name}.json'
+    scenario = json.loads(path.read_text())
+    scenario['name'] = path.stem
+    for entry in scenario['requests']:
+        entry.setdefault('method', 'GET')
+        entry.setdefault('weight', 1)
+    return scenario
+
+
+def start_server(data_dir, port, threads, workers, download_seconds, library_tracks):
+    """Lance load_server.py et attend qu'il réponde à /ping"""
+    log = open(Path(data_dir) / 'server.log', 'w')
+    process = subprocess.Popen(
+        [sys.executable, str(BENCH_DIR / 'load_server.py'), '--port', str(port), '--threads', str(threads),
+         '--workers', str(workers), '--download-seconds', str(download_seconds),
+         '--library-tracks', str(library_tracks)],
+        stdout=log, stderr=subprocess.STDOUT, env=os.environ.copy()
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le serveur de test s'est arrêté (voir {log.name})")
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/ping')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('Le serveur de test ne répond pas')
+
+
+def cover_names(host, port):
+    """Noms /api/cover/<Artiste_Album>.jpg des albums de la bibliothèque"""
+    connection = http.client.HTTPConnection(host, port, timeout=120)
+    connection.request('GET', '/api/library')
+    library = json.loads(connection.getresponse().read())
+    return [quote(f"{album['artist']}_{album['name']}.jpg") for album in library['albums']] or ['none_none.jpg']
+
+
+def format_body(template, values):
+    if isinstance(template, str):
+        return template.format(**values)
+    if isinstance(template, dict):
+        return {key: format_body(value, values) for key, value in template.items()}
+    return template
+
+
+class Client(threading.Thread):
+    """Un client : requêtes tirées au sort selon les poids du scénario, jusqu'à stop"""
+
+    counter = iter(range(1, 10 ** 9))  # Numéros uniques des téléchargements ({n})
+
+    def __init__(self, index, host, port, scenario, covers, stop, timeout):
+        super().__init__(name=f'client-{index}', daemon=True)
+        self.index = index
+        self.host, self.port = host, port
+        self.scenario = scenario
+        self.covers = covers
+        self.stop = stop
+        self.timeout = timeout
+        self.random = random.Random(index)
+        self.samples = []  # (endpoint, début, durée, code HTTP ou None)
+        self.connection = None
+
+    def request(self, entry):
+        values = {'client': self.index, 'n': next(self.counter), 'cover': self.random.choice(self.covers)}
+        path = entry['path'].format(**values)
+        body = headers = None
+        if 'body' in entry:
+            body = json.dumps(format_body(entry['body'], values))
+            headers = {'Content-Type': 'application/json'}
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(entry['method'], path, body=body, headers=headers or {})
+            response = self.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = None
+            self.connection.close()
+            self.connection = None
+        self.samples.append((entry['name'], started, time.perf_counter() - started, status))
+
+    def run(self):
+        entries = self.scenario['requests']
+        weights = [entry['weight'] for entry in entries]
+        think_time = self.scenario.get('think_time', 1.0)
+        # Départs étalés : les clients ne tapent pas tous à la même milliseconde
+        if self.stop.wait(self.random.uniform(0, think_time)):
+            return
+        while not self.stop.is_set():
+            self.request(self.random.choices(entries, weights)[0])
+            self.stop.wait(think_time * self.random.uniform(0.5, 1.5))
+        if self.connection is not None:
+            self.connection.close()
+
+
+def summarize(samples, since, until):
+    """Mesures par endpoint sur la fenêtre [since, until] (hors montée en charge)"""
+    elapsed = until - since
+    window = [sample for sample in samples if since <= sample[1] < until]
+    endpoints = {}
+    for name in sorted({sample[0] for sample in window}):
+        selected = [sample for sample in window if sample[0] == name]
+        statuses = {}
+        for sample in selected:
+            key = str(sample[3]) if sample[3] is not None else 'error'
+            statuses[key] = statuses.get(key, 0) + 1
+        endpoints[name] = {
+            'requests': len(selected),
+            'requests_per_second': round(len(selected) / elapsed, 2),
+            'errors': sum(1 for sample in selected if sample[3] is None or sample[3] >= 500),
+            'statuses': statuses,
+            'latency': percentiles([sample[2] for sample in selected]),
+        }
+    return {
+        'requests': len(window),
+        'requests_per_second': round(len(window) / elapsed, 2) if elapsed else 0,
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'latency': percentiles([sample[2] for sample in window]),
+        'endpoints': endpoints,
+    }
+
+
+def run_step(clients, host, port, scenario, covers, warmup, duration, timeout):
+    """Un palier : `clients` clients pendant warmup + duration secondes"""
+    stop = threading.Event()
+    cpu_before = os.times()
+    pool = [Client(index, host, port, scenario, covers, stop, timeout) for index in range(1, clients + 1)]
+    for client in pool:
+        client.start()
+    started = time.perf_counter()
+    time.sleep(warmup + duration)
+    stop.set()
+    for client in pool:
+        client.join(timeout=timeout + 5)
+    cpu_after = os.times()
+    samples = [sample for client in pool for sample in client.samples]
+    result = summarize(samples, started + warmup, started + warmup + duration)
+    result['clients'] = clients
+    # Un générateur saturé (GIL) mesure sa propre lenteur, pas celle du serveur
+    cpu = (cpu_after.user - cpu_before.user) + (cpu_after.system - cpu_before.system)
+    result['generator_cpu'] = round(cpu / (time.perf_counter() - started), 2)
+    return result
+
+
+def saturation(steps, factor=2.0):
+    """Premier palier où le débit ne suit plus et la latence p99 a au moins doublé"""
+    for previous, step in zip(steps, steps[1:]):
+        gained = step['requests_per_second'] / previous['requests_per_second'] if previous['requests_per_second'] else 0
+        slower = step['latency'].get('p99', 0) / previous['latency']['p99'] if previous['latency'].get('p99') else 0
+        if slower >= factor and gained < step['clients'] / previous['clients'] * 0.8:
+            return step['clients']
+    return None
+
+
+def print_step(step):
+    print(f"\n👥 {step['clients']} clients : {step['requests_per_second']} req/s, "
+          f"{step['errors']} erreur(s), CPU du générateur {step['generator_cpu']:.0%}")
+    print(f"   {'Endpoint':<12}{'req/s':>9}{'p50 (ms)':>11}{'p99 (ms)':>11}{'max (ms)':>11}  codes")
+    for name, endpoint in step['endpoints'].items():
+        latency = endpoint['latency']
+        print(f"   {name:<12}{endpoint['requests_per_second']:>9}"
+              + ''.join(f"{latency.get(key, 0) * 1000:>11.1f}" for key in ('p50', 'p99', 'max'))
+              + f"  {endpoint['statuses']}")
+    if step['generator_cpu'] > 0.8:
+        print("   ⚠️ Générateur de charge proche de la saturation : latences surestimées")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - test de charge de l\'API')
+    parser.add_argument('--scenario', default='mixed', help='Nom (benchmarks/scenarios/) ou chemin du scénario')
+    parser.add_argument('--clients', default='10,50,100', help='Paliers de clients simultanés')
+    parser.add_argument('--duration', type=float, default=30, help='Durée mesurée de chaque palier (secondes)')
+    parser.add_argument('--warmup', type=float, default=5, help='Montée en charge non mesurée (secondes)')
+    parser.add_argument('--timeout', type=float, default=30, help='Délai maximal d\'une requête')
+    parser.add_argument('--url', default=None, help='Serveur déjà lancé (sinon: load_server.py local)')
+    parser.add_argument('--port', type=int, default=8765, help='Port du serveur local')
+    parser.add_argument('--threads', type=int, default=16, help='Threads HTTP du serveur local')
+    parser.add_argument('--workers', type=int, default=2, help='Workers du serveur local')
+    parser.add_argument('--download-seconds', type=float, default=2.0, help='Durée d\'un téléchargement factice')
+    parser.add_argument('--library-tracks', type=int, default=1000, help='Taille de la bibliothèque du serveur local')
+    parser.add_argument('--keep', action='store_true', help='Conserver le dossier de données (et server.log)')
+    parser.add_argument('--output', default=None, help='Fichier JSON des résultats')
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    steps_clients = [int(count) for count in args.clients.split(',') if count.strip()]
+    server = data_dir = None
+    if args.url:
+        target = urlparse(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        data_dir = use_data_dir()
+        server = start_server(data_dir, port, args.threads, args.workers, args.download_seconds,
+                              args.library_tracks)
+
+    try:
+        print(f"🎯 Scénario {scenario['name']} : {scenario.get('description', '')}")
+        covers = cover_names(host, port)
+        steps = []
+        for clients in steps_clients:
+            step = run_step(clients, host, port, scenario, covers, args.warmup, args.duration, args.timeout)
+            if server is not None:
+                step['server_peak_rss_bytes'] = process_peak_rss(server.pid)
+            print_step(step)
+            steps.append(step)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        if data_dir is not None:
+            if args.keep:
+                print(f"📁 Données conservées: {data_dir}")
+            else:
+                remove_data_dir(data_dir)
+
+    saturated = saturation(steps)
+    if saturated:
+        print(f"\n📉 Latence effondrée à partir de {saturated} clients")
+    if server is not None and steps:
+        print(f"🧠 Mémoire résidente maximale du serveur: {format_bytes(steps[-1]['server_peak_rss_bytes'])}")
+
+    results = {
+        'parameters': {
+            'scenario': scenario, 'clients': steps_clients, 'duration': args.duration, 'warmup': args.warmup,
+            'server': args.url or {'threads': args.threads, 'workers': args.workers,
+                                   'download_seconds': args.download_seconds,
+                                   'library_tracks': args.library_tracks},
+        },
+        # Paliers indexés par nombre de clients : compare.py les met en regard
+        'steps': {str(step['clients']): step for step in steps},
+        'saturation_clients': saturated,
+    }
+    path = write_results('load', results, args.output)
+    print(f"\n💾 Résultats: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+bench_pipeline.py - Débit de bout en bout : /download → worker → yt-dlp → organisation
+
+FONCTIONNALITÉ:
+  - Envoie chaque morceau d'albums fictifs sur POST /download (vraie API
+    Flask, contrôle d'admission, queue persistante)
+  - Les workers (threads, ou vrais processus comme serve.py) traitent la
+    queue avec le vrai YouTubeDownloader (yt-dlp, connexions parallèles)
+    et le vrai MusicOrganizer (pochette Pillow, tags mutagen, déplacement)
+  - Les morceaux viennent du faux YouTube local (fake_youtube.py) : aucun
+    accès réseau, aucune dépendance à FFmpeg (les morceaux sont déjà en MP3)
+  - Rapporte morceaux/minute, percentiles de chaque étape (chronologie des
+    jobs, tracing.py), latence de bout en bout et mémoire résidente maximale
+
+UTILISATION:
+  python benchmarks/bench_pipeline.py [--albums 2] [--tracks 12] [--workers 2]
+                                      [--processes] [--seconds 180] [--cover 1280x720]
+                                      [--rate 0] [--connections 4] [--output fichier.json]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime
+
+from common import (
+    use_data_dir, remove_data_dir, percentiles, peak_rss_bytes, process_peak_rss,
+    write_results, format_bytes
+)
+from fake_youtube import catalog, start_in_subprocess
+
+STAGES = ('queue', 'extract', 'fetch', 'transcode', 'cover', 'tag', 'move')
+
+
+def start_thread_workers(api, count):
+    """Workers dans des threads du processus (comme python app.py, mais plusieurs)"""
+    import config
+    from engine import Engine
+    from job_store import JobStore
+    from downloader import YouTubeDownloader
+    from organizer import MusicOrganizer
+    from admission import DiskAdmission
+    from metrics import StoreMetrics
+
+    for index in range(1, count + 1):
+        # Une connexion à la queue et un downloader par worker, comme un processus de serve.py
+        store = JobStore(config.JOBS_DB)
+        engine = Engine(
+            store,
+            YouTubeDownloader(config.TEMP_DIR, config.MUSIC_DIR,
+                              connections_per_download=config.CONNECTIONS_PER_DOWNLOAD,
+                              max_connections=max(1, config.MAX_CONNECTIONS // count)),
+            MusicOrganizer(config.MUSIC_DIR),
+            DiskAdmission(config.TEMP_DIR, config.MUSIC_DIR, min_free_bytes=config.MIN_FREE_BYTES),
+            name=f'worker-{index}', wakeup=api.job_available, metrics=StoreMetrics(store)
+        )
+        threading.Thread(target=engine.run, name=f'worker-{index}', daemon=True).start()
+
+
+def start_process_workers(api, count):
+    """Workers dans des processus séparés (comme python serve.py)"""
+    import config
+    from serve import WorkerPool
+
+    pool = WorkerPool(api.job_store, count, max_connections=max(1, config.MAX_CONNECTIONS // count))
+    pool.start()
+    return pool
+
+
+def enqueue(client, base_url, songs, connections=None):
+    """POST /download pour chaque morceau, en attendant quand la queue est pleine"""
+    refused = 0
+    for song in songs:
+        body = {
+            'url': f"{base_url}/watch?v={song['id']}",
+            'title': song['title'],
+            'artist': song['artist'],
+            'album': song['album'],
+            'year': song['year'],
+        }
+        if connections:
+            body['connections'] = connections
+        while True:
+            response = client.post('/download', json=body)
+            if response.status_code != 429:
+                break
+            refused += 1
+            time.sleep(0.1)
+        if response.status_code != 200:
+            raise RuntimeError(f"/download a répondu {response.status_code}: {response.get_json()}")
+    return refused
+
+
+def collect(store, terminal_states):
+    """Chronologie et issue de chaque job terminé"""
+    jobs = store.list(states=terminal_states)
+    stages = {stage: [] for stage in STAGES}
+    end_to_end = []
+    for job in jobs:
+        for span in job.get('trace') or []:
+            stages.setdefault(span['stage'], []).append(span['seconds'])
+        if job['state'] == 'completed':
+            end_to_end.append(
+                (datetime.fromisoformat(job['updated_at']) - datetime.fromisoformat(job['added_at'])).total_seconds()
+            )
+    return jobs, stages, end_to_end
+
+
+def run(args):
+    data_dir = use_data_dir(args.data_dir, log_level=args.log_level)
+    songs = catalog(args.albums, args.tracks)
+    server, base_url = start_in_subprocess(
+        songs, seconds=args.seconds, cover_size=args.cover, rate=args.rate
+    )
+    pool = None
+    try:
+        import app as api
+        from job_store import TERMINAL_STATES
+
+        client = api.app.test_client()
+        if args.processes:
+            pool = start_process_workers(api, args.workers)
+        else:
+            start_thread_workers(api, args.workers)
+
+        worker_peaks = {}
+        started = time.time()
+        feeder_result = {}
+        feeder = threading.Thread(
+            target=lambda: feeder_result.update(refused=enqueue(client, base_url, songs, args.connections)),
+            name='feeder', daemon=True
+        )
+        feeder.start()
+
+        # Attendre que tous les jobs soient terminés (en relevant la mémoire des workers)
+        deadline = started + args.timeout
+        while True:
+            done = sum(api.job_store.count(state) for state in TERMINAL_STATES)
+            for worker in api.job_store.workers():
+                peak = process_peak_rss(worker['pid']) if args.processes else None
+                if peak:
+                    worker_peaks[worker['name']] = max(peak, worker_peaks.get(worker['name'], 0))
+            if done >= len(songs) and not feeder.is_alive():
+                break
+            if time.time() > deadline:
+                print(f"⚠️ Délai dépassé: {done}/{len(songs)} jobs terminés", file=sys.stderr)
+                break
+            time.sleep(0.2)
+        elapsed = time.time() - started
+
+        jobs, stages, end_to_end = collect(api.job_store, TERMINAL_STATES)
+        completed = sum(1 for job in jobs if job['state'] == 'completed')
+        results = {
+            'parameters': {
+                'albums': args.albums, 'tracks_per_album': args.tracks, 'workers': args.workers,
+                'mode': 'processes' if args.processes else 'threads', 'seconds_per_track': args.seconds,
+                'cover': list(args.cover), 'rate_per_connection': args.rate, 'connections': args.connections,
+            },
+            'tracks': len(songs),
+            'completed': completed,
+            'failed': len(jobs) - completed,
+            'errors': sorted({job['error'] for job in jobs if job.get('error')})[:10],
+            'elapsed_seconds': round(elapsed, 3),
+            'tracks_per_minute': round(completed * 60 / elapsed, 2) if elapsed else 0,
+            'queue_full_retries': feeder_result.get('refused', 0),
+            'end_to_end': percentiles(end_to_end),
+            'stages': {stage: percentiles(values) for stage, values in stages.items() if values},
+            'peak_rss_bytes': {
+                'api': peak_rss_bytes(),
+                **({name: peak for name, peak in sorted(worker_peaks.items())} if args.processes else {}),
+            },
+        }
+        return results
+    finally:
+        if pool is not None:
+            pool.stop()
+        server.terminate()
+        if not args.keep:
+            remove_data_dir(data_dir)
+        else:
+            print(f"📁 Données conservées: {data_dir}")
+
+
+def print_report(results):
+    print(f"\n🏁 {results['completed']}/{results['tracks']} morceaux en {results['elapsed_seconds']:.1f}s "
+          f"→ {results['tracks_per_minute']} morceaux/min "
+          f"({results['parameters']['workers']} worker(s), {results['parameters']['mode']})")
+    if results['failed']:
+        print(f"❌ {results['failed']} échec(s): {results['errors']}")
+    print(f"\n{'Étape':<12}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    rows = list(results['stages'].items()) + [('bout en bout', results['end_to_end'])]
+    for stage, stats in rows:
+        if stats.get('count'):
+            print(f"{stage:<12}{stats['count']:>6}" + ''.join(f"{stats[key]:>10.3f}" for key in ('p50', 'p90', 'p99', 'max')))
+    print('\nMémoire résidente maximale: ' + ', '.join(
+        f'{name} {format_bytes(size)}' for name, size in results['peak_rss_bytes'].items()))
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height or width)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - benchmark du pipeline complet (hors ligne)')
+    parser.add_argument('--albums', type=int, default=2)
+    parser.add_argument('--tracks', type=int, default=12, help='Morceaux par album')
+    parser.add_argument('--workers', type=int, default=2, help='Jobs traités en parallèle')
+    parser.add_argument('--processes', action='store_true', help='Workers en processus séparés (comme serve.py)')
+    parser.add_argument('--seconds', type=float, default=180, help='Durée de chaque morceau (taille du MP3)')
+    parser.add_argument('--cover', type=parse_size, default=(1280, 720), help='Taille des pochettes (LxH)')
+    parser.add_argument('--rate', type=int, default=0, help='Débit par connexion (octets/s, 0 = illimité)')
+    parser.add_argument('--connections', type=int, default=None, help='Connexions par morceau (défaut: config)')
+    parser.add_argument('--timeout', type=float, default=600, help='Durée maximale du benchmark (secondes)')
+    parser.add_argument('--log-level', default='ERROR')
+    parser.add_argument('--data-dir', default=None, help='Dossier de données (défaut: dossier temporaire)')
+    parser.add_argument('--keep', action='store_true', help='Conserver le dossier de données')
+    parser.add_argument('--output', default=None, help='Fichier JSON des résultats')
+    args = parser.parse_args()
+
+    results = run(args)
+    print_report(results)
+    path = write_results('pipeline', results, args.output)
+    print(f"\n💾 Résultats: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+common.py - Outils partagés par les benchmarks
+
+FONCTIONNALITÉ:
+  - Dossier de données jetable (SONGSURF_DATA_DIR) : un benchmark ne
+    touche jamais à la vraie bibliothèque ni à la vraie queue
+  - Percentiles, mémoire résidente maximale (processus et workers)
+  - Résultats en JSON, avec la révision git, pour comparer deux commits
+"""
+
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SERVER_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Les modules du serveur (config, app, engine...) sont importés depuis python-server/
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+
+def use_data_dir(path=None, log_level='WARNING'):
+    """
+    Redirige temp/, music/ et state/ vers un dossier jetable
+
+    À appeler AVANT d'importer config (ou tout module du serveur) : les
+    processus workers lancés ensuite héritent de l'environnement.
+
+    Returns:
+        Path: Le dossier de données
+    """
+    data_dir = Path(path) if path else Path(tempfile.mkdtemp(prefix='songsurf-bench-'))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    os.environ['SONGSURF_DATA_DIR'] = str(data_dir)
+    os.environ.setdefault('SONGSURF_LOG_LEVEL', log_level)
+    return data_dir
+
+
+def remove_data_dir(data_dir):
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """
+    Percentiles (méthode du rang le plus proche), moyenne et maximum
+
+    Returns:
+        dict: {count, mean, p50, p90, p99, max} (secondes arrondies), ou {count: 0}
+    """
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    result = {'count': len(values), 'mean': round(sum(values) / len(values), 4)}
+    for point in points:
+        rank = max(1, -(-point * len(values) // 100))  # Arrondi supérieur
+        result[f'p{point}'] = round(values[rank - 1], 4)
+    result['max'] = round(values[-1], 4)
+    return result
+
+
+def peak_rss_bytes():
+    """Mémoire résidente maximale du processus courant"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Ko sous Linux
+
+
+def process_peak_rss(pid):
+    """Mémoire résidente maximale d'un autre processus (Linux, /proc), ou None"""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def git_revision():
+    """Commit courant (court), suffixé de '+' si l'arbre est modifié, ou None"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVER_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SERVER_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return revision + ('+' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Machine et versions : deux résultats ne se comparent que sur la même machine"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'revision': git_revision(),
+    }
+
+
+def write_results(name, results, output=None):
+    """
+    Enregistre les résultats d'un benchmark en JSON
+
+    Args:
+        name (str): Nom du benchmark (pipeline, library, load...)
+        output (str): Fichier de sortie (défaut : benchmarks/results/<nom>-<date>-<révision>.json)
+
+    Returns:
+        Path: Le fichier écrit
+    """
+    results = {'benchmark': name, 'date': datetime.now().isoformat(timespec='seconds'),
+               'environment': environment(), **results}
+    if output:
+        path = Path(output)
+    else:
+        revision = (results['environment']['revision'] or 'norev').replace('+', '-dirty')
+        path = RESULTS_DIR / f"{name}-{datetime.now():%Y%m%d-%H%M%S}-{revision}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+    return path
+
+
+def format_bytes(size):
+    return f'{size / 1024 ** 2:.1f} Mo' if size is not None else '?'
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+compare.py - Compare deux résultats de benchmark (deux commits)
+
+FONCTIONNALITÉ:
+  - Met en regard chaque mesure de deux fichiers JSON du même benchmark
+    (durées, percentiles, débits)
+  - Signale les régressions au-delà d'un seuil relatif ; code de sortie 1
+    s'il y en a (utilisable dans un script avant de fusionner)
+  - Avertit si les deux résultats viennent de machines différentes
+
+UTILISATION:
+  python benchmarks/compare.py avant.json après.json [--threshold 0.2] [--all]
+"""
+
+import argparse
+import json
+import sys
+
+# Mesures où plus grand = mieux (le reste : des durées, plus petit = mieux)
+HIGHER_IS_BETTER = ('tracks_per_minute', 'requests_per_second')
+# Durées : clés des percentiles et des mesures uniques
+TIMING_KEYS = ('mean', 'p50', 'p90', 'p99', 'max', 'cold', 'first')
+IGNORED = ('benchmark', 'date', 'environment', 'parameters')
+# Mesures informatives (préparation du benchmark, pas le code mesuré)
+NOT_COMPARED = ('generate_seconds',)
+
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1} (valeurs numériques seulement)"""
+    values = {}
+    for key, value in results.items():
+        if not prefix and key in IGNORED:
+            continue
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            values.update(flatten(value, f'{path}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[path] = value
+    return values
+
+
+def kind(path):
+    """'higher', 'lower' (durée) ou None (compteur, taille : pas de régression)"""
+    name = path.rsplit('.', 1)[-1]
+    if name in NOT_COMPARED:
+        return None
+    if name in HIGHER_IS_BETTER:
+        return 'higher'
+    if name in TIMING_KEYS or name.endswith('_seconds'):
+        return 'lower'
+    return None
+
+
+def compare(before, after, threshold=0.2, min_delta=0.001):
+    """
+    Returns:
+        list: [{metric, before, after, ratio, regression}, ...] (mesures comparables)
+    """
+    old, new = flatten(before), flatten(after)
+    rows = []
+    for path in sorted(old.keys() & new.keys()):
+        direction = kind(path)
+        if direction is None:
+            continue
+        a, b = old[path], new[path]
+        ratio = b / a if a else None
+        if direction == 'lower':
+            regression = b - a > min_delta and (ratio is None or ratio > 1 + threshold)
+        else:
+            regression = ratio is not None and ratio < 1 - threshold
+        rows.append({'metric': path, 'before': a, 'after': b, 'ratio': ratio, 'regression': regression})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - comparaison de deux résultats de benchmark')
+    parser.add_argument('before', help='Résultat de référence (JSON)')
+    parser.add_argument('after', help='Nouveau résultat (JSON)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Écart relatif toléré (0.2 = 20%%)')
+    parser.add_argument('--min-delta', type=float, default=0.001,
+                        help='Écart absolu ignoré sur les durées (secondes)')
+    parser.add_argument('--all', action='store_true', help='Afficher aussi les mesures stables')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    if before.get('benchmark') != after.get('benchmark'):
+        sys.exit(f"❌ Benchmarks différents: {before.get('benchmark')} / {after.get('benchmark')}")
+    if before.get('parameters') != after.get('parameters'):
+        print("⚠️ Paramètres différents : les mesures ne sont pas directement comparables")
+    machine = ('platform', 'cpus', 'python')
+    if any(before.get('environment', {}).get(key) != after.get('environment', {}).get(key) for key in machine):
+        print("⚠️ Machines ou versions de Python différentes")
+
+    revisions = [result.get('environment', {}).get('revision') or '?' for result in (before, after)]
+    print(f"📊 {before['benchmark']} : {revisions[0]} → {revisions[1]}\n")
+    rows = compare(before, after, args.threshold, args.min_delta)
+    width = max((len(row['metric']) for row in rows), default=10)
+    for row in rows:
+        changed = row['ratio'] is None or abs(row['ratio'] - 1) > args.threshold
+        if not (args.all or row['regression'] or changed):
+            continue
+        mark = '❌' if row['regression'] else ('✅' if changed else '  ')
+        ratio = f"x{row['ratio']:.2f}" if row['ratio'] is not None else '-'
+        print(f"{mark} {row['metric']:<{width}} {row['before']:>12.4f} {row['after']:>12.4f} {ratio:>8}")
+
+    regressions = sum(row['regression'] for row in rows)
+    if regressions:
+        print(f"\n❌ {regressions} régression(s) au-delà de {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\n✅ Aucune régression au-delà de {args.threshold:.0%} ({len(rows)} mesures)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fake_youtube.py - Faux YouTube local pour les benchmarks (hors ligne)
+
+FONCTIONNALITÉ:
+  - Serveur HTTP local qui imite une page de vidéo : /watch?v=<id> renvoie
+    une page HTML (titre, og:image, balise <audio>) que l'extracteur
+    générique de yt-dlp sait lire, comme il lirait une vraie page
+  - /audio/<id>.mp3 : MP3 généré (trames MPEG valides, durée réglable),
+    avec les requêtes Range (connexions parallèles, reprise)
+  - /thumb/<id>.jpg : pochette JPEG générée (taille réglable)
+  - Débit limité par connexion (optionnel) pour imiter un vrai réseau
+  - Peut tourner dans un processus séparé : son CPU et sa mémoire ne
+    faussent pas les mesures du pipeline
+
+UTILISATION:
+  python benchmarks/fake_youtube.py [--albums 2] [--tracks 10] [--port 8765]
+"""
+
+import argparse
+import io
+import multiprocessing
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+# Trame MPEG-1 Layer III, 128 kb/s, 44,1 kHz : 417 octets, 1152 échantillons
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+FRAMES_PER_SECOND = 44100 / 1152
+
+
+@lru_cache(maxsize=8)
+def mp3_bytes(seconds):
+    """Fichier MP3 silencieux de la durée demandée (~16 Ko par seconde)"""
+    return MP3_FRAME * max(1, round(seconds * FRAMES_PER_SECOND))
+
+
+@lru_cache(maxsize=64)
+def jpeg_bytes(width, height, seed=0):
+    """Pochette JPEG (bruit coloré : se compresse mal, comme une vraie photo)"""
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    tint = Image.new('RGB', (width, height), ((seed * 67) % 256, (seed * 131) % 256, (seed * 29) % 256))
+    buffer = io.BytesIO()
+    Image.blend(noise, tint, 0.5).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def catalog(albums, tracks, artist_prefix='Bench Artist'):
+    """
+    Albums fictifs : [{id, title, artist, album, year, album_index}, ...]
+
+    Un artiste sur trois a un featuring (« A & B »), pour que l'organisation
+    passe aussi par la détection des featuring.
+    """
+    songs = []
+    for album_index in range(albums):
+        artist = f'{artist_prefix} {album_index + 1}'
+        if album_index % 3 == 2:
+            artist += f' & Guest {album_index + 1}'
+        for track in range(tracks):
+            songs.append({
+                'id': f'a{album_index}t{track}',
+                'title': f'Track {track + 1:02d}',
+                'artist': artist,
+                'album': f'Album {album_index + 1}',
+                'year': str(2000 + album_index % 25),
+                'album_index': album_index,
+            })
+    return songs
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeYouTube/1.0'
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        parsed = urlparse(self.path)
+        songs = self.server.songs
+        if parsed.path == '/watch':
+            song = songs.get(parse_qs(parsed.query).get('v', [''])[0])
+            if song is None:
+                return self.send_error(404)
+            return self._send(self._page(song).encode(), 'text/html; charset=utf-8', body)
+
+        match = re.fullmatch(r'/(audio|thumb)/(\w+)\.(mp3|jpg)', parsed.path)
+        if not match or match[2] not in songs:
+            return self.send_error(404)
+        if match[1] == 'thumb':
+            width, height = self.server.cover_size
+            return self._send(jpeg_bytes(width, height, songs[match[2]]['album_index']), 'image/jpeg', body)
+        return self._send(mp3_bytes(self.server.seconds), 'audio/mpeg', body, ranges=True)
+
+    def _page(self, song):
+        base = f'http://{self.headers.get("Host")}'
+        return (
+            f'<!DOCTYPE html><html><head><title>{song["title"]}</title>'
+            f'<meta property="og:title" content="{song["title"]}">'
+            f'<meta property="og:image" content="{base}/thumb/{song["id"]}.jpg">'
+            f'</head><body><audio src="{base}/audio/{song["id"]}.mp3" type="audio/mpeg"></audio></body></html>'
+        )
+
+    def _send(self, data, content_type, body, ranges=False):
+        start, end = 0, len(data) - 1
+        requested = self.headers.get('Range') if ranges else None
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', requested or '')
+        if match:
+            start = int(match[1])
+            end = min(int(match[2]), end) if match[2] else end
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        else:
+            self.send_response(200)
+        if ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if body:
+            self._write(memoryview(data)[start:end + 1])
+
+    def _write(self, data):
+        rate = self.server.rate
+        try:
+            if not rate:
+                self.wfile.write(data)
+                return
+            # Débit limité par connexion, par blocs de 1/20 s
+            chunk = max(1024, rate // 20)
+            started = time.monotonic()
+            for offset in range(0, len(data), chunk):
+                self.wfile.write(data[offset:offset + chunk])
+                ahead = (offset + chunk) / rate - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client parti (annulation, délai dépassé)
+
+
+class FakeYouTube:
+    """Serveur HTTP local des morceaux d'un catalogue"""
+
+    def __init__(self, songs, seconds=180, cover_size=(1280, 720), rate=0, host='127.0.0.1', port=0):
+        """
+        Args:
+            songs (list): Morceaux (voir catalog())
+            seconds (float): Durée de chaque MP3
+            cover_size (tuple): Largeur, hauteur des pochettes
+            rate (int): Débit maximal par connexion en octets/s (0 = illimité)
+        """
+        self.httpd = ThreadingHTTPServer((host, port), FakeYouTubeHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.songs = {song['id']: song for song in songs}
+        self.httpd.seconds = seconds
+        self.httpd.cover_size = tuple(cover_size)
+        self.httpd.rate = rate
+        # Générer les fichiers avant les mesures
+        mp3_bytes(seconds)
+        for album_index in {song['album_index'] for song in songs}:
+            jpeg_bytes(*self.httpd.cover_size, album_index)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def watch_url(self, song):
+        return f"{self.base_url}/watch?v={song['id']}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fake-youtube', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _serve(songs, options, ready):
+    server = FakeYouTube(songs, **options).start()
+    ready.put(server.base_url)
+    threading.Event().wait()
+
+
+def start_in_subprocess(songs, **options):
+    """
+    Lance le faux YouTube dans un processus séparé
+
+    Returns:
+        tuple: (processus, URL de base) ; processus.terminate() pour l'arrêter
+    """
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    process = context.Process(target=_serve, args=(songs, options, ready), name='fake-youtube', daemon=True)
+    process.start()
+    return process, ready.get(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Faux YouTube local (benchmarks)')
+    parser.add_argument('--albums', type=int, default=2)
+    parser.add_argument('--tracks', type=int, default=10, help='Morceaux par album')
+    parser.add_argument('--seconds', type=float, default=180, help='Durée de chaque morceau')
+    parser.add_argument('--rate', type=int, default=0, help='Débit par connexion (octets/s, 0 = illimité)')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    songs = catalog(args.albums, args.tracks)
+    server = FakeYouTube(songs, seconds=args.seconds, rate=args.rate, port=args.port)
+    print(f"🎭 Faux YouTube sur {server.base_url} ({len(songs)} morceaux)")
+    for song in songs[:3]:
+        print(f"   {server.watch_url(song)}  {song['artist']} - {song['title']}")
+    server.httpd.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+load_server.py - Serveur SongSurf pour les tests de charge (téléchargeur factice)
+
+FONCTIONNALITÉ:
+  - La vraie API Flask servie par waitress, comme serve.py (mêmes threads
+    HTTP, mêmes services d'arrière-plan)
+  - Les workers (threads) utilisent FakeDownloader : pas de yt-dlp ni de
+    réseau, un « téléchargement » attend un temps fixe puis écrit un petit
+    MP3 et sa miniature ; l'organisation (pochette, tags, déplacement) est
+    la vraie
+  - Bibliothèque synthétique pré-remplie (bench_library.py) pour que
+    /api/library et /api/cover aient du contenu
+  - Lancé par bench_load.py dans un processus séparé, dans un dossier de
+    données jetable (SONGSURF_DATA_DIR)
+
+UTILISATION:
+  SONGSURF_DATA_DIR=/tmp/songsurf-load python benchmarks/load_server.py
+      [--port 8765] [--threads 16] [--workers 2] [--download-seconds 2] [--library-tracks 1000]
+"""
+
+import argparse
+import threading
+import time
+from datetime import datetime
+
+from common import SERVER_DIR  # noqa: F401 (python-server/ dans sys.path)
+from bench_library import generate_library
+from fake_youtube import jpeg_bytes, mp3_bytes
+
+import config
+from downloader import YouTubeDownloader
+from tracing import StageTrace
+
+
+class FakeDownloader(YouTubeDownloader):
+    """Téléchargeur sans réseau : durée fixe, petit MP3 et miniature dans temp/<job_id>/"""
+
+    def __init__(self, *args, seconds=2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seconds = seconds
+
+    def download(self, url, metadata, connections=None, cancel_event=None, progress_hook=None, job_id=None,
+                 throttle=None, trace=None, abort_event=None):
+        if trace is None:
+            trace = StageTrace()
+        work_dir = self.job_temp_dir(job_id)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        downloaded_file = work_dir / f"{self.temp_basename(metadata)}.mp3"
+        cancel_event = cancel_event or threading.Event()
+
+        self.progress.reset()
+        self.progress.status = 'downloading'
+        with trace.span('fetch'):
+            # Attente découpée : progression visible sur /status, annulation prise en compte
+            started = time.time()
+            while not cancel_event.wait(0.1):
+                elapsed = time.time() - started
+                self.progress.percent = min(100, int(elapsed * 100 / self.seconds)) if self.seconds else 100
+                if elapsed >= self.seconds:
+                    break
+        if cancel_event.is_set():
+            self.progress.status = 'cancelled'
+            return {'success': False, 'cancelled': True, 'error': 'Téléchargement annulé par l\'utilisateur'}
+
+        audio = mp3_bytes(1)
+        downloaded_file.write_bytes(audio)
+        downloaded_file.with_suffix('.jpg').write_bytes(jpeg_bytes(320, 180))
+        self.progress.status = 'completed'
+        self.progress.percent = 100
+        return {
+            'success': True,
+            'file_path': str(downloaded_file),
+            'metadata': metadata,
+            'downloaded_bytes': len(audio),
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - serveur de test de charge (téléchargeur factice)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--threads', type=int, default=config.SERVER_THREADS, help='Threads HTTP (waitress)')
+    parser.add_argument('--workers', type=int, default=config.WORKER_PROCESSES, help='Jobs traités en parallèle')
+    parser.add_argument('--download-seconds', type=float, default=2.0, help='Durée d\'un téléchargement factice')
+    parser.add_argument('--library-tracks', type=int, default=1000, help='Morceaux de la bibliothèque pré-remplie')
+    args = parser.parse_args()
+
+    from waitress import serve
+
+    if args.library_tracks:
+        generate_library(config.MUSIC_DIR, args.library_tracks)
+
+    import app as api
+    from engine import Engine
+    from job_store import JobStore
+    from organizer import MusicOrganizer
+    from metrics import StoreMetrics
+
+    api.start_services()
+    for index in range(1, args.workers + 1):
+        store = JobStore(config.JOBS_DB)
+        engine = Engine(
+            store,
+            FakeDownloader(config.TEMP_DIR, config.MUSIC_DIR, seconds=args.download_seconds),
+            MusicOrganizer(config.MUSIC_DIR),
+            api.admission,
+            name=f'worker-{index}', wakeup=api.job_available, breaker=api.breaker,
+            bandwidth=api.bandwidth, metrics=StoreMetrics(store)
+        )
+        threading.Thread(target=engine.run, name=f'worker-{index}', daemon=True).start()
+
+    print(f"🧪 Serveur de charge sur http://{args.host}:{args.port} "
+          f"({args.threads} threads HTTP, {args.workers} worker(s) factice(s))", flush=True)
+    serve(api.app, host=args.host, port=args.port, threads=args.threads, channel_timeout=120,
+          _quiet=True)
+
+
+if __name__ == '__main__':
+    main()
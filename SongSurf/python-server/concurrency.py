@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+concurrency.py - Concurrence adaptative des workers (AIMD)
+
+FONCTIONNALITÉ:
+  - Mesure à intervalles réguliers le débit (octets/s, morceaux/min) et la
+    durée de chaque étape (download, organize) à partir de la queue
+    persistante et des événements des workers
+  - Ajuste le nombre de jobs simultanés entre deux bornes :
+      * +1 tant que des jobs attendent et que le débit progresse
+      * -1 quand un job de plus n'a rien apporté (lien saturé) ou que le
+        processeur est saturé (conversions FFmpeg)
+      * division par deux dès que des erreurs ou une limitation de débit
+        apparaissent (429, anti-bot, disjoncteur ouvert)
+  - La limite est publiée dans la queue : chaque worker la respecte avant
+    de réserver un job (serve.py lance autant de workers que la borne haute)
+"""
+
+import os
+import statistics
+import threading
+import time
+from datetime import datetime
+
+from config import log_message
+
+
+KEY = 'concurrency'  # Clé de la limite dans la queue persistante (kv)
+
+STAGES = ('download', 'organize')
+END_EVENTS = ('job_completed', 'job_failed', 'job_cancelled', 'job_retry')
+# Les échecs définitifs (vidéo privée...) ne disent rien de la capacité : seuls
+# les nouvelles tentatives (erreurs temporaires, jobs bloqués) et le disjoncteur comptent
+ERROR_EVENTS = ('dispatch_paused',)
+
+
+def concurrency_limit(store):
+    """Limite de jobs simultanés en vigueur (None = pas de limite adaptative)"""
+    value = store.get_value(KEY)
+    return value['limit'] if value else None
+
+
+def cpu_load():
+    """Charge moyenne sur 1 minute par cœur, ou None si inconnue"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return None
+
+
+class ConcurrencyController:
+    """Ajuste la concurrence des workers selon le débit, les latences et les erreurs"""
+
+    def __init__(self, store, min_limit=1, max_limit=4, interval=30, backoff=0.5, max_load=0.9,
+                 min_gain=0.05, hold_windows=5, breaker=None, running_state='running', queued_state='queued'):
+        """
+        Args:
+            store (JobStore): Queue persistante (mesures et limite partagée)
+            min_limit (int): Concurrence minimale
+            max_limit (int): Concurrence maximale (nombre de processus workers)
+            interval (float): Secondes entre deux ajustements
+            backoff (float): Facteur de réduction en cas d'erreurs
+            max_load (float): Charge par cœur au-delà de laquelle on réduit
+            min_gain (float): Gain de débit minimal pour garder un job de plus
+            hold_windows (int): Intervalles sans nouvelle hausse après une saturation
+            breaker (CircuitBreaker): Disjoncteur partagé (ouvert = erreurs)
+        """
+        self.store = store
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.interval = interval
+        self.backoff = backoff
+        self.max_load = max_load
+        self.min_gain = min_gain
+        self.hold_windows = hold_windows
+        self.breaker = breaker
+        self.running_state = running_state
+        self.queued_state = queued_state
+
+        self.limit = self.min_limit  # Démarrage prudent, puis montée progressive
+        self._last_seq = store.last_event_seq()
+        self._stage_started = {}   # job_id -> (étape, début)
+        self._bytes_seen = {}      # job_id -> octets téléchargés déjà comptés
+        self._previous = None      # Mesures de l'intervalle précédent
+        self._increased = False    # La limite a été relevée à l'intervalle précédent
+        self._hold = 0
+        self._thread = None
+
+    # ------------------------------------------
+    # Mesures
+    # ------------------------------------------
+
+    def _downloaded_bytes(self, job_ids):
+        """Octets téléchargés depuis la dernière mesure (jobs en cours et jobs terminés)"""
+        total = 0
+        current = {}
+        jobs = self.store.list(states=(self.running_state,))
+        known = {job['id'] for job in jobs}
+        jobs += [job for job in map(self.store.get, job_ids - known) if job is not None]
+        for job in jobs:
+            downloaded = job.get('downloaded_bytes') or 0
+            total += max(0, downloaded - self._bytes_seen.get(job['id'], 0))
+            if job['state'] in (self.running_state, self.queued_state):
+                current[job['id']] = downloaded  # Reprise possible : ne pas recompter
+        self._bytes_seen = current
+        return total
+
+    def sample(self, elapsed):
+        """
+        Lit les événements publiés depuis la dernière mesure
+
+        Returns:
+            dict: {bytes_per_second, tracks_per_minute, latency: {étape: médiane}, errors, ...}
+        """
+        durations = {stage: [] for stage in STAGES}
+        completed = errors = throttled = 0
+        touched = set()
+
+        while True:
+            events = self.store.events_since(self._last_seq)
+            if not events:
+                break
+            for seq, event_type, data in events:
+                self._last_seq = seq
+                job_id = data.get('job_id')
+                try:
+                    at = datetime.fromisoformat(data['timestamp']).timestamp()
+                except (KeyError, TypeError, ValueError):
+                    at = time.time()
+
+                if job_id and (event_type == 'job_stage' or event_type in END_EVENTS):
+                    touched.add(job_id)
+                    started = self._stage_started.pop(job_id, None)
+                    if started is not None and started[0] in durations:
+                        durations[started[0]].append(at - started[1])
+                    if event_type == 'job_stage':
+                        self._stage_started[job_id] = (data.get('stage'), at)
+
+                if event_type == 'job_completed':
+                    completed += 1
+                elif event_type in ERROR_EVENTS:
+                    errors += 1
+                elif event_type == 'job_retry':
+                    if data.get('reason') == 'throttled':
+                        throttled += 1
+                    else:
+                        errors += 1
+
+        breaker_open = self.breaker is not None and self.breaker.status()['state'] != 'closed'
+        elapsed = max(elapsed, 1e-6)
+        return {
+            'bytes_per_second': round(self._downloaded_bytes(touched) / elapsed),
+            'tracks_per_minute': round(completed * 60 / elapsed, 2),
+            'latency': {
+                stage: round(statistics.median(values), 2) if values else None
+                for stage, values in durations.items()
+            },
+            'errors': errors,
+            'throttled': throttled + (1 if breaker_open else 0),
+            'cpu_load': cpu_load(),
+            'running': self.store.count(self.running_state),
+            'queued': self.store.count(self.queued_state),
+        }
+
+    # ------------------------------------------
+    # Décision
+    # ------------------------------------------
+
+    def decide(self, sample):
+        """
+        Nouvelle limite selon les mesures de l'intervalle
+
+        Returns:
+            tuple: (limite, raison)
+        """
+        previous, increased = self._previous, self._increased
+        self._previous, self._increased = sample, False
+
+        if sample['errors'] or sample['throttled']:
+            self._hold = self.hold_windows
+            return max(self.min_limit, int(self.limit * self.backoff)), 'errors'
+
+        load = sample['cpu_load']
+        if load is not None and load > self.max_load:
+            self._hold = self.hold_windows
+            return max(self.min_limit, self.limit - 1), 'cpu'
+
+        if increased and previous is not None:
+            # Le job de plus n'a rien apporté : le goulot est ailleurs (lien, disque)
+            gained = sample['bytes_per_second'] > previous['bytes_per_second'] * (1 + self.min_gain)
+            slower = all(
+                sample['latency'][stage] is None or previous['latency'][stage] is None
+                or sample['latency'][stage] >= previous['latency'][stage]
+                for stage in STAGES
+            )
+            if not gained and slower:
+                self._hold = self.hold_windows
+                return max(self.min_limit, self.limit - 1), 'saturated'
+
+        if self._hold:
+            self._hold -= 1
+            return self.limit, 'hold'
+
+        # Monter seulement si des jobs attendent faute de place
+        if sample['queued'] and sample['running'] >= self.limit and self.limit < self.max_limit:
+            self._increased = True
+            return self.limit + 1, 'probe'
+
+        return self.limit, 'steady'
+
+    def run_once(self, elapsed):
+        sample = self.sample(elapsed)
+        limit, reason = self.decide(sample)
+        if limit != self.limit:
+            log_message('INFO', f'🎚️ Concurrence: {self.limit} → {limit} ({reason})', {
+                'bytes_per_second': sample['bytes_per_second'],
+                'tracks_per_minute': sample['tracks_per_minute'],
+                'latency': sample['latency'],
+                'cpu_load': sample['cpu_load']
+            })
+            self.store.add_event('concurrency_changed', {
+                'previous': self.limit,
+                'limit': limit,
+                'reason': reason,
+                'timestamp': datetime.now().isoformat()
+            })
+        self.limit = limit
+        self.publish(reason, sample)
+
+    def publish(self, reason='start', sample=None):
+        """Écrit la limite (lue par les workers) et les dernières mesures (/status)"""
+        self.store.set_value(KEY, {
+            'limit': self.limit,
+            'min': self.min_limit,
+            'max': self.max_limit,
+            'reason': reason,
+            'sample': sample,
+            'updated_at': datetime.now().isoformat()
+        })
+
+    def start(self):
+        """Démarre les ajustements dans un thread séparé"""
+        if self._thread is not None:
+            return
+        self.publish()
+        self._thread = threading.Thread(target=self._loop, name='concurrency', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        last = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            try:
+                self.run_once(now - last)
+            except Exception as e:
+                log_message('ERROR', f"Erreur dans le contrôle de concurrence: {str(e)}")
+            last = now
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+config.py - Configuration partagée par le serveur API et les workers
+
+FONCTIONNALITÉ:
+  - Dossiers (Docker, local ou SONGSURF_DATA_DIR) et base de la queue persistante
+  - Réglages de la queue, des téléchargements, du disque et des événements
+  - Niveau et format des logs communs à tous les processus
+"""
+
+import os
+from pathlib import Path
+
+# ============================================
+# DOSSIERS
+# ============================================
+
+# Dossier de données imposé (benchmarks, essais) : temp/, music/ et state/ dedans
+DATA_DIR = os.environ.get('SONGSURF_DATA_DIR')
+
+if DATA_DIR:
+    TEMP_DIR = Path(DATA_DIR) / "temp"
+    MUSIC_DIR = Path(DATA_DIR) / "music"
+    STATE_DIR = Path(DATA_DIR) / "state"
+# Détecter si on est dans Docker (chemin /app) ou en local
+elif Path(__file__).parent == Path('/app'):
+    # Docker: utiliser /data
+    TEMP_DIR = Path('/data/temp')
+    MUSIC_DIR = Path('/data/music')
+    STATE_DIR = Path('/data/state')
+else:
+    # Local: utiliser ../temp, ../music et ../state
+    BASE_DIR = Path(__file__).parent.parent
+    TEMP_DIR = BASE_DIR / "temp"
+    MUSIC_DIR = BASE_DIR / "music"
+    STATE_DIR = BASE_DIR / "state"
+
+# Dossier pour les photos d'artistes (dans le dossier music à la racine)
+ARTIST_PHOTOS_DIR = MUSIC_DIR / "artist_photos"
+
+# Queue persistante, partagée entre l'API et les workers
+JOBS_DB = STATE_DIR / "jobs.sqlite3"
+
+# Index de recherche de la bibliothèque (/api/search), reconstruit s'il est supprimé
+SEARCH_DB = STATE_DIR / "library_index.sqlite3"
+
+# Profils CPU et instantanés mémoire (/admin/profiling)
+PROFILES_DIR = STATE_DIR / "profiles"
+
+# Journaux des lots de corrections en cours (/api/apply-corrections), repris au démarrage
+CORRECTIONS_DIR = STATE_DIR / "corrections"
+
+# Créer les dossiers s'ils n'existent pas
+TEMP_DIR.mkdir(parents=True, exist_ok=True)
+MUSIC_DIR.mkdir(parents=True, exist_ok=True)
+STATE_DIR.mkdir(parents=True, exist_ok=True)
+ARTIST_PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
+
+# ============================================
+# SERVEUR
+# ============================================
+
+HOST = 'localhost'
+PORT = 8080
+
+# Mode production (serve.py)
+SERVER_THREADS = 16         # Threads HTTP (chaque connexion /events en occupe un)
+WORKER_PROCESSES = 2        # Processus de téléchargement/organisation
+
+# Recyclage des processus workers (mémoire de yt-dlp, Pillow, mutagen)
+WORKER_MAX_JOBS = 200                   # Nouveau processus après 200 jobs
+WORKER_MAX_RSS_BYTES = 512 * 1024 ** 2  # ...ou au-delà de 512 Mo de mémoire résidente
+
+# Concurrence adaptative (python serve.py --adaptive) : entre MIN_CONCURRENCY
+# et le nombre de processus workers, ajustée selon le débit et les erreurs
+MIN_CONCURRENCY = 1
+ADAPTIVE_INTERVAL = 30          # Secondes entre deux ajustements
+ADAPTIVE_BACKOFF = 0.5          # Erreurs ou limitation de débit : concurrence divisée par 2
+ADAPTIVE_MAX_LOAD = 0.9         # Charge par cœur au-delà de laquelle on réduit (FFmpeg)
+ADAPTIVE_MIN_GAIN = 0.05        # Un job de plus doit apporter au moins 5 % de débit
+
+# ============================================
+# QUEUE ET TÉLÉCHARGEMENTS
+# ============================================
+
+MAX_QUEUE_SIZE = 50  # Augmenté pour supporter les gros albums
+
+# Connexions HTTP parallèles (plages d'octets / fragments)
+CONNECTIONS_PER_DOWNLOAD = 4   # Par morceau (défaut et maximum par job)
+MAX_CONNECTIONS = 8            # Plafond global, tous téléchargements confondus
+
+WORKER_POLL_INTERVAL = 1.0       # Secondes entre deux recherches de job (workers séparés)
+CANCEL_POLL_INTERVAL = 0.5       # Secondes entre deux vérifications d'annulation d'un job
+PROGRESS_STORE_INTERVAL = 0.25   # Progression écrite dans la queue au plus 4 fois/s
+
+# Watchdog : détection des jobs bloqués (socket pendante, FFmpeg figé...)
+STALL_TIMEOUT = 180              # Job sans progression depuis 3 minutes : interrompu
+STALL_MAX_RETRIES = 2            # Nouvelles tentatives d'un job bloqué avant échec
+STALL_ABORT_GRACE = 30           # Job toujours bloqué 30 s après l'interruption : worker arrêté (ou thread remplacé)
+HEARTBEAT_INTERVAL = 5           # Secondes entre deux battements de cœur d'un worker
+WORKER_HEARTBEAT_TIMEOUT = 30    # Worker sans battement de cœur : considéré mort (tué et relancé)
+
+# Nouvelles tentatives (erreurs temporaires) et disjoncteur
+RETRY_MAX_ATTEMPTS = 5           # Tentatives au total pour un job en erreur temporaire
+RETRY_BASE_DELAY = 10            # Premier délai (secondes), doublé à chaque échec, avec gigue
+RETRY_THROTTLED_BASE_DELAY = 60  # Premier délai après une limitation de débit (429, anti-bot)
+RETRY_MAX_DELAY = 900            # Délai maximal entre deux tentatives (15 min)
+BREAKER_FAILURE_THRESHOLD = 5    # Échecs consécutifs avant suspension de la distribution
+BREAKER_COOLDOWN = 60            # Première suspension (secondes), doublée à chaque rechute
+BREAKER_MAX_COOLDOWN = 1800      # Suspension maximale (30 min)
+
+# Bande passante (octets/s, 0 = illimité)
+GLOBAL_RATE_LIMIT = 0            # Débit total, réparti équitablement entre les téléchargements en cours
+JOB_RATE_LIMIT = 0               # Débit maximal d'un job
+BULK_RATE_LIMIT = 0              # Débit maximal d'un job d'album/playlist en heures pleines
+OFF_PEAK_WINDOWS = '01:00-07:00' # Heures creuses : albums/playlists à pleine vitesse ("HH:MM-HH:MM,...")
+BULK_OFF_PEAK_ONLY = False       # Ne démarrer les albums/playlists qu'en heures creuses
+BANDWIDTH_RECHECK = 2            # Secondes entre deux recalculs du débit d'un job
+
+# ============================================
+# DISQUE
+# ============================================
+
+# Nettoyage automatique de temp/ (chaque job travaille dans temp/<job_id>/)
+TEMP_ORPHAN_MAX_AGE = 3600          # Orphelins supprimés après 1h
+TEMP_BUDGET_BYTES = 5 * 1024 ** 3   # 5 Go max pour temp/
+JANITOR_INTERVAL = 300              # Passage toutes les 5 minutes
+
+# Contrôle d'admission selon l'espace disque (temp/ et music/)
+MIN_FREE_BYTES = 1024 ** 3          # Toujours garder 1 Go libre
+DISK_PAUSE_RECHECK = 30             # Secondes entre deux vérifications quand le worker est en pause
+
+# Parcours de la bibliothèque (/stats, /api/library) : dossiers lus en parallèle
+# (à augmenter si music/ est sur un stockage réseau : NFS, SMB)
+LIBRARY_SCAN_WORKERS = 8
+
+# Recherche (/api/search) : index mis à jour après chaque téléchargement terminé,
+# et au moins toutes les SEARCH_REFRESH_INTERVAL secondes (changements faits à la main)
+SEARCH_REFRESH_INTERVAL = 60
+SEARCH_MAX_PER_PAGE = 100
+
+# Corrections de featuring (/api/apply-corrections) : fichiers lus et réécrits en parallèle
+CORRECTION_WORKERS = 8
+
+# ============================================
+# ÉVÉNEMENTS ET EXTRACTION
+# ============================================
+
+# Événements temps réel (/events, Server-Sent Events)
+EVENTS_MIN_INTERVAL = 0.25      # Progression envoyée au plus 4 fois/s par connexion
+EVENTS_KEEPALIVE = 15           # Commentaire keepalive si rien à envoyer (proxys, navigateurs)
+EVENT_RELAY_INTERVAL = 0.25     # Lecture des événements des workers dans la queue persistante
+
+# Extraction des métadonnées en tâche de fond (ne bloque pas les threads HTTP)
+EXTRACTION_WORKERS = 2              # Extractions yt-dlp simultanées
+MAX_PENDING_EXTRACTIONS = 20        # Au-delà, les nouvelles demandes sont refusées (429)
+EXTRACTION_RESULT_TTL = 600         # Résultats conservés 10 minutes
+
+# ============================================
+# ADMINISTRATION ET PROFILAGE
+# ============================================
+
+# Endpoints /admin : jeton attendu dans l'en-tête X-Admin-Token
+# (None = accessibles uniquement depuis la machine locale)
+ADMIN_TOKEN = None
+
+PROFILE_INTERVAL = 0.01         # Relevé des piles toutes les 10 ms (profil CPU)
+PROFILE_MAX_DURATION = 600      # Durée maximale d'un profil CPU (secondes)
+PROFILE_RESULT_GRACE = 30       # Profil toujours « en cours » 30 s après sa fin prévue : processus perdu
+TRACEMALLOC_FRAMES = 10         # Profondeur des piles enregistrées par tracemalloc
+PROFILES_KEEP = 50              # Fichiers de profil conservés dans PROFILES_DIR
+PROFILING_POLL_INTERVAL = 1.0   # Lecture des commandes de profilage par chaque processus
+
+
+# ============================================
+# LOGS
+# ============================================
+
+# Logs structurés, écrits par un thread dédié (voir logs.py)
+LOG_LEVEL = os.environ.get('SONGSURF_LOG_LEVEL', 'INFO')  # DEBUG : détail fichier par fichier (tags, pochettes...)
+LOG_FORMAT = 'text'                                      # text (console) ou json (une ligne JSON par log)
+
+# Ré-exporté ici : utilisé par tous les modules depuis config
+from logs import log_message  # noqa: E402
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+corrections.py - Corrections de featuring en masse, transactionnelles
+
+FONCTIONNALITÉ:
+  - Planifie tout le lot avant de toucher un fichier : tags lus en
+    parallèle (ID3 seul, sans décoder l'audio), une seule fois par
+    fichier (la réécriture modifie ces mêmes tags), destinations calculées
+    comme organize(), collisions détectées en un passage (deux morceaux
+    vers le même fichier, fichier déjà présent) ; une seule correction
+    impossible et rien n'est modifié
+  - Journal d'écriture anticipée (state/corrections/<lot>.json) écrit
+    avant chaque phase : réécriture des tags (en parallèle), puis
+    déplacements
+  - Un échec en cours de lot annule ce qui a été fait (fichiers remis en
+    place, anciens tags restaurés) ; un lot interrompu par un arrêt du
+    serveur est repris au démarrage : annulé s'il en était aux tags,
+    terminé s'il en était aux déplacements
+  - Dossiers vides supprimés une seule fois, en fin de lot
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from mutagen.id3 import ID3, ID3NoHeaderError, TIT2, TPE1
+
+import featuring
+from logs import log_message
+
+
+# Phases d'un lot, enregistrées dans son journal
+TAGGING = 'tagging'   # Tags en cours de réécriture : un lot interrompu est annulé
+MOVING = 'moving'     # Tags réécrits, déplacements en cours : un lot interrompu est terminé
+ROLLING_BACK = 'rolling_back'  # Échec en cours de lot, annulation entamée : elle est reprise
+
+# Champs texte d'une correction (/api/apply-corrections)
+CORRECTION_FIELDS = ('song_path', 'target_artist', 'feat_artist')
+
+
+class CorrectionError(Exception):
+    """Correction impossible (fichier introuvable, collision, nom invalide)"""
+
+
+class BulkCorrections:
+    """Applique des lots de corrections de featuring (/api/apply-corrections)"""
+
+    def __init__(self, organizer, journal_dir, workers=8):
+        """
+        Args:
+            organizer (MusicOrganizer): Bibliothèque (noms de fichiers nettoyés comme organize())
+            journal_dir: Dossier des journaux des lots en cours
+            workers (int): Fichiers lus ou réécrits en parallèle
+        """
+        self.organizer = organizer
+        self.music_dir = Path(organizer.music_dir).resolve()
+        self.journal_dir = Path(journal_dir)
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self._lock = threading.Lock()  # Un lot à la fois
+
+    # ------------------------------------------
+    # Planification
+    # ------------------------------------------
+
+    def plan(self, corrections):
+        """
+        Calcule les opérations d'un lot sans rien modifier
+
+        Args:
+            corrections (list): [{song_path, target_artist, feat_artist}, ...]
+
+        Returns:
+            tuple: (opérations, erreurs, tags) ; erreurs[i] est None si la
+                   correction i est possible, tags[i] sont les tags lus (ID3),
+                   réécrits tels quels par apply
+        """
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='corrections') as pool:
+            planned = list(pool.map(self._plan_one, corrections))
+
+        operations = [operation for operation, _, _ in planned]
+        tags = [file_tags for _, file_tags, _ in planned]
+        errors = [error for _, _, error in planned]
+
+        # Collisions, en un passage : destinations en double, fichiers déjà présents
+        targets = {}
+        sources = {operation['source']: index for index, operation in enumerate(operations) if operation}
+        for index, operation in enumerate(operations):
+            if operation is None:
+                continue
+            source, target = operation['source'], operation['target']
+            if sources[source] != index:
+                errors[index] = f"Morceau déjà corrigé par ce lot: {source}"
+            elif target in targets:
+                errors[index] = f"Même destination qu'une autre correction: {target}"
+            elif target != source and (self.music_dir / target).exists():
+                errors[index] = f"Fichier déjà présent: {target}"
+            targets.setdefault(target, index)
+
+        return operations, errors, tags
+
+    def _plan_one(self, correction):
+        try:
+            return self._operation(correction) + (None,)
+        except CorrectionError as e:
+            return None, None, str(e)
+        except Exception as e:
+            return None, None, f"Correction impossible: {e}"
+
+    def _operation(self, correction):
+        """(opération, tags du fichier) d'une correction"""
+        if not isinstance(correction, dict):
+            raise CorrectionError(f"Correction invalide (objet attendu): {correction!r}")
+        for field in CORRECTION_FIELDS:
+            if correction.get(field) is not None and not isinstance(correction[field], str):
+                raise CorrectionError(f"Champ {field} invalide (texte attendu): {correction[field]!r}")
+        song_path = correction.get('song_path')
+        if not song_path:
+            raise CorrectionError("Champ song_path manquant")
+        source_file = (self.music_dir / song_path).resolve()
+        if self.music_dir not in source_file.parents:
+            raise CorrectionError(f"Chemin hors de la bibliothèque: {song_path}")
+        if not source_file.is_file():
+            raise CorrectionError(f"Fichier introuvable: {source_file}")
+
+        target_artist = self.organizer._clean_filename(correction.get('target_artist') or '')
+        if target_artist in ('', '.', '..'):
+            raise CorrectionError(f"Artiste cible invalide: {correction.get('target_artist')!r}")
+
+        try:
+            tags = _read_tags(source_file)
+        except Exception as e:
+            raise CorrectionError(f"Tags illisibles: {e}")
+        title = _text(tags, 'TIT2') or 'Unknown'
+        album = self.organizer._clean_filename(_text(tags, 'TALB') or 'Unknown') or 'Unknown'
+        new_title = featuring.add_featuring(title, correction.get('feat_artist') or '', target_artist)
+        target_file = Path(target_artist, album, f"{self.organizer._clean_filename(new_title)}.mp3")
+
+        return {
+            'source': str(source_file.relative_to(self.music_dir)),
+            'target': str(target_file),
+            'old_tags': {'TPE1': _text(tags, 'TPE1'), 'TIT2': _text(tags, 'TIT2')},
+            'new_tags': {'TPE1': target_artist, 'TIT2': new_title}
+        }, tags
+
+    # ------------------------------------------
+    # Application
+    # ------------------------------------------
+
+    def apply(self, corrections):
+        """
+        Applique un lot de corrections, entièrement ou pas du tout
+
+        Returns:
+            dict: {success, results: [{success, new_path, old_path} ou {success, error}],
+                   success_count, total, error}
+        """
+        with self._lock:
+            operations, errors, tags = self.plan(corrections)
+            total = len(corrections)
+            if any(errors):
+                results = [{'success': False, 'error': error or 'Lot annulé (autre correction impossible)'}
+                           for error in errors]
+                failed = sum(1 for error in errors if error)
+                return {'success': False, 'results': results, 'success_count': 0, 'total': total,
+                        'error': f"{failed} correction(s) impossible(s), aucune appliquée"}
+
+            journal = {
+                'id': uuid.uuid4().hex[:12],
+                'created_at': datetime.now().isoformat(),
+                'state': TAGGING,
+                'operations': operations
+            }
+            try:
+                self._write_journal(journal)
+                self._rewrite_tags(operations, 'new_tags', tags)
+                journal['state'] = MOVING
+                self._write_journal(journal)
+                self._move_all(operations)
+            except Exception as e:
+                log_message('ERROR', f"❌ Lot de corrections {journal['id']} annulé: {str(e)}")
+                try:
+                    journal['state'] = ROLLING_BACK
+                    self._write_journal(journal)
+                    self._roll_back(journal)
+                except Exception as rollback_error:
+                    # Journal conservé : nouvelle tentative au prochain démarrage (recover)
+                    log_message('ERROR', f"❌ Annulation du lot {journal['id']} incomplète: {str(rollback_error)}")
+                results = [{'success': False, 'error': f"Lot annulé: {e}"} for _ in operations]
+                return {'success': False, 'results': results, 'success_count': 0, 'total': total,
+                        'error': str(e)}
+
+            self._remove_empty_dirs(self.music_dir / operation['source'] for operation in operations)
+            self._journal_path(journal['id']).unlink(missing_ok=True)
+            results = [{
+                'success': True,
+                'new_path': str(self.music_dir / operation['target']),
+                'old_path': str(self.music_dir / operation['source'])
+            } for operation in operations]
+            return {'success': True, 'results': results, 'success_count': total, 'total': total, 'error': None}
+
+    def _rewrite_tags(self, operations, which, tags=None):
+        """
+        Réécrit les tags (TPE1, TIT2) des fichiers en parallèle ; la première erreur est relevée
+
+        Args:
+            tags (list): Tags déjà lus par plan (sinon relus sur disque)
+        """
+        def rewrite(operation, file_tags):
+            _write_tags(self._current_path(operation), operation[which], file_tags)
+
+        tags = tags or [None] * len(operations)
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='corrections') as pool:
+            # Toutes les réécritures se terminent avant de relever une erreur (annulation sur un état stable)
+            futures = [pool.submit(rewrite, operation, file_tags) for operation, file_tags in zip(operations, tags)]
+            failures = [future.exception() for future in futures]
+        for failure in failures:
+            if failure is not None:
+                raise failure
+
+    def _move_all(self, operations):
+        for operation in operations:
+            source = self.music_dir / operation['source']
+            target = self.music_dir / operation['target']
+            if target == source:
+                continue
+            if not source.exists():
+                if target.exists():
+                    continue  # Déjà déplacé (reprise d'un lot interrompu)
+                raise CorrectionError(f"Fichier disparu entre-temps: {operation['source']}")
+            if target.exists():
+                raise CorrectionError(f"Fichier apparu entre-temps: {operation['target']}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(source), str(target))
+
+    def _current_path(self, operation):
+        """Emplacement actuel du fichier d'une opération (avant ou après déplacement)"""
+        source = self.music_dir / operation['source']
+        return source if source.exists() else self.music_dir / operation['target']
+
+    def _roll_back(self, journal):
+        """Remet les fichiers à leur place et restaure leurs anciens tags"""
+        created = []
+        for operation in journal['operations']:
+            source = self.music_dir / operation['source']
+            target = self.music_dir / operation['target']
+            if target != source and target.exists() and not source.exists():
+                source.parent.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(target), str(source))
+                created.append(target)
+        self._rewrite_tags([operation for operation in journal['operations']
+                            if (self.music_dir / operation['source']).exists()], 'old_tags')
+        self._remove_empty_dirs(created)
+        self._journal_path(journal['id']).unlink(missing_ok=True)
+
+    def _roll_forward(self, journal):
+        """Termine les déplacements d'un lot dont les tags sont déjà réécrits"""
+        self._move_all(journal['operations'])
+        self._remove_empty_dirs(self.music_dir / operation['source'] for operation in journal['operations'])
+        self._journal_path(journal['id']).unlink(missing_ok=True)
+
+    def _remove_empty_dirs(self, files):
+        """Supprime les dossiers devenus vides (albums puis artistes), sans descendre sous music/"""
+        directories = {Path(file).parent for file in files}
+        for directory in sorted(directories, key=lambda path: len(path.parts), reverse=True):
+            while directory != self.music_dir and self.music_dir in directory.parents:
+                try:
+                    directory.rmdir()  # Échoue si le dossier n'est pas vide
+                except OSError:
+                    break
+                directory = directory.parent
+
+    # ------------------------------------------
+    # Journal
+    # ------------------------------------------
+
+    def _journal_path(self, batch_id):
+        return self.journal_dir / f"{batch_id}.json"
+
+    def _write_journal(self, journal):
+        """Écrit le journal sur disque (écriture atomique, synchronisée) avant la phase suivante"""
+        path = self._journal_path(journal['id'])
+        temporary = path.with_suffix('.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(journal, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+
+    def recover(self):
+        """
+        Reprend les lots interrompus par un arrêt du serveur (au démarrage)
+
+        Returns:
+            dict: {rolled_back, rolled_forward, failed}
+        """
+        summary = {'rolled_back': 0, 'rolled_forward': 0, 'failed': 0}
+        with self._lock:
+            for path in sorted(self.journal_dir.glob('*.json')):
+                try:
+                    journal = json.loads(path.read_text(encoding='utf-8'))
+                    if journal['state'] == MOVING:
+                        self._roll_forward(journal)
+                        summary['rolled_forward'] += 1
+                    else:
+                        self._roll_back(journal)
+                        summary['rolled_back'] += 1
+                except Exception as e:
+                    summary['failed'] += 1
+                    log_message('ERROR', f"❌ Reprise du lot de corrections {path.name} impossible: {str(e)}")
+        if summary['rolled_back'] or summary['rolled_forward']:
+            log_message('WARNING', f"⚠️ Lots de corrections interrompus repris: {summary['rolled_forward']} "
+                                   f"terminé(s), {summary['rolled_back']} annulé(s)", summary)
+        return summary
+
+
+def _read_tags(path):
+    try:
+        return ID3(path)
+    except ID3NoHeaderError:
+        return ID3()
+
+
+def _text(tags, frame_id):
+    frame = tags.get(frame_id)
+    return str(frame.text[0]) if frame is not None and frame.text else None
+
+
+def _write_tags(path, values, tags=None):
+    """Remplace TPE1 et TIT2 (None : supprime le tag) sans toucher aux autres (tags : déjà lus)"""
+    if tags is None:
+        tags = _read_tags(path)
+    for frame_id, frame_type in (('TPE1', TPE1), ('TIT2', TIT2)):
+        if values[frame_id] is None:
+            tags.delall(frame_id)
+        else:
+            tags[frame_id] = frame_type(encoding=3, text=values[frame_id])
+    tags.save(path)
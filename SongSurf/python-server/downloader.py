@@ -15,6 +15,33 @@ from pathlib import Path
 import os
 from datetime import datetime
 import shutil
+import subprocess
+import threading
+import time
+from yt_dlp.utils import DownloadCancelled
+
+from parallel_fetch import ConnectionBudget, ParallelYoutubeDL
+from tracing import StageTrace
+from logs import get_logger
+
+
+logger = get_logger('downloader')
+
+
+class YtDlpLogger:
+    """Redirige les messages de yt-dlp vers les logs (au lieu de stdout)"""
+    
+    def debug(self, msg):
+        logger.debug(msg)
+    
+    def info(self, msg):
+        logger.debug(msg)
+    
+    def warning(self, msg):
+        logger.warning(msg)
+    
+    def error(self, msg):
+        logger.error(msg)
 
 
 class DownloadProgress:
@@ -29,7 +56,9 @@ class DownloadProgress:
         self.total = 0
         self.speed = "0 KB/s"
         self.eta = "0s"
-        self.status = "idle"  # idle, downloading, processing, completed, error
+        self.connections = 1
+        self.throttle = None  # Limiteur de débit du téléchargement en cours
+        self.status = "idle"  # idle, downloading, processing, completed, cancelled, error
     
     def update(self, d):
         """Callback appelé par yt-dlp pour mettre à jour la progression"""
@@ -61,17 +90,30 @@ class DownloadProgress:
             'downloaded': self.downloaded,
             'total': self.total,
             'speed': self.speed,
-            'eta': self.eta
+            'eta': self.eta,
+            'connections': self.connections,
+            'rate_limit': int(self.throttle.rate) if self.throttle is not None and self.throttle.rate else None
         }
 
 
 class YouTubeDownloader:
     """Téléchargeur YouTube avec yt-dlp"""
     
-    def __init__(self, temp_dir, music_dir):
+    SOCKET_TIMEOUT = 30  # secondes sans données avant erreur réseau
+    
+    def __init__(self, temp_dir, music_dir, connections_per_download=1, max_connections=None):
+        """
+        Args:
+            temp_dir: Dossier des fichiers temporaires
+            music_dir: Dossier de la bibliothèque
+            connections_per_download (int): Connexions parallèles par morceau (par défaut)
+            max_connections (int): Plafond global de connexions, tous téléchargements confondus
+        """
         self.temp_dir = Path(temp_dir)
         self.music_dir = Path(music_dir)
         self.progress = DownloadProgress()
+        self.connections_per_download = max(1, int(connections_per_download))
+        self.connection_budget = ConnectionBudget(max_connections or self.connections_per_download)
         
         # Créer les dossiers
         self.temp_dir.mkdir(exist_ok=True, parents=True)
@@ -80,20 +122,85 @@ class YouTubeDownloader:
         # Détecter FFmpeg
         self.ffmpeg_location = self._find_ffmpeg()
     
-    def download(self, url, metadata):
+    def temp_basename(self, metadata):
+        """Nom de base (sans extension) des fichiers temporaires d'un morceau"""
+        return f"{metadata.get('artist', 'Unknown')} - {metadata.get('title', 'Unknown')}"
+    
+    def job_temp_dir(self, job_id=None):
+        """Dossier temporaire d'un job (temp/<job_id>/), ou temp/ sans job"""
+        return self.temp_dir / job_id if job_id else self.temp_dir
+    
+    def remove_job_temp_dir(self, job_id):
+        """Supprime le dossier temporaire d'un job terminé"""
+        if job_id:
+            shutil.rmtree(self.job_temp_dir(job_id), ignore_errors=True)
+    
+    def download(self, url, metadata, connections=None, cancel_event=None, progress_hook=None, job_id=None,
+                 throttle=None, trace=None, abort_event=None):
         """
         Télécharge une vidéo YouTube en MP3
         
         Args:
             url (str): URL YouTube ou YouTube Music
             metadata (dict): {artist, album, title, year}
+            connections (int): Connexions parallèles pour ce morceau
+                (plafonné par connections_per_download et le budget global)
+            cancel_event (threading.Event): Annule le transfert et la conversion dès qu'il est levé
+            progress_hook (callable): Hook yt-dlp supplémentaire (suivi de l'état partiel),
+                appelé aussi pendant la conversion (status 'processing') à chaque avancée de FFmpeg
+            job_id (str): Identifiant du job : ses fichiers vont dans temp/<job_id>/
+            throttle (Throttle): Limiteur de débit du job (modifiable pendant le transfert)
+            trace (StageTrace): Chronologie du job (étapes extract, fetch, transcode)
+            abort_event (threading.Event): Interrompt comme cancel_event, mais en
+                conservant les fichiers partiels (job bloqué, repris à la tentative suivante)
+        
+        Un téléchargement interrompu (redémarrage du serveur) reprend à partir
+        des fichiers .part présents dans le dossier temporaire ; si le MP3 a
+        déjà été converti, rien n'est refait.
             
         Returns:
-            dict: {success, file_path, error}
+            dict: {success, file_path, error, cancelled, aborted, downloaded_bytes}
         """
+        wanted = min(connections or self.connections_per_download, self.connections_per_download)
+        granted = 0
+        
+        # Nom de fichier temporaire
+        temp_filename = self.temp_basename(metadata)
+        work_dir = self.job_temp_dir(job_id)
+        downloaded_file = work_dir / f"{temp_filename}.mp3"
+        
+        def check_cancel(d):
+            """Hook yt-dlp : interrompt le transfert depuis l'intérieur de la boucle de téléchargement"""
+            if cancel_event is not None and cancel_event.is_set():
+                raise DownloadCancelled('Téléchargement annulé par l\'utilisateur')
+            if abort_event is not None and abort_event.is_set():
+                raise DownloadCancelled('Téléchargement interrompu (job bloqué)')
+        
+        # Repères temporels : début, premier octet (fin de l'extraction), fin du transfert
+        if trace is None:
+            trace = StageTrace()
+        started_at = time.time()
+        marks = {}
+        
+        def record_timing(d):
+            """Hook yt-dlp : note la fin de l'extraction et celle du transfert"""
+            now = time.time()
+            marks.setdefault('first_progress', now)
+            if d.get('status') == 'finished':
+                marks['finished'] = now
+                marks['bytes'] = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        
         try:
-            print(f"\n🎵 Téléchargement: {metadata.get('title', 'Unknown')}")
-            print(f"   URL originale: {url}")
+            # Attente d'une connexion libre interrompue par une annulation ou le watchdog
+            granted = self.connection_budget.acquire(
+                wanted, cancelled=lambda: any(event is not None and event.is_set()
+                                              for event in (cancel_event, abort_event))
+            )
+            check_cancel(None)
+            work_dir.mkdir(parents=True, exist_ok=True)
+            
+            logger.info(f"🎵 Téléchargement: {metadata.get('title', 'Unknown')}")
+            logger.debug(f"URL originale: {url}")
             
             # Convertir l'URL YouTube Music en URL YouTube classique
             if 'music.youtube.com' in url:
@@ -103,72 +210,221 @@ class YouTubeDownloader:
                 if video_id_match:
                     video_id = video_id_match.group(1)
                     url = f'https://www.youtube.com/watch?v={video_id}'
-                    print(f"   🔄 Converti en: {url}")
+                    logger.debug(f"🔄 Converti en: {url}")
             
-            print(f"   📥 Téléchargement depuis: {url}")
+            # MP3 déjà converti avant un redémarrage (écrit via .part puis renommé : il est complet)
+            if downloaded_file.exists():
+                logger.info(f"♻️ Fichier déjà téléchargé et converti, reprise: {downloaded_file.name}")
+                self.progress.reset()
+                self.progress.status = 'completed'
+                self.progress.percent = 100
+                return {
+                    'success': True,
+                    'resumed': True,
+                    'file_path': str(downloaded_file),
+                    'metadata': metadata,
+                    'timestamp': datetime.now().isoformat()
+                }
+            
+            logger.debug(f"📥 Téléchargement depuis: {url}")
             
             # Reset la progression
             self.progress.reset()
             self.progress.status = 'downloading'
-            
-            # Nom de fichier temporaire
-            temp_filename = f"{metadata.get('artist', 'Unknown')} - {metadata.get('title', 'Unknown')}"
+            self.progress.connections = granted
+            self.progress.throttle = throttle
             
             # Configuration yt-dlp (optimisée pour YouTube Music)
+            # La conversion MP3 est faite par _transcode_to_mp3 (et non par un
+            # postprocessor yt-dlp) pour pouvoir tuer FFmpeg en cas d'annulation
             ydl_opts = {
                 'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '0',  # Meilleure qualité (0-9)
-                }],
-                'outtmpl': str(self.temp_dir / f'{temp_filename}.%(ext)s'),
-                'quiet': False,
-                'no_warnings': False,
-                'progress_hooks': [self.progress.update],
+                'outtmpl': str(work_dir / f'{temp_filename}.%(ext)s'),
+                # Sortie de yt-dlp dans les logs (détail au niveau DEBUG), sans barre de progression
+                'quiet': True,
+                'noprogress': True,
+                'logger': YtDlpLogger(),
+                'progress_hooks': [check_cancel, self.progress.update, record_timing]
+                                  + ([progress_hook] if progress_hook else [])
+                                  + ([throttle.progress_hook()] if throttle is not None else []),
                 'noplaylist': True,  # Ne télécharger QUE la vidéo, pas la playlist
                 'writethumbnail': True,  # Télécharger la pochette
                 'nocheckcertificate': True,
+                # Une socket muette lève une erreur (et yt-dlp réessaie) au lieu de bloquer le worker
+                'socket_timeout': self.SOCKET_TIMEOUT,
+                # Parallélisme : plages HTTP (RangeDownloader) ou fragments DASH/HLS
+                'songsurf_connections': granted,
+                'concurrent_fragment_downloads': granted,
+                # Limite de débit (bandwidth.py) : RangeDownloader limite chaque plage
+                'songsurf_throttle': throttle,
             }
             
+            if granted > 1:
+                logger.debug(f"🔀 Connexions parallèles: {granted}")
+            
             # Ajouter le chemin FFmpeg si trouvé
             if self.ffmpeg_location:
                 ydl_opts['ffmpeg_location'] = self.ffmpeg_location
-                print(f"   🔧 FFmpeg trouvé: {self.ffmpeg_location}")
+                logger.debug(f"🔧 FFmpeg trouvé: {self.ffmpeg_location}")
             
             # Télécharger
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                print("   ⏳ Téléchargement en cours...")
+            with ParallelYoutubeDL(ydl_opts) as ydl:
+                logger.debug("⏳ Téléchargement en cours...")
                 info = ydl.extract_info(url, download=True)
                 
-                # Le fichier téléchargé (avec extension .mp3 après conversion)
-                downloaded_file = self.temp_dir / f"{temp_filename}.mp3"
-                
-                if not downloaded_file.exists():
-                    raise FileNotFoundError(f"Fichier non trouvé: {downloaded_file}")
-                
-                print(f"   ✅ Téléchargement terminé: {downloaded_file.name}")
-                
-                # Marquer comme terminé
-                self.progress.status = 'completed'
-                self.progress.percent = 100
-                
-                return {
-                    'success': True,
-                    'file_path': str(downloaded_file),
-                    'metadata': metadata,
-                    'timestamp': datetime.now().isoformat()
-                }
+                # Le fichier audio brut (webm, m4a...) avant conversion
+                requested = info.get('requested_downloads') or [{}]
+                source_file = Path(requested[0].get('filepath') or ydl.prepare_filename(info))
+            
+            fetched = time.time()
+            first_progress = marks.get('first_progress', fetched)
+            trace.add('extract', started_at, first_progress - started_at)
+            trace.add('fetch', first_progress, marks.get('finished', fetched) - first_progress)
+            
+            check_cancel(None)
+            
+            # Conversion en MP3
+            if source_file != downloaded_file:
+                self.progress.status = 'processing'
+                logger.debug("🔄 Conversion en MP3...")
+                with trace.span('transcode'):
+                    self._transcode_to_mp3(source_file, downloaded_file, cancel_event, abort_event, progress_hook)
+                source_file.unlink(missing_ok=True)
+            
+            if not downloaded_file.exists():
+                raise FileNotFoundError(f"Fichier non trouvé: {downloaded_file}")
+            
+            logger.info(f"✅ Téléchargement terminé: {downloaded_file.name}")
+            
+            # Marquer comme terminé
+            self.progress.status = 'completed'
+            self.progress.percent = 100
+            
+            return {
+                'success': True,
+                'file_path': str(downloaded_file),
+                'metadata': metadata,
+                'downloaded_bytes': marks.get('bytes', 0),
+                'timestamp': datetime.now().isoformat()
+            }
                 
         except Exception as e:
-            print(f"   ❌ Erreur: {str(e)}")
-            self.progress.status = 'error'
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            aborted = not cancelled and abort_event is not None and abort_event.is_set()
+            if cancelled:
+                logger.warning("🛑 Téléchargement annulé")
+                self.progress.status = 'cancelled'
+                self._remove_temp_files(work_dir, temp_filename)
+            elif aborted:
+                # Fichiers partiels conservés : la tentative suivante reprend le .part
+                logger.warning("🛑 Téléchargement interrompu (job bloqué)")
+                self.progress.status = 'error'
+            else:
+                logger.error(f"❌ Erreur: {str(e)}")
+                self.progress.status = 'error'
             
             return {
                 'success': False,
-                'error': str(e),
+                'cancelled': cancelled,
+                'aborted': aborted,
+                'error': 'Téléchargement annulé par l\'utilisateur' if cancelled else str(e),
                 'timestamp': datetime.now().isoformat()
             }
+        finally:
+            self.connection_budget.release(granted)
+    
+    def _transcode_to_mp3(self, source_file, target_file, cancel_event=None, abort_event=None, progress_hook=None):
+        """
+        Convertit un fichier audio en MP3 (VBR meilleure qualité) avec FFmpeg
+        
+        Le processus est surveillé toutes les 200 ms : si cancel_event ou
+        abort_event est levé, FFmpeg est tué et le fichier partiel supprimé
+        (le fichier source reste). L'avancée de FFmpeg (-progress) est
+        transmise à progress_hook : une longue conversion n'est pas prise
+        pour un job bloqué par le watchdog.
+        """
+        ffmpeg = 'ffmpeg'
+        if self.ffmpeg_location:
+            ffmpeg = shutil.which('ffmpeg', path=self.ffmpeg_location) or ffmpeg
+        
+        # Écrire dans un .part puis renommer : un MP3 présent est toujours complet
+        partial_file = target_file.with_name(target_file.name + '.part')
+        command = [
+            ffmpeg, '-y', '-hide_banner', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1',
+            '-i', str(source_file),
+            '-vn', '-acodec', 'libmp3lame', '-q:a', '0',
+            '-f', 'mp3', str(partial_file)
+        ]
+        
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        reader = threading.Thread(target=self._read_transcode_progress, args=(process.stdout, progress_hook),
+                                  name='ffmpeg-progress', daemon=True)
+        reader.start()
+        try:
+            while True:
+                try:
+                    process.wait(timeout=0.2)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_event is not None and cancel_event.is_set():
+                        process.kill()
+                        process.wait()
+                        raise DownloadCancelled('Conversion annulée par l\'utilisateur')
+                    if abort_event is not None and abort_event.is_set():
+                        process.kill()
+                        process.wait()
+                        raise DownloadCancelled('Conversion interrompue (job bloqué)')
+            
+            if process.returncode != 0:
+                error = process.stderr.read().decode('utf-8', errors='replace').strip()
+                raise RuntimeError(f"FFmpeg a échoué ({process.returncode}): {error[-500:]}")
+            
+            os.replace(partial_file, target_file)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            reader.join(timeout=1)
+            process.stdout.close()
+            process.stderr.close()
+            if partial_file.exists():
+                partial_file.unlink()
+    
+    @staticmethod
+    def _read_transcode_progress(stream, progress_hook):
+        """
+        Lit la sortie -progress de FFmpeg (blocs clé=valeur) jusqu'à sa fin
+        
+        progress_hook n'est appelé que si la position dans le flux a avancé :
+        un FFmpeg figé ne passe pas pour vivant.
+        """
+        last_position = None
+        for line in stream:
+            key, _, value = line.decode('ascii', errors='replace').strip().partition('=')
+            if key != 'out_time_us' or value == last_position or progress_hook is None:
+                continue
+            last_position = value
+            try:
+                seconds = int(value) / 1_000_000
+            except ValueError:
+                continue
+            try:
+                progress_hook({'status': 'processing', 'transcoded_seconds': seconds})
+            except Exception as e:
+                logger.debug(f"Hook de progression de la conversion en erreur: {e}")
+    
+    def _remove_temp_files(self, work_dir, temp_filename):
+        """Supprime les fichiers temporaires d'un téléchargement (.part, audio brut, pochette...)"""
+        prefix = f"{temp_filename}."
+        if not Path(work_dir).is_dir():
+            return  # Annulé avant la création du dossier
+        for file in Path(work_dir).iterdir():
+            if file.is_file() and file.name.startswith(prefix):
+                try:
+                    file.unlink()
+                    logger.debug(f"🗑️ Fichier partiel supprimé: {file.name}")
+                except OSError as e:
+                    logger.warning(f"⚠️ Impossible de supprimer {file.name}: {e}")
     
     def get_progress(self):
         """Retourne la progression actuelle"""
@@ -185,7 +441,7 @@ class YouTubeDownloader:
             dict: {success, metadata: {title, artist, album, year, thumbnail_url}, error}
         """
         try:
-            print(f"\n🔍 Extraction des métadonnées: {url}")
+            logger.info(f"🔍 Extraction des métadonnées: {url}")
             
             # Convertir l'URL YouTube Music en URL YouTube classique
             if 'music.youtube.com' in url:
@@ -194,7 +450,7 @@ class YouTubeDownloader:
                 if video_id_match:
                     video_id = video_id_match.group(1)
                     url = f'https://www.youtube.com/watch?v={video_id}'
-                    print(f"   🔄 Converti en: {url}")
+                    logger.debug(f"🔄 Converti en: {url}")
             
             # Configuration yt-dlp (extraction uniquement)
             ydl_opts = {
@@ -235,11 +491,7 @@ class YouTubeDownloader:
                     'view_count': info.get('view_count', 0)
                 }
                 
-                print(f"   ✅ Métadonnées extraites:")
-                print(f"      🎵 Titre: {title}")
-                print(f"      🎤 Artiste: {artist}")
-                print(f"      💿 Album: {album}")
-                print(f"      📅 Année: {year}")
+                logger.debug(f"✅ Métadonnées extraites: {title} - {artist} ({album}, {year})")
                 
                 return {
                     'success': True,
@@ -248,7 +500,7 @@ class YouTubeDownloader:
                 }
                 
         except Exception as e:
-            print(f"   ❌ Erreur: {str(e)}")
+            logger.error(f"❌ Erreur: {str(e)}")
             return {
                 'success': False,
                 'error': str(e),
@@ -274,7 +526,7 @@ class YouTubeDownloader:
             }
         """
         try:
-            print(f"\n💿 Extraction playlist/album: {url}")
+            logger.info(f"💿 Extraction playlist/album: {url}")
             
             # Configuration yt-dlp pour extraire la playlist
             ydl_opts = {
@@ -303,7 +555,7 @@ class YouTubeDownloader:
                 # Nettoyer le titre (enlever "Album - " si présent au début)
                 if playlist_title.startswith('Album - '):
                     playlist_title = playlist_title[8:]  # Enlever "Album - "
-                    print(f"   🧹 Titre nettoyé: {playlist_title}")
+                    logger.debug(f"🧹 Titre nettoyé: {playlist_title}")
                 
                 # Essayer plusieurs sources pour l'artiste
                 playlist_artist = (
@@ -320,7 +572,7 @@ class YouTubeDownloader:
                 # Si toujours pas d'artiste, extraire depuis la première chanson
                 playlist_year = ''
                 if not playlist_artist or playlist_artist == 'None' or str(playlist_artist).lower() == 'none':
-                    print("   🔍 Artiste non trouvé, extraction depuis la première chanson...")
+                    logger.debug("🔍 Artiste non trouvé, extraction depuis la première chanson...")
                     first_entry = info['entries'][0] if info['entries'] else None
                     
                     if first_entry and first_entry.get('id'):
@@ -332,11 +584,11 @@ class YouTubeDownloader:
                             if first_song_info['success']:
                                 playlist_artist = first_song_info['metadata'].get('artist', 'Unknown Artist')
                                 playlist_year = first_song_info['metadata'].get('year', '')
-                                print(f"   ✅ Artiste trouvé via première chanson: {playlist_artist}")
+                                logger.debug(f"✅ Artiste trouvé via première chanson: {playlist_artist}")
                                 if playlist_year:
-                                    print(f"   📅 Année: {playlist_year}")
+                                    logger.debug(f"📅 Année: {playlist_year}")
                         except Exception as e:
-                            print(f"   ⚠️  Impossible d'extraire l'artiste: {e}")
+                            logger.warning(f"⚠️ Impossible d'extraire l'artiste: {e}")
                 
                 # Fallback: essayer d'extraire depuis le titre
                 if not playlist_artist or playlist_artist == 'Unknown Artist':
@@ -388,10 +640,8 @@ class YouTubeDownloader:
                     songs.append(song)
                     total_duration += song['duration']
                 
-                print(f"   ✅ {len(songs)} chansons trouvées")
-                print(f"   📀 Titre: {playlist_title}")
-                print(f"   🎤 Artiste: {playlist_artist}")
-                print(f"   ⏱️  Durée totale: {total_duration // 60}min {total_duration % 60}s")
+                logger.debug(f"✅ {len(songs)} chansons trouvées: {playlist_title} - {playlist_artist} "
+                             f"({total_duration // 60}min {total_duration % 60}s)")
                 
                 return {
                     'success': True,
@@ -406,7 +656,7 @@ class YouTubeDownloader:
                 }
                 
         except Exception as e:
-            print(f"   ❌ Erreur: {str(e)}")
+            logger.error(f"❌ Erreur: {str(e)}")
             return {
                 'success': False,
                 'error': str(e),
@@ -431,7 +681,7 @@ class YouTubeDownloader:
             }
         """
         try:
-            print(f"\n💿 Téléchargement playlist: {playlist_metadata.get('title')}")
+            logger.info(f"💿 Téléchargement playlist: {playlist_metadata.get('title')}")
             
             songs = playlist_metadata.get('songs', [])
             total_songs = len(songs)
@@ -441,7 +691,7 @@ class YouTubeDownloader:
             failed = 0
             
             for index, song in enumerate(songs, 1):
-                print(f"\n📥 [{index}/{total_songs}] {song['title']}")
+                logger.info(f"📥 [{index}/{total_songs}] {song['title']}")
                 
                 # Callback de progression
                 if progress_callback:
@@ -460,19 +710,17 @@ class YouTubeDownloader:
                 
                 if result['success']:
                     downloaded += 1
-                    print(f"   ✅ Téléchargé: {song['title']}")
+                    logger.debug(f"✅ Téléchargé: {song['title']}")
                 else:
                     failed += 1
-                    print(f"   ❌ Échec: {song['title']} - {result.get('error')}")
+                    logger.error(f"❌ Échec: {song['title']} - {result.get('error')}")
                 
                 results.append({
                     'song': song,
                     'result': result
                 })
             
-            print(f"\n📊 Résumé:")
-            print(f"   ✅ Téléchargés: {downloaded}/{total_songs}")
-            print(f"   ❌ Échecs: {failed}/{total_songs}")
+            logger.info(f"📊 Résumé: {downloaded}/{total_songs} téléchargés, {failed}/{total_songs} échecs")
             
             return {
                 'success': True,
@@ -484,7 +732,7 @@ class YouTubeDownloader:
             }
             
         except Exception as e:
-            print(f"   ❌ Erreur: {str(e)}")
+            logger.error(f"❌ Erreur: {str(e)}")
             return {
                 'success': False,
                 'error': str(e),
@@ -518,20 +766,17 @@ class YouTubeDownloader:
         ]
         
         for path in common_paths:
-            print(f"   🔍 Vérification: {path}")
             if path.exists():
-                print(f"      ✓ Dossier existe")
                 if (path / 'ffmpeg.exe').exists():
-                    print(f"   ✅ FFmpeg détecté: {path}")
+                    logger.info(f"✅ FFmpeg détecté: {path}")
                     return str(path)
                 else:
-                    print(f"      ✗ ffmpeg.exe non trouvé dans ce dossier")
+                    logger.debug(f"🔍 {path}: ffmpeg.exe non trouvé dans ce dossier")
             else:
-                print(f"      ✗ Dossier n'existe pas")
+                logger.debug(f"🔍 {path}: dossier inexistant")
         
-        print("\n   ⚠️ FFmpeg non trouvé automatiquement")
-        print("   💡 Exécutez: where.exe ffmpeg")
-        print("   💡 Ou ajoutez le chemin manuellement dans downloader.py ligne 182")
+        logger.warning("⚠️ FFmpeg non trouvé automatiquement "
+                       "(exécutez where.exe ffmpeg, ou ajoutez le chemin dans _find_ffmpeg)")
         return None
 
 
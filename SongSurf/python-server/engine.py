@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+engine.py - Moteur de téléchargement et d'organisation
+
+FONCTIONNALITÉ:
+  - Réserve les jobs dans la queue persistante et les traite un par un :
+    téléchargement (yt-dlp + FFmpeg) puis organisation (tags + déplacement)
+  - Tourne dans un thread du serveur (python app.py) ou dans des processus
+    workers séparés (python serve.py)
+  - Ne communique avec l'API qu'à travers la queue persistante :
+    progression, étapes, événements, demandes d'annulation
+  - Un processus worker se recycle (sort après son job en cours) au-delà
+    d'un nombre de jobs ou d'une mémoire résidente : serve.py le remplace
+  - Watchdog : un job sans progression depuis STALL_TIMEOUT est interrompu
+    puis retenté ; le worker publie un battement de cœur (/health)
+  - Erreurs temporaires : nouvelle tentative avec délai exponentiel ; le
+    disjoncteur partagé suspend la distribution après trop d'échecs
+  - Bande passante : le débit du job est recalculé pendant le téléchargement
+    (plafond global partagé, plafond par job, heures creuses)
+  - Concurrence adaptative : le worker ne réserve un job que si la limite
+    publiée par le contrôleur (serve.py --adaptive) le permet
+  - Métriques (/metrics) : durée des étapes, octets, issue de chaque job,
+    versées dans la queue persistante à la fin du job
+  - Chronologie : chaque tentative ajoute ses étapes (queue, extract, fetch,
+    transcode, cover, tag, move) à la trace du job
+  - Profilage à la demande : chaque processus worker exécute les commandes
+    de /admin/profiling (profil CPU, instantanés tracemalloc)
+"""
+
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+import config
+from config import log_message
+from logs import log_context, bind_context, setup_logging
+from job_store import JobStore, QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED
+from bandwidth import BandwidthPolicy, Throttle
+from concurrency import concurrency_limit
+from metrics import MetricsRegistry, StoreMetrics
+from tracing import StageTrace
+from profiling import ProfilingAgent
+from retry_policy import CircuitBreaker, classify_error, backoff_delay, PERMANENT, THROTTLED
+
+
+def current_rss():
+    """
+    Mémoire résidente du processus (octets), ou None si inconnue
+
+    Lue dans /proc/self/statm (Linux), sinon via psutil s'il est installé.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+class Engine:
+    """Worker qui traite les jobs de la queue persistante"""
+
+    def __init__(self, store, downloader, organizer, admission, name='worker', wakeup=None,
+                 exit_on_hang=False, breaker=None, bandwidth=None, metrics=None):
+        """
+        Args:
+            store (JobStore): Queue persistante (connexion propre à ce processus)
+            downloader (YouTubeDownloader): Téléchargeur
+            organizer (MusicOrganizer): Organisateur de la bibliothèque
+            admission (DiskAdmission): Contrôle de l'espace disque
+            name (str): Nom du worker (enregistré sur les jobs qu'il réserve)
+            wakeup (threading.Event): Réveil immédiat quand un job est ajouté
+                (même processus) ; sinon la queue est relue périodiquement
+            exit_on_hang (bool): Arrêter le processus si un job bloqué ne rend
+                pas la main après son interruption (processus worker dédié) ;
+                sinon le thread bloqué est abandonné et remplacé (worker intégré)
+            breaker (CircuitBreaker): Disjoncteur partagé (None = aucun)
+            bandwidth (BandwidthPolicy): Plafonds de débit (None = pleine vitesse)
+            metrics (StoreMetrics): Totaux partagés des métriques (None = aucune)
+        """
+        self.store = store
+        self.downloader = downloader
+        self.organizer = organizer
+        self.admission = admission
+        self.name = name
+        self.wakeup = wakeup
+        self.exit_on_hang = exit_on_hang
+        self.breaker = breaker
+        self.bandwidth = bandwidth
+        self.metrics = metrics
+        self.current_job = None
+        self.current_stage = None
+        self.jobs_done = 0
+        self.last_progress_at = time.time()  # Dernier signe de vie du job en cours
+        self.abandoned = False  # Thread bloqué remplacé : ne touche plus à la queue
+        self._run_limits = (None, None)  # max_jobs, max_rss_bytes de run() (remplaçant)
+
+    # ------------------------------------------
+    # Communication avec l'API (via la queue)
+    # ------------------------------------------
+
+    def emit(self, event_type, job_id, **data):
+        """Publie un événement de job (relayé sur /events par l'API)"""
+        self.store.add_event(event_type, {
+            'job_id': job_id,
+            'queue_size': self.store.count(QUEUED, cancelled=False),
+            'worker': self.name,
+            'timestamp': datetime.now().isoformat(),
+            **data
+        })
+
+    def progress_recorder(self, job_id):
+        """
+        Hook yt-dlp qui écrit la progression du job dans la queue persistante
+        (au plus une écriture toutes les PROGRESS_STORE_INTERVAL secondes)
+        
+        Appelé aussi pendant la conversion FFmpeg (status 'processing') : seul
+        le signe de vie du watchdog est mis à jour.
+
+        Les octets téléchargés servent aussi à la reprise après redémarrage.
+        """
+        last_write = [0.0]
+
+        def hook(d):
+            now = time.time()
+            self.last_progress_at = now
+            if d.get('status') != 'downloading' or now - last_write[0] < config.PROGRESS_STORE_INTERVAL:
+                return
+            last_write[0] = now
+            self.store.update(
+                job_id,
+                progress=self.downloader.get_progress(),
+                downloaded_bytes=d.get('downloaded_bytes') or 0,
+                total_bytes=d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            )
+
+        return hook
+
+    def _set_stage(self, job_id, stage, **fields):
+        """Enregistre l'étape du job (compte comme un signe de vie pour le watchdog)"""
+        self.current_stage = stage
+        self.last_progress_at = time.time()
+        bind_context(stage=stage)
+        self.store.update(job_id, stage=stage, **fields)
+        self.emit('job_stage', job_id, stage=stage)
+
+    def _apply_bandwidth(self, job, throttle):
+        """Recalcule le débit autorisé du job selon les autres téléchargements en cours"""
+        if self.bandwidth is None:
+            return
+        active = [other for other in self.store.list(states=(RUNNING,)) if other.get('stage') == 'download']
+        rate = self.bandwidth.limit_for(job, active)
+        rate = int(rate) if rate else None
+        if rate != throttle.rate:
+            throttle.set_rate(rate)
+            log_message('INFO', f"🚦 Débit du job {job['id']}: {f'{rate / 1024:.0f} KB/s' if rate else 'illimité'}", {
+                'downloads': len(active),
+                'off_peak': self.bandwidth.off_peak()
+            })
+
+    def _watch_job(self, job, cancel_event, stalled, done, throttle):
+        """
+        Surveille le job en cours jusqu'à sa fin
+
+          - relit la demande d'annulation (posée par l'API)
+          - recalcule son débit toutes les BANDWIDTH_RECHECK secondes
+            (téléchargements démarrés ou terminés, passage en heures creuses)
+          - watchdog : sans progression depuis STALL_TIMEOUT (transfert ou
+            conversion FFmpeg), le job est interrompu sans que ses fichiers
+            partiels soient supprimés, puis remis en queue ; s'il ne
+            rend toujours pas la main après STALL_ABORT_GRACE, le processus
+            worker s'arrête et serve.py le relance (exit_on_hang), ou le job
+            est remis en queue et un nouveau thread worker prend la suite
+        """
+        job_id = job['id']
+        stalled_at = None
+        bandwidth_at = 0.0
+        while not done.wait(config.CANCEL_POLL_INTERVAL):
+            try:
+                if not cancel_event.is_set() and self.store.cancel_requested(job_id):
+                    cancel_event.set()
+            except Exception as e:
+                log_message('WARNING', f"Vérification d'annulation impossible: {e}", job_id=job_id)
+
+            if self.current_stage == 'download' and time.time() - bandwidth_at >= config.BANDWIDTH_RECHECK:
+                bandwidth_at = time.time()
+                try:
+                    self._apply_bandwidth(job, throttle)
+                except Exception as e:
+                    log_message('WARNING', f"Calcul du débit impossible: {e}", job_id=job_id)
+
+            idle = time.time() - self.last_progress_at
+            if stalled_at is None and idle > config.STALL_TIMEOUT:
+                stalled_at = time.time()
+                log_message('WARNING', f'🐕 Watchdog: job {job_id} sans progression depuis {idle:.0f}s, interruption', {
+                    'worker': self.name,
+                    'stage': self.current_stage
+                })
+                stalled.set()  # Interruption sans nettoyage (≠ annulation) : la tentative suivante reprend
+
+            elif stalled_at is not None and time.time() - stalled_at > config.STALL_ABORT_GRACE:
+                log_message('ERROR', f'🐕 Watchdog: job {job_id} toujours bloqué après interruption', {
+                    'worker': self.name,
+                    'stage': self.current_stage
+                })
+                if self.exit_on_hang:
+                    self._retry_or_fail(self.current_job, 'Job bloqué (worker relancé)')
+                    os._exit(3)
+                # Worker intégré (python app.py) : le thread bloqué est abandonné
+                self.abandoned = True
+                self._retry_or_fail(job, 'Job bloqué (worker remplacé)')
+                self._start_replacement()
+                return
+
+    def _start_replacement(self):
+        """Démarre un worker de même nom et mêmes réglages dans un nouveau thread"""
+        replacement = Engine(self.store, self.downloader, self.organizer, self.admission, name=self.name,
+                             wakeup=self.wakeup, breaker=self.breaker, bandwidth=self.bandwidth,
+                             metrics=self.metrics)
+        replacement.jobs_done = self.jobs_done
+        threading.Thread(target=replacement.run, args=self._run_limits, daemon=True).start()
+        log_message('WARNING', f'🐕 Watchdog: thread de {self.name} abandonné, worker de remplacement démarré')
+
+    def _retry_or_fail(self, job, error, max_retries=None, delay=None, reason='stalled'):
+        """
+        Remet un job en queue pour une nouvelle tentative, ou le marque en
+        échec une fois ses tentatives épuisées
+
+        Args:
+            max_retries (int): Nouvelles tentatives autorisées (STALL_MAX_RETRIES par défaut)
+            delay (float): Secondes avant la nouvelle tentative
+            reason (str): 'stalled', 'transient' ou 'throttled'
+        """
+        job_id = job['id']
+        attempts = job.get('attempts') or 0
+        max_retries = config.STALL_MAX_RETRIES if max_retries is None else max_retries
+        if attempts < max_retries:
+            self.store.retry(job_id, error, delay=delay)
+            log_message('WARNING', f'🔁 Job {job_id} remis en queue (tentative {attempts + 2}/{max_retries + 1})', {
+                'reason': reason,
+                'delay': round(delay, 1) if delay else 0
+            })
+            self.emit('job_retry', job_id, metadata=job['metadata'], error=error, attempt=attempts + 2,
+                      reason=reason, delay=round(delay, 1) if delay else 0)
+        else:
+            self.store.update(job_id, state=FAILED, error=error)
+            self.emit('job_failed', job_id, metadata=job['metadata'], error=error)
+
+    def _handle_download_error(self, job, error):
+        """
+        Échec du téléchargement : nouvelle tentative si l'erreur est temporaire
+
+        Returns:
+            bool: True si le job a été remis en queue ou marqué en échec
+        """
+        kind = classify_error(error)
+        if kind == PERMANENT:
+            return False
+
+        if self.breaker is not None and self.breaker.record_failure():
+            log_message('WARNING', f'⛔ Disjoncteur ouvert: distribution suspendue {self.breaker.wait_time()}s', {
+                'last_error': error
+            })
+            self.emit('dispatch_paused', None, reason=kind, retry_in=self.breaker.wait_time())
+
+        attempts = (job.get('attempts') or 0) + 1
+        base = config.RETRY_THROTTLED_BASE_DELAY if kind == THROTTLED else config.RETRY_BASE_DELAY
+        delay = backoff_delay(attempts, base, config.RETRY_MAX_DELAY)
+        self._retry_or_fail(job, error, max_retries=config.RETRY_MAX_ATTEMPTS - 1, delay=delay, reason=kind)
+        return True
+
+    def _record_trace(self, job, trace, job_metrics):
+        """Ajoute les étapes de cette tentative à la trace du job (et aux histogrammes)"""
+        if not trace.spans:
+            return
+        for span in trace.spans:
+            job_metrics.observe('songsurf_stage_duration_seconds', span['seconds'], stage=span['stage'])
+        self.store.update(job['id'], trace=(job.get('trace') or []) + trace.spans)
+
+    def _record_metrics(self, job_metrics, job_id):
+        """Compte l'issue du job et verse ses métriques dans les totaux partagés"""
+        if self.metrics is None:
+            return
+        job = self.store.get(job_id)
+        counter = {
+            COMPLETED: 'songsurf_jobs_completed_total',
+            FAILED: 'songsurf_jobs_failed_total',
+            CANCELLED: 'songsurf_jobs_cancelled_total',
+            QUEUED: 'songsurf_job_retries_total',
+        }.get(job['state'] if job else None)
+        if counter:
+            job_metrics.inc(counter)
+        self.metrics.flush(job_metrics)
+
+    def _heartbeat_loop(self):
+        """Publie régulièrement l'état du worker dans la queue (lu par /health et serve.py)"""
+        while not self.abandoned:
+            try:
+                job = self.current_job
+                self.store.heartbeat(
+                    self.name,
+                    pid=os.getpid(),
+                    job_id=job['id'] if job else None,
+                    stage=self.current_stage if job else None,
+                    jobs_done=self.jobs_done,
+                    rss_bytes=current_rss(),
+                    heartbeat_at=time.time(),
+                    progress_at=self.last_progress_at if job else None
+                )
+            except Exception as e:
+                log_message('WARNING', f"Battement de cœur impossible: {e}")
+            time.sleep(config.HEARTBEAT_INTERVAL)
+
+    # ------------------------------------------
+    # Boucle principale
+    # ------------------------------------------
+
+    def next_job(self):
+        """
+        Attend puis réserve le prochain job de la queue
+
+        Si le prochain job ne tient pas sur le disque, il reste en tête de queue
+        et le worker se met en pause jusqu'à ce que de la place se libère
+        (janitor, fichiers supprimés...).
+        """
+        paused = False
+        while True:
+            if self.wakeup is not None:
+                self.wakeup.clear()
+
+            # Disjoncteur ouvert : ne rien réserver pendant la pause
+            if self.breaker is not None and not self.breaker.allow(self.name):
+                if not paused:
+                    log_message('WARNING', f'⏸️ {self.name} en pause (disjoncteur ouvert, reprise dans {self.breaker.wait_time()}s)')
+                    paused = True
+                time.sleep(min(max(1, self.breaker.wait_time()), config.WORKER_POLL_INTERVAL * 5))
+                continue
+            if paused:
+                log_message('INFO', f'▶️ {self.name}: reprise de la distribution (job de test)')
+                paused = False
+
+            # Hors heures creuses, les albums/playlists peuvent devoir attendre
+            singles_only = self.bandwidth is not None and not self.bandwidth.bulk_allowed()
+            job = self.store.claim_next(worker=self.name, singles_only=singles_only,
+                                        max_running=concurrency_limit(self.store))
+            if job is not None:
+                ok, details = self.admission.can_dispatch(job['metadata'], worker=self.name)
+                if ok:
+                    return job
+                # Remettre le job en tête de queue (son rang est conservé)
+                self.store.update(job['id'], state=QUEUED, worker=None)
+                log_message('WARNING', f"⏸️ Worker en pause: espace disque insuffisant pour {job['metadata'].get('title')}", details)
+                time.sleep(config.DISK_PAUSE_RECHECK)
+                continue
+            self.admission.resume(self.name)
+            if self.wakeup is not None:
+                self.wakeup.wait(timeout=config.WORKER_POLL_INTERVAL)
+            else:
+                time.sleep(config.WORKER_POLL_INTERVAL)
+
+    def recycle_reason(self, jobs_done, max_jobs=None, max_rss_bytes=None):
+        """Raison de recycler le worker (str), ou None s'il peut continuer"""
+        if max_jobs and jobs_done >= max_jobs:
+            return f'{jobs_done} jobs traités'
+        if max_rss_bytes:
+            rss = current_rss()
+            if rss is not None and rss > max_rss_bytes:
+                return f'mémoire {rss / 1024 / 1024:.0f} Mo > {max_rss_bytes / 1024 / 1024:.0f} Mo'
+        return None
+
+    def run(self, max_jobs=None, max_rss_bytes=None):
+        """
+        Traite la queue de téléchargements
+        Tourne en boucle infinie (thread ou processus dédié)
+
+        Args:
+            max_jobs (int): Recycler le worker après ce nombre de jobs (None = jamais)
+            max_rss_bytes (int): Recycler le worker au-delà de cette mémoire résidente
+
+        Le recyclage n'a lieu qu'entre deux jobs : le job en cours se termine
+        normalement, puis run() rend la main.
+        """
+        log_message('INFO', f'🔄 Queue worker démarré ({self.name})')
+        self._run_limits = (max_jobs, max_rss_bytes)
+        self.store.heartbeat(self.name, pid=os.getpid(), started_at=datetime.now().isoformat(),
+                             heartbeat_at=time.time(), jobs_done=0, job_id=None, stage=None)
+        threading.Thread(target=self._heartbeat_loop, name=f'{self.name}-heartbeat', daemon=True).start()
+
+        while True:
+            try:
+                # Attendre un job dans la queue (bloquant)
+                job = self.next_job()
+                self.process(job)
+                self.jobs_done += 1  # Seulement un job effectivement traité
+            except Exception as e:
+                log_message('ERROR', f"Erreur dans le queue worker: {str(e)}", {
+                    'worker': self.name,
+                    'traceback': traceback.format_exc()
+                })
+                time.sleep(1)
+
+            if self.abandoned:
+                return 'thread bloqué remplacé'
+
+            reason = self.recycle_reason(self.jobs_done, max_jobs, max_rss_bytes)
+            if reason:
+                log_message('INFO', f'♻️ Recyclage du worker {self.name}: {reason}', {
+                    'jobs_done': self.jobs_done,
+                    'rss_bytes': current_rss()
+                })
+                return reason
+
+    def process(self, job):
+        """
+        Traite un job réservé
+
+        Chaque job passe par les étapes 'download' puis 'organize', enregistrées
+        dans la queue persistante. Après un redémarrage, un job reprend à son
+        étape : un MP3 déjà téléchargé est directement organisé, un .part
+        partiel est complété par yt-dlp.
+        """
+        # Chaque log émis pendant le job porte son identifiant et son étape
+        with log_context(job_id=job['id'], stage=job.get('stage')):
+            return self._process(job)
+
+    def _process(self, job):
+        url = job['url']
+        metadata = job['metadata']
+        job_id = job['id']
+
+        # Attente en queue : depuis l'ajout ou la dernière remise en queue (nouvelle
+        # tentative, redémarrage) ; une pause d'admission (disque) n'en ouvre pas une nouvelle
+        trace = StageTrace(attempt=(job.get('attempts') or 0) + 1, worker=self.name)
+        try:
+            queued_at = job.get('queued_at') or datetime.fromisoformat(job['added_at']).timestamp()
+            trace.add('queue', queued_at, time.time() - queued_at)
+        except (KeyError, TypeError, ValueError):
+            pass
+
+        # Job annulé entre sa réservation et son démarrage
+        if self.store.cancel_requested(job_id):
+            log_message('WARNING', f"Job {job_id} annulé avant son démarrage: {metadata['title']}")
+            self.store.update(job_id, state=CANCELLED)
+            self.emit('job_cancelled', job_id, metadata=metadata)
+            return
+
+        cancel_event = threading.Event()
+        stalled = threading.Event()
+        done = threading.Event()
+        throttle = Throttle()
+        job_metrics = MetricsRegistry()
+        self.current_job = job
+        self.current_stage = job.get('stage')
+        self.last_progress_at = time.time()
+        threading.Thread(target=self._watch_job, args=(job, cancel_event, stalled, done, throttle), daemon=True).start()
+
+        self.emit('job_started', job_id, metadata=metadata, resume_stage=job.get('stage'))
+
+        log_message('INFO', f"🎵 Démarrage du téléchargement: {metadata['title']} - {metadata['artist']}"
+                    + (f" (reprise à l'étape {job['stage']})" if job.get('stage') else ''))
+        log_message('DEBUG', 'Job réservé', {
+            'worker': self.name,
+            'url': url,
+            'metadata': metadata,
+            'queue_remaining': self.store.count(QUEUED, cancelled=False)
+        })
+
+        try:
+            downloaded_file = job.get('downloaded_file')
+
+            if job.get('stage') == 'organize' and downloaded_file and Path(downloaded_file).exists():
+                # Fichier téléchargé avant le redémarrage : passer directement à l'organisation
+                file_path = downloaded_file
+                log_message('INFO', f'♻️ Étape 1/2 déjà faite, fichier repris: {file_path}')
+
+            elif job.get('stage') == 'organize' and downloaded_file:
+                # Fichier temporaire disparu : peut-être déplacé dans la bibliothèque avant
+                # le redémarrage, peut-être supprimé. Sans chemin final, pas de succès annoncé.
+                log_message('WARNING', 'Reprise: fichier téléchargé introuvable', {
+                    'file_path': downloaded_file
+                })
+                self.downloader.remove_job_temp_dir(job_id)
+                raise Exception('Fichier téléchargé introuvable à la reprise (déjà organisé ou supprimé)')
+
+            else:
+                # Étape 1: Télécharger
+                self._set_stage(job_id, 'download')
+                self._apply_bandwidth(job, throttle)
+                log_message('DEBUG', '📥 Étape 1/2: Début du téléchargement via yt-dlp', {
+                    'url': url,
+                    'title': metadata['title'],
+                    'artist': metadata['artist']
+                })
+
+                download_result = self.downloader.download(
+                    url, metadata, job.get('connections'), cancel_event,
+                    progress_hook=self.progress_recorder(job_id),
+                    job_id=job_id,
+                    throttle=throttle,
+                    trace=trace,
+                    abort_event=stalled
+                )
+
+                log_message('DEBUG', 'Résultat du téléchargement reçu', {
+                    'success': download_result.get('success'),
+                    'has_file_path': 'file_path' in download_result
+                })
+
+                # Vérifier annulation
+                if cancel_event.is_set():
+                    log_message('WARNING', 'Téléchargement annulé par l\'utilisateur')
+                    raise Exception("Téléchargement annulé par l'utilisateur")
+
+                if not download_result['success']:
+                    error_msg = download_result.get('error', 'Erreur inconnue')
+                    log_message('ERROR', f'Échec du téléchargement: {error_msg}', download_result)
+                    raise Exception(error_msg)
+
+                file_path = download_result['file_path']
+                if download_result.get('downloaded_bytes'):
+                    job_metrics.inc('songsurf_downloaded_bytes_total', download_result['downloaded_bytes'])
+                if self.breaker is not None:
+                    self.breaker.record_success()
+                self._set_stage(job_id, 'organize', downloaded_file=file_path,
+                                progress=self.downloader.get_progress())
+                log_message('DEBUG', '✅ Téléchargement terminé avec succès', {
+                    'file_path': file_path,
+                    'downloaded_bytes': download_result.get('downloaded_bytes')
+                })
+
+            # Vérifier annulation
+            if cancel_event.is_set():
+                self.downloader.remove_job_temp_dir(job_id)
+                log_message('WARNING', 'Annulation détectée avant organisation')
+                raise Exception("Téléchargement annulé par l'utilisateur")
+            if stalled.is_set():
+                raise Exception('Job interrompu par le watchdog')
+
+            # Étape 2: Organiser
+            log_message('DEBUG', '📁 Étape 2/2: Début de l\'organisation du fichier', {
+                'file_path': file_path,
+                'target_artist': metadata['artist'],
+                'target_album': metadata['album']
+            })
+
+            organize_result = self.organizer.organize(file_path, metadata, trace=trace)
+
+            log_message('DEBUG', 'Résultat de l\'organisation reçu', {
+                'success': organize_result.get('success'),
+                'has_final_path': 'final_path' in organize_result
+            })
+
+            if not organize_result['success']:
+                error_msg = organize_result.get('error', 'Erreur inconnue')
+                log_message('ERROR', f'Échec de l\'organisation: {error_msg}', organize_result)
+                raise Exception(error_msg)
+
+            final_path = organize_result['final_path']
+            if self.abandoned:
+                # Déjà remis en queue par le watchdog : un autre worker en est chargé
+                log_message('WARNING', f'Job {job_id} terminé après l\'abandon de son thread', {
+                    'final_path': final_path
+                })
+                return
+            self.store.update(job_id, state=COMPLETED, final_path=final_path)
+            self.downloader.remove_job_temp_dir(job_id)
+            log_message('DEBUG', '✅ Organisation terminée avec succès', {
+                'final_path': final_path,
+                'artist_folder': metadata['artist'],
+                'album_folder': metadata['album']
+            })
+
+            # Succès
+            self.emit('job_completed', job_id, metadata=metadata, file_path=final_path)
+
+            log_message('SUCCESS', f"Téléchargement complet: {metadata['title']} - {metadata['artist']}", {
+                'final_path': final_path,
+                'queue_remaining': self.store.count(QUEUED, cancelled=False)
+            })
+
+        except Exception as e:
+            # Erreur
+            log_message('ERROR', f"Erreur lors du téléchargement: {str(e)}", {'url': url})
+            log_message('DEBUG', 'Métadonnées du job en erreur', metadata)
+
+            if self.abandoned:
+                return  # Remis en queue par le watchdog lors de l'abandon du thread
+            if stalled.is_set():
+                # Interrompu par le watchdog : nouvelle tentative
+                self._retry_or_fail(job, f'Job bloqué (aucune progression depuis {config.STALL_TIMEOUT}s)')
+                return
+
+            cancelled = cancel_event.is_set()
+            if not cancelled and self.current_stage == 'download' and self._handle_download_error(job, str(e)):
+                return
+
+            self.store.update(job_id, state=CANCELLED if cancelled else FAILED, error=str(e))
+            if cancelled:
+                self.downloader.remove_job_temp_dir(job_id)
+            self.emit('job_cancelled' if cancelled else 'job_failed', job_id, metadata=metadata, error=str(e))
+
+        finally:
+            # Job terminé
+            try:
+                self._record_trace(job, trace, job_metrics)
+                self._record_metrics(job_metrics, job_id)
+            except Exception as e:
+                log_message('WARNING', f"Enregistrement de la trace et des métriques impossible: {e}")
+            if self.breaker is not None and not self.abandoned:
+                try:
+                    self.breaker.release_probe(self.name)
+                except Exception as e:
+                    log_message('WARNING', f"Libération du job de test du disjoncteur impossible: {e}")
+            done.set()
+            self.current_job = None
+            self.current_stage = None
+
+
+def worker_main(name, max_connections=None, max_jobs=None, max_rss_bytes=None):
+    """
+    Point d'entrée d'un processus worker (python serve.py)
+
+    Chaque processus ouvre sa propre connexion à la queue et ses propres
+    downloader / organizer ; le plafond de connexions HTTP lui est propre.
+    Le processus se termine (code 0) quand il doit être recyclé.
+    """
+    setup_logging(config.LOG_LEVEL, config.LOG_FORMAT, process=name)
+
+    from downloader import YouTubeDownloader
+    from organizer import MusicOrganizer
+    from admission import DiskAdmission
+
+    store = JobStore(config.JOBS_DB)
+    downloader = YouTubeDownloader(
+        config.TEMP_DIR, config.MUSIC_DIR,
+        connections_per_download=config.CONNECTIONS_PER_DOWNLOAD,
+        max_connections=max_connections or config.MAX_CONNECTIONS
+    )
+    organizer = MusicOrganizer(config.MUSIC_DIR)
+    admission = DiskAdmission(config.TEMP_DIR, config.MUSIC_DIR, min_free_bytes=config.MIN_FREE_BYTES, store=store)
+
+    breaker = CircuitBreaker(
+        store,
+        failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+        cooldown=config.BREAKER_COOLDOWN,
+        max_cooldown=config.BREAKER_MAX_COOLDOWN
+    )
+
+    bandwidth = BandwidthPolicy(
+        global_limit=config.GLOBAL_RATE_LIMIT,
+        job_limit=config.JOB_RATE_LIMIT,
+        bulk_limit=config.BULK_RATE_LIMIT,
+        off_peak_windows=config.OFF_PEAK_WINDOWS,
+        bulk_off_peak_only=config.BULK_OFF_PEAK_ONLY
+    )
+
+    # Profilage à la demande (/admin/profiling) des threads de ce processus
+    ProfilingAgent(store, name, config.PROFILES_DIR, poll_interval=config.PROFILING_POLL_INTERVAL).start()
+
+    engine = Engine(store, downloader, organizer, admission, name=name, exit_on_hang=True,
+                    breaker=breaker, bandwidth=bandwidth, metrics=StoreMetrics(store))
+    engine.run(max_jobs=max_jobs, max_rss_bytes=max_rss_bytes)
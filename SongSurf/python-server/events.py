@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+events.py - Diffusion d'événements en temps réel (Server-Sent Events)
+
+FONCTIONNALITÉ:
+  - Bus d'événements partagé entre le worker et les clients /events
+  - Événements de cycle de vie (job ajouté, démarré, terminé...) livrés
+    immédiatement et dans l'ordre
+  - Progression fusionnée par job : seule la dernière valeur est envoyée,
+    au plus une fois par intervalle et par connexion
+  - Relais depuis la queue persistante : les workers (threads ou processus)
+    y écrivent leurs événements et leur progression, le serveur API les
+    republie sur le bus
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+from logs import log_message
+
+
+def format_sse(event_type, data):
+    """Formate un événement au format text/event-stream"""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    """File d'événements d'une connexion SSE"""
+
+    MAX_PENDING = 1000  # Un client trop lent perd les plus vieux événements
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=self.MAX_PENDING)
+        self._progress = {}  # job_id -> dernière progression (fusionnée)
+        self._last_progress_flush = 0.0
+
+    def push(self, event_type, data):
+        with self._cond:
+            # La progression en attente part avant l'événement, pour garder l'ordre
+            self._events.extend(('progress', pending) for pending in self._progress.values())
+            self._progress.clear()
+            self._events.append((event_type, data))
+            self._cond.notify()
+
+    def push_progress(self, job_id, data):
+        with self._cond:
+            self._progress[job_id] = data
+            self._cond.notify()
+
+    def next_batch(self, timeout):
+        """
+        Attend les prochains événements à envoyer
+
+        Returns:
+            list: [(event_type, data), ...] (vide si timeout, pour un keepalive)
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                progress_due = self._progress and now - self._last_progress_flush >= self.min_interval
+
+                if self._events or progress_due:
+                    batch = list(self._events)
+                    self._events.clear()
+                    if progress_due:
+                        batch.extend(('progress', data) for data in self._progress.values())
+                        self._progress.clear()
+                        self._last_progress_flush = now
+                    return batch
+
+                if now >= deadline:
+                    return []
+
+                # Progression en attente mais trop tôt : attendre la fin de l'intervalle
+                wait = deadline - now
+                if self._progress:
+                    wait = min(wait, self.min_interval - (now - self._last_progress_flush))
+                self._cond.wait(max(wait, 0.01))
+
+
+class EventBus:
+    """Bus d'événements publié par le worker, consommé par les connexions /events"""
+
+    def __init__(self, min_interval=0.25):
+        """
+        Args:
+            min_interval (float): Intervalle minimal entre deux envois de
+                progression à une même connexion (limitation de débit)
+        """
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        subscription = Subscription(self.min_interval)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        """Publie un événement de cycle de vie (livré à chaque connexion)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event_type, data)
+
+    def publish_progress(self, job_id, data):
+        """Publie la progression d'un job (fusionnée par connexion)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push_progress(job_id, data)
+
+
+class StoreEventRelay:
+    """Republie sur le bus les événements et la progression écrits par les workers"""
+
+    PRUNE_EVERY = 240  # Passages entre deux purges des vieux événements
+
+    def __init__(self, store, bus, interval=0.25, running_state='running'):
+        """
+        Args:
+            store: JobStore partagé avec les workers
+            bus (EventBus): Bus des connexions /events
+            interval (float): Secondes entre deux lectures de la queue
+            running_state (str): État des jobs en cours (progression à relayer)
+        """
+        self.store = store
+        self.bus = bus
+        self.interval = interval
+        self.running_state = running_state
+        self._last_seq = store.last_event_seq()
+        self._progress_seen = {}  # job_id -> updated_at de la dernière progression relayée
+        self._thread = None
+
+    def run_once(self):
+        for seq, event_type, data in self.store.events_since(self._last_seq):
+            self._last_seq = seq
+            self.bus.publish(event_type, data)
+
+        seen = {}
+        for job in self.store.list(states=(self.running_state,)):
+            if not job.get('progress'):
+                continue
+            seen[job['id']] = job['updated_at']
+            if self._progress_seen.get(job['id']) != job['updated_at']:
+                self.bus.publish_progress(job['id'], {'job_id': job['id'], 'progress': job['progress']})
+        self._progress_seen = seen
+
+    def start(self):
+        """Démarre le relais dans un thread séparé"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='event-relay', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        passes = 0
+        while True:
+            try:
+                self.run_once()
+                passes += 1
+                if passes % self.PRUNE_EVERY == 0:
+                    self.store.prune_events()
+            except Exception as e:
+                log_message('ERROR', f"Erreur dans le relais d'événements: {str(e)}")
+            time.sleep(self.interval)
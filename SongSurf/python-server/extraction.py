@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+extraction.py - Extraction asynchrone des métadonnées
+
+FONCTIONNALITÉ:
+  - Une demande d'extraction devient un job : l'identifiant est retourné
+    immédiatement, yt-dlp tourne dans un pool de threads borné
+  - Le résultat est récupéré par polling (GET) ou poussé via /events
+  - Les résultats sont conservés quelques minutes puis oubliés
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from logs import log_message
+
+
+# États d'une extraction
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+
+
+def is_playlist_url(url):
+    """L'URL désigne-t-elle une playlist ou un album ?"""
+    return '/playlist?list=' in url or '/browse/' in url
+
+
+class ExtractionQueue:
+    """Pool borné d'extractions de métadonnées yt-dlp"""
+
+    def __init__(self, downloader, max_workers=2, max_pending=20, result_ttl=600, on_done=None):
+        """
+        Args:
+            downloader: YouTubeDownloader (extract_metadata / extract_playlist_metadata)
+            max_workers (int): Extractions simultanées
+            max_pending (int): Extractions en attente ou en cours au-delà desquelles on refuse
+            result_ttl (int): Durée de conservation d'un résultat (secondes)
+            on_done (callable): Appelé avec l'extraction terminée (dict)
+        """
+        self.downloader = downloader
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.on_done = on_done
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='extract')
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, url):
+        """
+        Soumet une extraction
+
+        Returns:
+            dict: L'extraction créée (copie), ou None si trop d'extractions en cours
+        """
+        with self._lock:
+            self._prune()
+            if self.pending_count() >= self.max_pending:
+                return None
+            job = {
+                'id': uuid.uuid4().hex[:12],
+                'url': url,
+                'kind': 'playlist' if is_playlist_url(url) else 'song',
+                'state': PENDING,
+                'result': None,
+                'submitted_at': datetime.now().isoformat(),
+                'finished_at': None,
+                '_expires': None,
+            }
+            self._jobs[job['id']] = job
+        self._executor.submit(self._run, job)
+        return self._public(job)
+
+    def get(self, job_id):
+        """Retourne une extraction (copie) ou None si inconnue ou expirée"""
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def pending_count(self):
+        return sum(1 for job in self._jobs.values() if job['state'] != DONE)
+
+    def _run(self, job):
+        with self._lock:
+            job['state'] = RUNNING
+        try:
+            if job['kind'] == 'playlist':
+                result = self.downloader.extract_playlist_metadata(job['url'])
+            else:
+                result = self.downloader.extract_metadata(job['url'])
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        with self._lock:
+            job['result'] = result
+            job['state'] = DONE
+            job['finished_at'] = datetime.now().isoformat()
+            job['_expires'] = time.monotonic() + self.result_ttl
+            public = self._public(job)
+
+        if self.on_done:
+            try:
+                self.on_done(public)
+            except Exception as e:
+                log_message('WARNING', f"Erreur callback extraction: {e}")
+
+    def _prune(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items() if job['_expires'] and job['_expires'] < now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _public(job):
+        return {key: value for key, value in job.items() if not key.startswith('_')}
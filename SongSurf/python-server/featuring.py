@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+featuring.py - Détection des artistes en featuring (titres et artistes)
+
+FONCTIONNALITÉ:
+  - Une seule expression compilée au chargement pour toutes les formes :
+    « (feat. X) », « (ft X) », « (featuring X) », « [feat. X] » et
+    « feat. X » sans parenthèses ; un seul passage par titre, pour trouver
+    les featuring comme pour les retirer
+  - Mots entiers seulement (« Left Behind » ou « Defeat » ne sont pas des
+    featuring, « Brandy » n'est pas coupé par « and »)
+  - Répare les titres abîmés par l'ancienne détection, qui comptait
+    « X) » en plus de « X » : « Song (feat. X), X) » -> « Song (feat. X) »
+  - Traitement par lots (detect_batch) : chaque artiste n'est analysé
+    qu'une fois, pour les milliers de morceaux de l'index de recherche
+    (correction de toute la bibliothèque, /api/featuring-corrections)
+  - Les dossiers d'artistes existants ne sont jamais coupés sur « & » ou
+    « , » (« Simon & Garfunkel », « Tyler, The Creator ») : seules les
+    mentions explicites feat./ft./featuring y sont relevées
+"""
+
+import re
+
+
+# Featuring entre parenthèses (avec la queue laissée par l'ancienne détection),
+# entre crochets, ou sans délimiteur jusqu'au prochain tiret ou parenthèse
+FEAT = re.compile(
+    r'\s*(?:'
+    r'\((?:featuring|feat|ft)\b\.?\s*(?P<paren>[^()]+)\)(?P<legacy>(?:\s*,\s*[^(),]+)*\))?'
+    r'|\[(?:featuring|feat|ft)\b\.?\s*(?P<square>[^\[\]]+)\]'
+    r'|\b(?:featuring|feat|ft)\b\.?\s+(?P<bare>[^-()\[\]]+)'
+    r')',
+    re.IGNORECASE
+)
+
+# Séparateurs d'une liste d'artistes : « A, B & C », « A and B », « A et B »
+SEPARATORS = re.compile(r'\s*(?:,|&|\band\b|\bet\b)\s*', re.IGNORECASE)
+
+# Champ artiste à plusieurs artistes (une virgule, ou &, and, et entourés d'espaces)
+MULTIPLE_ARTISTS = re.compile(r'\s(?:&|and|et)\s|,')
+
+SPACES = re.compile(r'\s{2,}')
+
+
+def split_artists(text):
+    """'A, B & C' -> ['A', 'B', 'C'] (doublons retirés, ordre conservé)"""
+    return unique(name.strip(' )]') for name in SEPARATORS.split(text))
+
+
+def unique(names):
+    """Noms non vides sans doublons (casse ignorée), dans l'ordre"""
+    seen = set()
+    result = []
+    for name in names:
+        key = name.casefold()
+        if name and key not in seen:
+            seen.add(key)
+            result.append(name)
+    return result
+
+
+def parse_title(title):
+    """
+    Featuring d'un titre
+
+    Returns:
+        tuple: (titre sans featuring, [artistes en featuring])
+    """
+    names = []
+
+    def collect(match):
+        for group in ('paren', 'square', 'bare', 'legacy'):
+            if match.group(group):
+                names.extend(split_artists(match.group(group)))
+        return ' '
+
+    clean_title = SPACES.sub(' ', FEAT.sub(collect, title)).strip()
+    return clean_title, unique(names)
+
+
+def parse_artist(artist, split=True):
+    """
+    Artiste principal et artistes en featuring d'un champ artiste
+    ('A & B', 'A, B', 'A feat. B')
+
+    Args:
+        split (bool): Couper aussi sur &, and, et et les virgules (métadonnées
+                      d'un téléchargement) ; sinon seules les mentions
+                      feat./ft./featuring comptent (noms de groupes existants)
+
+    Returns:
+        tuple: (artiste principal, [artistes en featuring])
+    """
+    main_artist, feat_artists = parse_title(artist)
+    if split and MULTIPLE_ARTISTS.search(main_artist):
+        names = split_artists(main_artist)
+        if names:
+            main_artist, feat_artists = names[0], names[1:] + feat_artists
+    return main_artist, unique(feat_artists)
+
+
+def detect(title, artist):
+    """
+    Featuring d'un morceau (titre et artiste)
+
+    Returns:
+        dict: {
+            'main_artist': str,
+            'feat_artists': list,
+            'clean_title': str,
+            'has_feat': bool
+        }
+    """
+    return _detect(title, parse_artist(artist))
+
+
+def detect_batch(tracks, split=True):
+    """
+    Featuring de plusieurs morceaux
+
+    Args:
+        tracks: [(titre, artiste), ...]
+        split (bool): Voir parse_artist (False pour les dossiers de la bibliothèque)
+
+    Returns:
+        list: résultats de detect(), dans l'ordre
+    """
+    artists = {}
+    results = []
+    for title, artist in tracks:
+        if artist not in artists:
+            artists[artist] = parse_artist(artist, split)
+        results.append(_detect(title, artists[artist]))
+    return results
+
+
+def _detect(title, parsed_artist):
+    main_artist, artist_feats = parsed_artist
+    clean_title, title_feats = parse_title(title)
+    feat_artists = [name for name in unique(title_feats + artist_feats)
+                    if name.casefold() != main_artist.casefold()]
+    return {
+        'main_artist': main_artist,
+        'feat_artists': feat_artists,
+        'clean_title': clean_title,
+        'has_feat': len(feat_artists) > 0
+    }
+
+
+def format_title(clean_title, feat_artists):
+    """'Song', ['A', 'B'] -> 'Song (feat. A, B)'"""
+    if not feat_artists:
+        return clean_title
+    return f"{clean_title} (feat. {', '.join(feat_artists)})"
+
+
+def add_featuring(title, feat_artist, main_artist):
+    """
+    Titre avec un featuring de plus, fusionné avec ceux déjà présents :
+    'Song (feat. A)', 'B' -> 'Song (feat. A, B)' (l'artiste principal est retiré)
+    """
+    clean_title, feat_artists = parse_title(title)
+    feat_artists = [name for name in unique(feat_artists + split_artists(feat_artist))
+                    if name.casefold() != main_artist.casefold()]
+    return format_title(clean_title, feat_artists)
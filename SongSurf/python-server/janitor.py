@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+janitor.py - Nettoyage automatique du dossier temporaire
+
+FONCTIONNALITÉ:
+  - Tourne en tâche de fond (thread daemon)
+  - Chaque job travaille dans temp/<job_id>/ : tout ce qui n'appartient pas
+    à un job en attente ou en cours est orphelin
+  - Supprime les orphelins plus vieux qu'un seuil
+  - Fait respecter un budget disque : au-delà, les orphelins les plus
+    anciens sont supprimés en premier, les jobs actifs jamais
+"""
+
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from logs import log_message
+
+
+def _entry_size_and_mtime(path):
+    """Taille totale et date de dernière modification d'un fichier ou dossier"""
+    if path.is_file():
+        stat = path.stat()
+        return stat.st_size, stat.st_mtime
+
+    size = 0
+    mtime = path.stat().st_mtime
+    for child in path.rglob('*'):
+        try:
+            stat = child.stat()
+        except OSError:
+            continue
+        if child.is_file():
+            size += stat.st_size
+        mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+class TempJanitor:
+    """Concierge du dossier temp/"""
+
+    # Un orphelin plus récent que ça n'est jamais supprimé (job en train de démarrer)
+    GRACE_SECONDS = 60
+
+    def __init__(self, temp_dir, active_jobs, max_age=3600, budget_bytes=None, interval=300):
+        """
+        Args:
+            temp_dir: Dossier temporaire
+            active_jobs (callable): Retourne l'ensemble des job_id en attente ou en cours
+            max_age (int): Âge (secondes) au-delà duquel un orphelin est supprimé
+            budget_bytes (int): Taille maximale du dossier temporaire (None = illimité)
+            interval (int): Secondes entre deux passages
+        """
+        self.temp_dir = Path(temp_dir)
+        self.active_jobs = active_jobs
+        self.max_age = max_age
+        self.budget_bytes = budget_bytes
+        self.interval = interval
+        self._lock = threading.Lock()  # Un seul passage à la fois (thread + /cleanup)
+        self._thread = None
+        self.last_report = None
+
+    def usage(self):
+        """Taille actuelle du dossier temporaire (octets)"""
+        return sum(_entry_size_and_mtime(entry)[0] for entry in self._entries())
+
+    def _entries(self):
+        if not self.temp_dir.exists():
+            return []
+        return list(self.temp_dir.iterdir())
+
+    def run_once(self, max_age=None):
+        """
+        Effectue un passage de nettoyage
+
+        Args:
+            max_age (int): Remplace le seuil d'âge (0 = tous les orphelins)
+
+        Returns:
+            dict: {deleted, freed_bytes, temp_bytes, over_budget}
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            now = time.time()
+            active = self.active_jobs()
+
+            entries = []
+            total = 0
+            for entry in self._entries():
+                try:
+                    size, mtime = _entry_size_and_mtime(entry)
+                except OSError:
+                    continue
+                total += size
+                if entry.name not in active:
+                    entries.append((mtime, size, entry))
+
+            # Les plus anciens d'abord
+            entries.sort(key=lambda e: e[0])
+
+            deleted = []
+            freed = 0
+            for mtime, size, entry in entries:
+                age = now - mtime
+                expired = age >= max_age
+                over_budget = self.budget_bytes is not None and total - freed > self.budget_bytes
+                if not expired and not (over_budget and age >= self.GRACE_SECONDS):
+                    continue
+                # Re-vérifier juste avant de supprimer : le job a pu démarrer entre-temps
+                if entry.name in self.active_jobs():
+                    continue
+                try:
+                    if entry.is_dir():
+                        shutil.rmtree(entry)
+                    else:
+                        entry.unlink()
+                except OSError as e:
+                    log_message('WARNING', f"Janitor: impossible de supprimer {entry.name}: {e}")
+                    continue
+                deleted.append(entry.name)
+                freed += size
+
+            remaining = total - freed
+            report = {
+                'deleted': deleted,
+                'freed_bytes': freed,
+                'temp_bytes': remaining,
+                'over_budget': self.budget_bytes is not None and remaining > self.budget_bytes
+            }
+            self.last_report = report
+
+        if deleted:
+            log_message('INFO', f"🧹 Janitor: {len(deleted)} orphelin(s) supprimé(s), {freed / 1024 / 1024:.1f} Mo libérés")
+        if report['over_budget']:
+            log_message('WARNING', f"Janitor: dossier temp au-dessus du budget "
+                                   f"({remaining / 1024 / 1024:.0f} / {self.budget_bytes / 1024 / 1024:.0f} Mo) "
+                                   f"avec uniquement des jobs actifs")
+        return report
+
+    def start(self):
+        """Démarre le nettoyage périodique dans un thread séparé"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='temp-janitor', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                log_message('ERROR', f"Erreur dans le janitor: {str(e)}")
+            time.sleep(self.interval)
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+job_store.py - Stockage persistant des jobs de téléchargement (SQLite)
+
+FONCTIONNALITÉ:
+  - Sert de queue de téléchargement (ordre d'arrivée, réservation atomique)
+  - Mémorise l'état de chaque job : étape, fichiers partiels, progression,
+    chronologie des étapes (tracing.py)
+  - Survit aux redémarrages : les jobs interrompus sont remis en queue
+    et reprennent là où ils s'étaient arrêtés
+  - Partagée entre processus (API et workers) : chacun ouvre sa connexion,
+    les demandes d'annulation et les événements des jobs y transitent
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+# États d'un job
+QUEUED = 'queued'          # En attente dans la queue
+RUNNING = 'running'        # Réservé par un worker
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+TERMINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Colonnes stockées en JSON
+JSON_FIELDS = ('metadata', 'playlist_info', 'progress', 'trace')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    state TEXT NOT NULL,
+    stage TEXT,
+    url TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    playlist_info TEXT,
+    connections INTEGER,
+    downloaded_file TEXT,
+    downloaded_bytes INTEGER DEFAULT 0,
+    total_bytes INTEGER DEFAULT 0,
+    final_path TEXT,
+    error TEXT,
+    added_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, seq);
+
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    pid INTEGER,
+    job_id TEXT,
+    stage TEXT,
+    jobs_done INTEGER DEFAULT 0,
+    rss_bytes INTEGER,
+    started_at TEXT,
+    heartbeat_at REAL,
+    progress_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+# Colonnes ajoutées après la création du schéma (bases existantes)
+MIGRATIONS = {
+    'progress': 'ALTER TABLE jobs ADD COLUMN progress TEXT',
+    'cancel_requested': 'ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER DEFAULT 0',
+    'worker': 'ALTER TABLE jobs ADD COLUMN worker TEXT',
+    'attempts': 'ALTER TABLE jobs ADD COLUMN attempts INTEGER DEFAULT 0',
+    'next_attempt_at': 'ALTER TABLE jobs ADD COLUMN next_attempt_at REAL',
+    'rate_limit': 'ALTER TABLE jobs ADD COLUMN rate_limit INTEGER',
+    'trace': 'ALTER TABLE jobs ADD COLUMN trace TEXT',
+    'queued_at': 'ALTER TABLE jobs ADD COLUMN queued_at REAL',
+    'finished_seq': 'ALTER TABLE jobs ADD COLUMN finished_seq INTEGER',
+}
+
+# Numéro de fin (monotone) attribué dans la transaction qui rend un job terminal :
+# les exports (/api/jobs/traces) reprennent sans manquer un job fini après un plus récent
+NEXT_FINISHED_SEQ = '(SELECT COALESCE(MAX(finished_seq), 0) + 1 FROM jobs)'
+
+
+class JobStore:
+    """Queue de jobs persistante, partagée entre threads"""
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                try:
+                    self._conn.execute(statement)
+                except sqlite3.OperationalError:
+                    pass  # Ajoutée entre-temps par un autre processus
+        # Jobs terminés avant l'ajout de finished_seq : numérotés dans l'ordre d'arrivée
+        self._conn.execute(
+            f"UPDATE jobs SET finished_seq = seq WHERE finished_seq IS NULL "
+            f"AND state IN ({','.join('?' * len(TERMINAL_STATES))})",
+            TERMINAL_STATES
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_seq)')
+
+    # ------------------------------------------
+    # Lecture
+    # ------------------------------------------
+
+    def _to_dict(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in JSON_FIELDS:
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def get(self, job_id):
+        """Retourne un job par son identifiant (ou None)"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def list(self, states=None, limit=None, after_seq=None, after_finished_seq=None, cancelled=True):
+        """
+        Liste les jobs (dans l'ordre d'arrivée), éventuellement filtrés par état
+
+        Args:
+            after_seq (int): Seulement les jobs arrivés après ce numéro (pagination)
+            after_finished_seq (int): Seulement les jobs terminés après ce numéro de
+                fin, dans l'ordre où ils se sont terminés (pagination des exports)
+            cancelled (bool): False pour écarter les jobs annulés, y compris ceux
+                remis en queue avec une demande d'annulation (écartés plus tard par un worker)
+        """
+        query = 'SELECT * FROM jobs'
+        conditions = []
+        params = []
+        if states:
+            conditions.append(f"state IN ({','.join('?' * len(states))})")
+            params.extend(states)
+        if not cancelled:
+            conditions.append('state != ? AND NOT COALESCE(cancel_requested, 0)')
+            params.append(CANCELLED)
+        if after_seq is not None:
+            conditions.append('seq > ?')
+            params.append(after_seq)
+        if after_finished_seq is not None:
+            conditions.append('finished_seq > ?')
+            params.append(after_finished_seq)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY finished_seq' if after_finished_seq is not None else ' ORDER BY seq'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def active_ids(self):
+        """Identifiants des jobs en attente ou en cours"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id FROM jobs WHERE state IN (?, ?)', (QUEUED, RUNNING)
+            ).fetchall()
+        return {row['id'] for row in rows}
+
+    def count(self, state, cancelled=True):
+        """Nombre de jobs dans un état donné (cancelled : voir list)"""
+        query = 'SELECT COUNT(*) FROM jobs WHERE state = ?'
+        if not cancelled:
+            query += ' AND NOT COALESCE(cancel_requested, 0)'
+        with self._lock:
+            return self._conn.execute(query, (state,)).fetchone()[0]
+
+    def count_by_state(self):
+        """Nombre de jobs par état : {état: nombre}"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) AS n FROM jobs GROUP BY state').fetchall()
+        return {row['state']: row['n'] for row in rows}
+
+    def latest(self, states):
+        """Dernier job (par date de mise à jour) parmi les états donnés, ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({','.join('?' * len(states))}) "
+                "ORDER BY updated_at DESC, seq DESC LIMIT 1",
+                tuple(states)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def cancel_requested(self, job_id):
+        """Une annulation a-t-elle été demandée pour ce job ?"""
+        with self._lock:
+            row = self._conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def get_value(self, key):
+        """Valeur partagée (JSON) enregistrée sous `key`, ou None"""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['value']) if row else None
+
+    def workers(self):
+        """État déclaré par chaque worker (battement de cœur, job en cours...)"""
+        with self._lock:
+            rows = self._conn.execute('SELECT * FROM workers ORDER BY name').fetchall()
+        return [dict(row) for row in rows]
+
+    def events_since(self, seq, limit=500):
+        """
+        Événements publiés après `seq`
+
+        Returns:
+            list: [(seq, type, data), ...] dans l'ordre de publication
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, type, data FROM events WHERE seq > ? ORDER BY seq LIMIT ?', (seq, limit)
+            ).fetchall()
+        return [(row['seq'], row['type'], json.loads(row['data'])) for row in rows]
+
+    def last_event_seq(self):
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(seq), 0) FROM events').fetchone()[0]
+
+    # ------------------------------------------
+    # Écriture
+    # ------------------------------------------
+
+    def add(self, job):
+        """Ajoute un job en fin de queue"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (id, state, url, metadata, playlist_info, connections, rate_limit, added_at, updated_at, '
+                'queued_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    job['id'], QUEUED, job['url'],
+                    json.dumps(job['metadata']),
+                    json.dumps(job['playlist_info']) if job.get('playlist_info') else None,
+                    job.get('connections'),
+                    job.get('rate_limit'),
+                    job.get('added_at') or now, now, time.time()
+                )
+            )
+
+    def claim_next(self, worker=None, singles_only=False, max_running=None):
+        """
+        Réserve atomiquement le plus ancien job en attente (ou None), entre threads comme entre processus
+
+        Les jobs en attente d'une nouvelle tentative (next_attempt_at futur) sont ignorés.
+
+        Args:
+            singles_only (bool): Ignorer les jobs d'album/playlist (hors heures creuses)
+            max_running (int): Ne rien réserver si autant de jobs tournent déjà
+                (concurrence adaptative)
+        """
+        query = 'SELECT * FROM jobs WHERE state = ? AND (next_attempt_at IS NULL OR next_attempt_at <= ?) '
+        if singles_only:
+            query += 'AND playlist_info IS NULL '
+        query += 'ORDER BY seq LIMIT 1'
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = None
+                running = self._conn.execute('SELECT COUNT(*) FROM jobs WHERE state = ?', (RUNNING,)).fetchone()[0]
+                if max_running is None or running < max_running:
+                    row = self._conn.execute(query, (QUEUED, time.time())).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        'UPDATE jobs SET state = ?, worker = ?, updated_at = ? WHERE id = ?',
+                        (RUNNING, worker, datetime.now().isoformat(), row['id'])
+                    )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        job = self._to_dict(row)
+        if job is not None:
+            job['state'] = RUNNING
+            job['worker'] = worker
+        return job
+
+    def update(self, job_id, **fields):
+        """Met à jour des champs d'un job (stage, fichiers, progression...)"""
+        if not fields:
+            return
+        fields['updated_at'] = datetime.now().isoformat()
+        for field in JSON_FIELDS:
+            if field in fields and fields[field] is not None:
+                fields[field] = json.dumps(fields[field])
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        if fields.get('state') in TERMINAL_STATES:
+            assignments += f', finished_seq = {NEXT_FINISHED_SEQ}'
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def request_cancel(self, job_id):
+        """Demande l'annulation d'un job en cours (le worker qui le traite la verra)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND state = ?',
+                (datetime.now().isoformat(), job_id, RUNNING)
+            )
+            return cursor.rowcount > 0
+
+    def heartbeat(self, name, **fields):
+        """Enregistre l'état d'un worker (crée sa ligne au premier appel)"""
+        columns = ['name', *fields]
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO workers ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+                f"ON CONFLICT(name) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in fields)}",
+                (name, *fields.values())
+            )
+
+    def reset_workers(self):
+        """Oublie les workers déclarés (au démarrage du serveur, avant de lancer les workers)"""
+        with self._lock:
+            self._conn.execute('DELETE FROM workers')
+
+    def retry(self, job_id, error, delay=None):
+        """
+        Remet un job en queue pour une nouvelle tentative (étape et fichiers partiels conservés)
+
+        Args:
+            delay (float): Secondes avant que le job puisse être réservé à nouveau
+        """
+        next_attempt_at = time.time() + delay if delay else None
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET state = ?, worker = NULL, progress = NULL, error = ?, '
+                'attempts = COALESCE(attempts, 0) + 1, next_attempt_at = ?, updated_at = ?, queued_at = ? WHERE id = ?',
+                (QUEUED, error, next_attempt_at, datetime.now().isoformat(), time.time(), job_id)
+            )
+
+    def update_value(self, key, change, default):
+        """
+        Modifie atomiquement une valeur partagée (lecture, change(valeur), écriture)
+
+        Returns:
+            La nouvelle valeur
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT value FROM kv WHERE key = ?', (key,)).fetchone()
+                value = change(json.loads(row['value']) if row else default)
+                self._conn.execute(
+                    'INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                    (key, json.dumps(value))
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return value
+
+    def set_value(self, key, value):
+        """Enregistre une valeur partagée (JSON) ; None la supprime"""
+        with self._lock:
+            if value is None:
+                self._conn.execute('DELETE FROM kv WHERE key = ?', (key,))
+            else:
+                self._conn.execute(
+                    'INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                    (key, json.dumps(value))
+                )
+
+    def add_event(self, event_type, data):
+        """Publie un événement de job (relayé sur /events par le serveur API)"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO events (type, data, created_at) VALUES (?, ?, ?)',
+                (event_type, json.dumps(data, default=str), datetime.now().isoformat())
+            )
+
+    def cancel_if_queued(self, job_id):
+        """Annule un job encore en attente. Retourne True si c'était le cas."""
+        with self._lock:
+            cursor = self._conn.execute(
+                f'UPDATE jobs SET state = ?, updated_at = ?, finished_seq = {NEXT_FINISHED_SEQ} '
+                'WHERE id = ? AND state = ?',
+                (CANCELLED, datetime.now().isoformat(), job_id, QUEUED)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_interrupted(self):
+        """
+        Remet en queue les jobs qui tournaient lors de l'arrêt du serveur
+
+        Leur étape et leurs fichiers partiels sont conservés pour la reprise.
+        Retourne le nombre de jobs concernés.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET state = ?, worker = NULL, progress = NULL, updated_at = ?, queued_at = ? WHERE state = ?',
+                (QUEUED, datetime.now().isoformat(), time.time(), RUNNING)
+            )
+            return cursor.rowcount
+
+    def requeue_worker(self, worker):
+        """Remet en queue les jobs d'un worker arrêté ou mort (comme requeue_interrupted)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET state = ?, worker = NULL, progress = NULL, updated_at = ?, queued_at = ? '
+                'WHERE state = ? AND worker = ?',
+                (QUEUED, datetime.now().isoformat(), time.time(), RUNNING, worker)
+            )
+            return cursor.rowcount
+
+    def prune_events(self, keep=1000):
+        """Ne garde que les `keep` derniers événements"""
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM events WHERE seq <= (SELECT COALESCE(MAX(seq), 0) FROM events) - ?', (keep,)
+            )
+
+    def prune(self, keep=500):
+        """Supprime les plus anciens jobs terminés au-delà de `keep`"""
+        self.prune_events()
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE state IN ({','.join('?' * len(TERMINAL_STATES))}) AND seq NOT IN ("
+                f"  SELECT seq FROM jobs WHERE state IN ({','.join('?' * len(TERMINAL_STATES))})"
+                "   ORDER BY seq DESC LIMIT ?)",
+                (*TERMINAL_STATES, *TERMINAL_STATES, keep)
+            )
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+library_index.py - Index de recherche de la bibliothèque (SQLite FTS5)
+
+FONCTIONNALITÉ:
+  - Indexe titre, artiste, album et artistes en featuring de chaque morceau
+    (noms des dossiers et des fichiers, comme /api/library)
+  - Recherche insensible à la casse et aux accents : « beyonce » trouve
+    « Beyoncé », « hal » trouve « Halo » (préfixe de chaque mot) ; sans
+    résultat, repli sur les trigrammes (« ove » trouve « Love »)
+  - Résultats classés (BM25, le titre pèse plus que l'artiste, puis
+    l'album) et paginés
+  - Index persistant (state/) tenu à jour par un thread : seuls les
+    dossiers d'albums modifiés depuis le dernier passage sont relus,
+    aussitôt après un téléchargement terminé ou une modification de la
+    bibliothèque, et périodiquement pour les changements faits à la main
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from featuring import parse_title
+from library_scan import album_songs, scan_album_directories
+from logs import log_message
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS albums (
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (artist, album)
+);
+
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    artist TEXT NOT NULL,
+    album TEXT NOT NULL,
+    file TEXT NOT NULL,
+    featuring TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tracks_album ON tracks (artist, album);
+
+-- Mots (préfixes indexés jusqu'à 3 caractères), texte déjà normalisé
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_words USING fts5(
+    title, artist, album, featuring, tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3'
+);
+
+-- Trigrammes (sous-chaînes de 3 caractères ou plus)
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_trigrams USING fts5(text, tokenize = 'trigram');
+"""
+
+# Poids BM25 des colonnes de tracks_words : titre, artiste, album, featuring
+WEIGHTS = (10.0, 6.0, 3.0, 4.0)
+
+# Événements (/events) après lesquels la bibliothèque a changé
+REFRESH_EVENTS = ('job_completed',)
+
+def normalize(text):
+    """Minuscules sans accents : 'Beyoncé' -> 'beyonce'"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def featured_artists(title):
+    """Artistes en featuring d'un titre organisé : 'Song (feat. A, B)' -> ['A', 'B']"""
+    return parse_title(title)[1]
+
+
+class LibraryIndex:
+    """Index de recherche persistant, partagé entre les threads de l'API"""
+
+    CHUNK = 500  # Albums écrits par transaction (les recherches ne patientent pas derrière tout l'index)
+
+    def __init__(self, db_path, music_dir, workers=8, refresh_interval=60, bus=None):
+        """
+        Args:
+            db_path: Fichier SQLite de l'index
+            music_dir: Bibliothèque indexée
+            workers (int): Dossiers lus en parallèle
+            refresh_interval (float): Secondes max entre deux mises à jour (changements faits à la main)
+            bus (EventBus): Événements des jobs (mise à jour dès qu'un téléchargement se termine)
+
+        Raises:
+            RuntimeError: SQLite compilé sans FTS5
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.music_dir = Path(music_dir)
+        self.workers = workers
+        self.refresh_interval = refresh_interval
+        self.bus = bus
+        self.ready = False  # Premier passage terminé : l'index reflète la bibliothèque
+        self.refreshed_at = None
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._requested = threading.Event()
+        self._thread = None
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        try:
+            self._conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            raise RuntimeError(f"SQLite sans FTS5 ou sans tokenizer trigram (SQLite {sqlite3.sqlite_version}): {e}")
+
+    # ------------------------------------------
+    # Mise à jour
+    # ------------------------------------------
+
+    def refresh(self):
+        """
+        Relit les albums ajoutés, modifiés ou supprimés depuis le dernier passage
+
+        Returns:
+            dict: {albums, added, removed, tracks, seconds}
+        """
+        with self._refresh_lock:
+            started = time.time()
+            current = scan_album_directories(self.music_dir, self.workers)
+            with self._lock:
+                known = {(row['artist'], row['album']): row['mtime_ns']
+                         for row in self._conn.execute('SELECT * FROM albums')}
+            changed = [key for key, mtime_ns in current.items() if known.get(key) != mtime_ns]
+            removed = [key for key in known if key not in current]
+
+            # Morceaux des albums modifiés, lus en parallèle (un album disparu entre-temps : vide)
+            def read(key):
+                try:
+                    return key, album_songs(os.path.join(self.music_dir, *key))
+                except OSError:
+                    return key, []
+
+            tracks = 0
+            with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='library-index') as pool:
+                listed = list(pool.map(read, changed))
+            for start in range(0, max(len(listed), len(removed)), self.CHUNK):
+                chunk = listed[start:start + self.CHUNK]
+                with self._lock:
+                    self._conn.execute('BEGIN IMMEDIATE')
+                    try:
+                        for key in removed[start:start + self.CHUNK] + [key for key, _ in chunk]:
+                            self._remove_album(*key)
+                        for (artist, album), songs in chunk:
+                            self._add_album(artist, album, current[(artist, album)], songs)
+                            tracks += len(songs)
+                        self._conn.execute('COMMIT')
+                    except Exception:
+                        self._conn.execute('ROLLBACK')
+                        raise
+
+            self.ready = True
+            self.refreshed_at = time.time()
+            summary = {
+                'albums': len(current),
+                'added': len(changed),
+                'removed': len(removed),
+                'tracks': tracks,
+                'seconds': round(self.refreshed_at - started, 3)
+            }
+            if changed or removed:
+                log_message('INFO', f"🔎 Index de recherche mis à jour: {len(changed)} album(s) relu(s), "
+                                    f"{len(removed)} supprimé(s)", summary)
+            return summary
+
+    def _remove_album(self, artist, album):
+        ids = [row[0] for row in self._conn.execute(
+            'SELECT id FROM tracks WHERE artist = ? AND album = ?', (artist, album))]
+        if ids:
+            self._conn.executemany('DELETE FROM tracks_words WHERE rowid = ?', [(i,) for i in ids])
+            self._conn.executemany('DELETE FROM tracks_trigrams WHERE rowid = ?', [(i,) for i in ids])
+            self._conn.execute('DELETE FROM tracks WHERE artist = ? AND album = ?', (artist, album))
+        self._conn.execute('DELETE FROM albums WHERE artist = ? AND album = ?', (artist, album))
+
+    def _add_album(self, artist, album, mtime_ns, songs):
+        self._conn.execute('INSERT INTO albums (artist, album, mtime_ns) VALUES (?, ?, ?)',
+                           (artist, album, mtime_ns))
+        for song in songs:
+            title = Path(song).stem
+            featuring = featured_artists(title)
+            cursor = self._conn.execute(
+                'INSERT INTO tracks (artist, album, file, featuring) VALUES (?, ?, ?, ?)',
+                (artist, album, song, '\n'.join(featuring))
+            )
+            words = (normalize(title), normalize(artist), normalize(album), normalize(' '.join(featuring)))
+            self._conn.execute(
+                'INSERT INTO tracks_words (rowid, title, artist, album, featuring) VALUES (?, ?, ?, ?, ?)',
+                (cursor.lastrowid, *words)
+            )
+            self._conn.execute('INSERT INTO tracks_trigrams (rowid, text) VALUES (?, ?)',
+                               (cursor.lastrowid, ' | '.join(words)))
+
+    def request_refresh(self):
+        """Demande une mise à jour immédiate (bibliothèque modifiée par l'API)"""
+        self._requested.set()
+
+    def start(self):
+        """Premier passage puis mises à jour dans un thread séparé"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='library-index', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        subscription = self.bus.subscribe() if self.bus is not None else None
+        last = 0
+        while True:
+            due = time.time() - last >= self.refresh_interval
+            if due or self._requested.is_set():
+                self._requested.clear()
+                try:
+                    self.refresh()
+                except Exception as e:
+                    log_message('ERROR', f"Erreur de mise à jour de l'index de recherche: {str(e)}")
+                last = time.time()
+            # Réveil : téléchargement terminé, demande de l'API, ou échéance périodique
+            wait = max(0.1, self.refresh_interval - (time.time() - last))
+            if subscription is None:
+                self._requested.wait(wait)
+                continue
+            batch = subscription.next_batch(timeout=min(wait, 1.0))
+            if any(event_type in REFRESH_EVENTS for event_type, _ in batch):
+                self._requested.set()
+
+    # ------------------------------------------
+    # Recherche
+    # ------------------------------------------
+
+    def search(self, query, page=1, per_page=20):
+        """
+        Recherche dans la bibliothèque
+
+        Chaque mot de la requête doit apparaître (en début de mot) dans le
+        titre, l'artiste, l'album ou un featuring ; sans résultat, les mots
+        d'au moins 3 caractères sont cherchés n'importe où (trigrammes).
+
+        Returns:
+            dict: {total, page, per_page, match (prefix|trigram|None), results: [...]}
+        """
+        terms = re.findall(r'\w+', normalize(query))
+        offset = (page - 1) * per_page
+        result = {'total': 0, 'page': page, 'per_page': per_page, 'match': None, 'results': []}
+        if not terms:
+            return result
+
+        searches = [
+            ('prefix', 'tracks_words', ' '.join(f'"{term}"*' for term in terms),
+             'bm25(tracks_words, {})'.format(', '.join(str(weight) for weight in WEIGHTS))),
+        ]
+        long_terms = [term for term in terms if len(term) >= 3]
+        if long_terms:
+            searches.append(('trigram', 'tracks_trigrams', ' AND '.join(f'"{term}"' for term in long_terms),
+                             'bm25(tracks_trigrams)'))
+
+        with self._lock:
+            for match, table, expression, rank in searches:
+                total = self._conn.execute(
+                    f'SELECT count(*) FROM {table} WHERE {table} MATCH ?', (expression,)
+                ).fetchone()[0]
+                if not total:
+                    continue
+                rows = self._conn.execute(
+                    f'SELECT tracks.* FROM {table} JOIN tracks ON tracks.id = {table}.rowid '
+                    f'WHERE {table} MATCH ? ORDER BY {rank}, tracks.artist, tracks.album, tracks.file '
+                    f'LIMIT ? OFFSET ?',
+                    (expression, per_page, offset)
+                ).fetchall()
+                result.update(total=total, match=match, results=[self._to_result(row) for row in rows])
+                break
+        return result
+
+    def _to_result(self, row):
+        return {
+            'title': Path(row['file']).stem,
+            'artist': row['artist'],
+            'album': row['album'],
+            'featuring': row['featuring'].split('\n') if row['featuring'] else [],
+            'path': str(Path(row['artist'], row['album'], row['file']))
+        }
+
+    def tracks(self, batch_size=5000):
+        """
+        Morceaux indexés, par lots (sans ouvrir les MP3)
+
+        Yields:
+            list: [(artiste, album, fichier), ...]
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, artist, album, file FROM tracks WHERE id > ? ORDER BY id LIMIT ?',
+                    (last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield [(row['artist'], row['album'], row['file']) for row in rows]
+
+    def count(self):
+        """Nombre de morceaux indexés"""
+        with self._lock:
+            return self._conn.execute('SELECT count(*) FROM tracks').fetchone()[0]
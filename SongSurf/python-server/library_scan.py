@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+library_scan.py - Parcours parallèle de la bibliothèque (Artiste/Album/Titre.mp3)
+
+FONCTIONNALITÉ:
+  - Un seul os.scandir par dossier : type des entrées sans stat() séparé,
+    plus de glob('*.mp3') par album
+  - Les dossiers d'artistes puis d'albums sont lus en parallèle par un pool
+    de threads, avec la lecture des en-têtes (durées, pochette du premier
+    morceau) : sur un stockage réseau (NFS, SMB), le temps d'un parcours à
+    froid suit le nombre de dossiers divisé par le parallélisme, et non
+    leur somme
+  - Utilisé par get_stats (/stats), get_library_structure (/api/library)
+    et l'index de recherche (library_index.py : dossiers d'albums modifiés)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from mutagen.id3 import ID3
+
+from mp3info import read_duration
+from logs import get_logger
+
+
+logger = get_logger('library_scan')
+
+
+def _subdirectories(path):
+    """Noms des sous-dossiers d'un dossier (un seul scandir)"""
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries if entry.is_dir()]
+
+
+def _has_cover(path):
+    """Le MP3 a-t-il une pochette intégrée (APIC) ?"""
+    try:
+        return bool(ID3(path).getall('APIC'))
+    except Exception:
+        return False
+
+
+def album_songs(path):
+    """Fichiers MP3 d'un dossier d'album, triés (un seul scandir)"""
+    with os.scandir(path) as entries:
+        return sorted(entry.name for entry in entries if entry.name.endswith('.mp3') and entry.is_file())
+
+
+def _album_directories(path):
+    """Sous-dossiers d'un dossier d'artiste, avec leur date de modification"""
+    with os.scandir(path) as entries:
+        return [(entry.name, entry.stat().st_mtime_ns) for entry in entries if entry.is_dir()]
+
+
+def _scan_album(path, durations, covers):
+    """
+    Morceaux d'un album (triés), et si demandé leur durée totale et la
+    présence d'une pochette dans le premier morceau (celui de /api/cover)
+    """
+    songs = album_songs(path)
+    album = {'songs': songs}
+    if durations:
+        total = 0
+        for song in songs:
+            try:
+                total += read_duration(os.path.join(path, song))
+            except Exception:
+                pass  # Ignorer les fichiers corrompus
+        album['duration'] = total
+    if covers:
+        album['has_cover'] = bool(songs) and _has_cover(os.path.join(path, songs[0]))
+    return album
+
+
+def scan_library(music_dir, workers=8, durations=False, covers=False):
+    """
+    Parcourt la bibliothèque en parallèle
+
+    Args:
+        music_dir: Dossier de la bibliothèque (un sous-dossier par artiste)
+        workers (int): Dossiers lus en parallèle
+        durations (bool): Lire la durée de chaque morceau (en-têtes MPEG)
+        covers (bool): Vérifier la pochette du premier morceau de chaque album
+
+    Returns:
+        list: [{name, albums: [{name, songs, duration?, has_cover?}, ...]}, ...],
+              artistes et albums triés par nom ; un dossier illisible est ignoré
+
+    Raises:
+        OSError: music_dir illisible
+    """
+    music_dir = os.fspath(music_dir)
+    artists = {name: {} for name in _subdirectories(music_dir)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='library-scan') as pool:
+        # Les albums d'un artiste sont soumis dès que son dossier est lu (pas d'attente dans le pool)
+        listings = {pool.submit(_subdirectories, os.path.join(music_dir, artist)): artist for artist in artists}
+        albums = {}
+        for future in as_completed(listings):
+            artist = listings[future]
+            try:
+                names = future.result()
+            except OSError as e:
+                logger.warning(f"⚠️ Dossier d'artiste illisible ignoré: {artist} ({e})")
+                continue
+            for album in names:
+                path = os.path.join(music_dir, artist, album)
+                albums[pool.submit(_scan_album, path, durations, covers)] = (artist, album)
+
+        for future in as_completed(albums):
+            artist, album = albums[future]
+            try:
+                artists[artist][album] = future.result()
+            except OSError as e:
+                logger.warning(f"⚠️ Dossier d'album illisible ignoré: {artist}/{album} ({e})")
+
+    return [
+        {'name': artist, 'albums': [{'name': album, **content[album]} for album in sorted(content)]}
+        for artist, content in sorted(artists.items())
+    ]
+
+
+def scan_album_directories(music_dir, workers=8):
+    """
+    Dossiers d'albums et leur date de modification, sans lire les morceaux
+
+    Ajouter, supprimer ou renommer un morceau change la date du dossier de
+    son album : comparée à celle d'un parcours précédent, elle désigne les
+    seuls albums à relire.
+
+    Returns:
+        dict: {(artiste, album): mtime_ns}
+
+    Raises:
+        OSError: music_dir illisible
+    """
+    music_dir = os.fspath(music_dir)
+    albums = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='library-scan') as pool:
+        listings = {pool.submit(_album_directories, os.path.join(music_dir, artist)): artist
+                    for artist in _subdirectories(music_dir)}
+        for future in as_completed(listings):
+            artist = listings[future]
+            try:
+                for album, mtime_ns in future.result():
+                    albums[(artist, album)] = mtime_ns
+            except OSError as e:
+                logger.warning(f"⚠️ Dossier d'artiste illisible ignoré: {artist} ({e})")
+    return albums
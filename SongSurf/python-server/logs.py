@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+logs.py - Logs structurés et asynchrones
+
+FONCTIONNALITÉ:
+  - Un logger 'songsurf' par processus (API, chaque worker) : les appels
+    déposent l'enregistrement dans une file (QueueHandler) et un thread
+    dédié (QueueListener) écrit sur la console ; un téléchargement n'attend
+    jamais l'écriture sur stdout
+  - Niveaux DEBUG, INFO, SUCCESS, WARNING, ERROR : le détail fichier par
+    fichier (tags, pochettes, chemins) n'apparaît qu'au niveau DEBUG
+  - Chaque ligne porte le processus, et le job et l'étape en cours quand
+    elle est émise pendant un job (log_context / bind_context)
+  - Format texte (console) ou JSON lines (collecteurs de logs)
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+
+
+SUCCESS = 25  # Entre INFO et WARNING
+logging.addLevelName(SUCCESS, 'SUCCESS')
+
+LEVELS = {
+    'DEBUG': logging.DEBUG,
+    'INFO': logging.INFO,
+    'SUCCESS': SUCCESS,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR,
+}
+
+# Champs structurés ajoutés à chaque ligne par log_context (job_id, stage...)
+_context = contextvars.ContextVar('songsurf_log_context', default={})
+_listener = None
+
+
+def get_logger(name=None):
+    """Logger d'un module : get_logger('downloader') -> 'songsurf.downloader'"""
+    return logging.getLogger(f'songsurf.{name}' if name else 'songsurf')
+
+
+@contextmanager
+def log_context(**fields):
+    """Ajoute des champs (job_id...) à toutes les lignes émises dans le bloc, par ce thread"""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def bind_context(**fields):
+    """Modifie les champs du bloc log_context en cours (nouvelle étape d'un job)"""
+    _context.set({**_context.get(), **fields})
+
+
+def log_message(level, message, data=None, **fields):
+    """
+    Log d'un message (API historique, utilisée dans tout le serveur)
+
+    Args:
+        level (str): DEBUG, INFO, SUCCESS, WARNING ou ERROR
+        data (dict): Détails affichés sous le message
+        **fields: Champs structurés (job_id, stage...)
+    """
+    get_logger().log(LEVELS.get(level, logging.INFO), message, extra={'data': data, 'fields': fields})
+
+
+class ContextFilter(logging.Filter):
+    """Complète chaque enregistrement : processus, job et étape en cours"""
+
+    def __init__(self, process):
+        super().__init__()
+        self.process = process
+
+    def filter(self, record):
+        # Appelé dans le thread émetteur : le contexte du job y est encore visible
+        fields = {**_context.get(), **(getattr(record, 'fields', None) or {})}
+        record.fields = fields
+        record.songsurf_process = self.process
+        if not hasattr(record, 'data'):
+            record.data = None
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """'12:00:01 worker-1 [INFO] message (job=abc stage=download)' (l'emoji est dans le message)"""
+
+    def format(self, record):
+        message = record.getMessage()
+        fields = ' '.join(
+            f"{'job' if name == 'job_id' else name}={value}"
+            for name, value in record.fields.items() if value is not None
+        )
+        line = (f"{datetime.fromtimestamp(record.created):%H:%M:%S} {record.songsurf_process} "
+                f"[{record.levelname}] {message}")
+        if fields:
+            line += f' ({fields})'
+        if record.data:
+            line += f'\n   Data: {record.data}'
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'process': record.songsurf_process,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **{name: value for name, value in record.fields.items() if value is not None},
+        }
+        if record.data:
+            entry['data'] = record.data
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level='INFO', fmt='text', process='api', stream=None):
+    """
+    Configure le logger 'songsurf' du processus (à appeler une fois au démarrage)
+
+    Args:
+        level (str): Niveau minimal affiché (DEBUG pour le détail par fichier)
+        fmt (str): text ou json
+        process (str): Nom du processus sur chaque ligne (api, worker-1...)
+    """
+    global _listener
+
+    logger = get_logger()
+    logger.setLevel(LEVELS.get(str(level).upper(), logging.INFO))
+    logger.propagate = False
+
+    if _listener is not None:
+        _listener.stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    records = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(records)
+    handler.addFilter(ContextFilter(process))
+    logger.addHandler(handler)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def stop_logging():
+    """Vide la file (écrit les derniers logs) et arrête le thread d'écriture"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
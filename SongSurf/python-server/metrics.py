@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+metrics.py - Métriques au format Prometheus (/metrics)
+
+FONCTIONNALITÉ:
+  - Compteurs et histogrammes simples, sans dépendance externe
+  - Les workers cumulent les métriques d'un job en mémoire puis les
+    versent en une seule transaction dans la queue persistante : les
+    totaux couvrent tous les processus et survivent aux recyclages
+  - Le serveur API garde ses propres métriques en mémoire (scans de la
+    bibliothèque) et assemble le tout au format texte de Prometheus
+"""
+
+import copy
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Bornes des histogrammes de durée (secondes)
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Description de chaque métrique : (type, aide)
+METRICS = {
+    'songsurf_queue_jobs': ('gauge', 'Jobs dans la queue, par état'),
+    'songsurf_workers': ('gauge', 'Workers déclarés (battement de cœur)'),
+    'songsurf_jobs_completed_total': ('counter', 'Jobs terminés avec succès'),
+    'songsurf_jobs_failed_total': ('counter', 'Jobs en échec définitif'),
+    'songsurf_jobs_cancelled_total': ('counter', 'Jobs annulés en cours de traitement'),
+    'songsurf_job_retries_total': ('counter', 'Jobs remis en queue pour une nouvelle tentative'),
+    'songsurf_downloaded_bytes_total': ('counter', 'Octets audio téléchargés'),
+    'songsurf_stage_duration_seconds': ('histogram', 'Durée des étapes d\'un job (queue, extract, fetch, transcode, cover, tag, move)'),
+    'songsurf_cover_cache_requests_total': ('counter', 'Demandes de pochettes, par résultat du cache (hit, miss)'),
+    'songsurf_cover_cache_hit_ratio': ('gauge', 'Part des pochettes servies depuis le cache'),
+    'songsurf_cover_cache_entries': ('gauge', 'Pochettes en cache'),
+    'songsurf_cover_cache_bytes': ('gauge', 'Taille des pochettes en cache (octets)'),
+    'songsurf_library_scan_duration_seconds': ('histogram', 'Durée des parcours et recherches dans la bibliothèque (stats, structure, search, featuring)'),
+}
+
+
+def label_key(labels):
+    """Étiquettes au format Prometheus : 'stage="fetch"' (triées, échappées)"""
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    )
+
+
+def empty_state():
+    return {'counters': {}, 'histograms': {}}
+
+
+def merge_states(target, source):
+    """Ajoute les valeurs de `source` à `target` (modifié et retourné)"""
+    for name, series in source.get('counters', {}).items():
+        counters = target['counters'].setdefault(name, {})
+        for key, value in series.items():
+            counters[key] = counters.get(key, 0) + value
+    for name, series in source.get('histograms', {}).items():
+        histograms = target['histograms'].setdefault(name, {})
+        for key, histogram in series.items():
+            current = histograms.get(key)
+            if current is None or len(current['buckets']) != len(histogram['buckets']):
+                histograms[key] = copy.deepcopy(histogram)
+                continue
+            current['buckets'] = [a + b for a, b in zip(current['buckets'], histogram['buckets'])]
+            current['sum'] += histogram['sum']
+            current['count'] += histogram['count']
+    return target
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes en mémoire (état JSON, fusionnable)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = empty_state()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._state['counters'].setdefault(name, {})
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DURATION_BUCKETS, **labels):
+        with self._lock:
+            series = self._state['histograms'].setdefault(name, {})
+            histogram = series.setdefault(label_key(labels), {
+                'bounds': list(buckets), 'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0
+            })
+            for index, bound in enumerate(histogram['bounds']):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Mesure la durée du bloc dans l'histogramme `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._state)
+
+    def reset(self):
+        with self._lock:
+            self._state = empty_state()
+
+    def empty(self):
+        with self._lock:
+            return not self._state['counters'] and not self._state['histograms']
+
+
+class StoreMetrics:
+    """Métriques des workers, cumulées dans la queue persistante (tous processus)"""
+
+    KEY = 'metrics'
+
+    def __init__(self, store):
+        self.store = store
+
+    def flush(self, registry):
+        """Verse les métriques d'un registre (un job) dans les totaux partagés, puis le vide"""
+        if registry.empty():
+            return
+        state = registry.snapshot()
+        self.store.update_value(self.KEY, lambda total: merge_states(total, state), empty_state())
+        registry.reset()
+
+    def snapshot(self):
+        return self.store.get_value(self.KEY) or empty_state()
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _series_name(name, key, extra=''):
+    labels = ','.join(part for part in (key, extra) if part)
+    return f'{name}{{{labels}}}' if labels else name
+
+
+def render(state, gauges=None):
+    """
+    Format texte de Prometheus
+
+    Args:
+        state (dict): Compteurs et histogrammes (voir MetricsRegistry.snapshot)
+        gauges (dict): name -> {label_key: valeur}, calculées à la demande
+    """
+    families = {}
+    for name, series in (gauges or {}).items():
+        families.setdefault(name, []).extend(
+            f'{_series_name(name, key)} {_format_value(value)}' for key, value in series.items()
+        )
+    for name, series in state.get('counters', {}).items():
+        families.setdefault(name, []).extend(
+            f'{_series_name(name, key)} {_format_value(value)}' for key, value in sorted(series.items())
+        )
+    for name, series in state.get('histograms', {}).items():
+        lines = families.setdefault(name, [])
+        for key, histogram in sorted(series.items()):
+            bounds = [str(bound) for bound in histogram['bounds']] + ['+Inf']
+            counts = histogram['buckets'] + [histogram['count']]
+            for bound, count in zip(bounds, counts):
+                lines.append(f"{_series_name(name + '_bucket', key, label_key({'le': bound}))} {count}")
+            lines.append(f"{_series_name(name + '_sum', key)} {_format_value(float(histogram['sum']))}")
+            lines.append(f"{_series_name(name + '_count', key)} {histogram['count']}")
+
+    output = []
+    for name in sorted(families):
+        kind, help_text = METRICS.get(name, ('untyped', name))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(families[name])
+    return '\n'.join(output) + '\n'
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+mp3info.py - Durée d'un MP3 sans lire le fichier entier
+
+FONCTIONNALITÉ:
+  - Saute les tags ID3v2 (pochette comprise) par un simple seek, puis lit
+    quelques Ko : le premier en-tête de trame MPEG suffit
+  - Durée exacte depuis l'en-tête Xing/Info (nombre de trames, délai et
+    remplissage LAME) ou VBRI ; sinon estimée depuis le débit de la
+    première trame et la taille du fichier (CBR), comme mutagen
+  - Repli sur mutagen seulement si aucun en-tête exploitable n'est trouvé
+  - Utilisé par les parcours de bibliothèque (get_stats) : sur des milliers
+    de fichiers, le tag (et sa pochette) n'est plus lu ni décodé
+"""
+
+import os
+import re
+from collections import namedtuple
+
+from mutagen.mp3 import MP3
+
+from logs import get_logger
+
+
+logger = get_logger('mp3info')
+
+READ_SIZE = 16 * 1024  # Lu après les tags ID3 : largement de quoi trouver les premières trames
+CHECKED_FRAMES = 3      # Trames suivantes vérifiées (sans en-tête Xing) pour écarter un faux en-tête
+
+# Débits (kb/s) par (version MPEG 1 ou 2, couche) ; MPEG 2.5 utilise ceux de MPEG 2
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+MONO = 3
+
+Frame = namedtuple('Frame', 'version layer bitrate sample_rate mode samples length')
+
+
+def read_duration(path):
+    """
+    Durée d'un MP3 en secondes
+
+    Lit l'en-tête de la première trame (quelques Ko après les tags) ; mutagen
+    n'est utilisé que si le fichier n'en a pas d'exploitable.
+
+    Raises:
+        OSError, mutagen.MutagenError: fichier illisible ou qui n'est pas un MP3
+    """
+    duration = header_duration(path)
+    if duration is None:
+        logger.debug(f"🔎 En-tête MPEG introuvable, lecture par mutagen: {path}")
+        return MP3(path).info.length
+    return duration
+
+
+def header_duration(path):
+    """Durée depuis les en-têtes (Xing/Info, VBRI ou première trame), ou None"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = skip_id3(f)
+        f.seek(offset)
+        data = f.read(READ_SIZE)
+    return stream_duration(data, offset, size)
+
+
+def skip_id3(f):
+    """Position après les tags ID3v2 en tête de fichier (certains logiciels les empilent)"""
+    offset = 0
+    while True:
+        f.seek(offset)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b'ID3':
+            return offset
+        # Taille « synchsafe » : 4 octets de 7 bits, sans l'en-tête (ni le pied de tag éventuel)
+        tag_size = (header[6] & 0x7f) << 21 | (header[7] & 0x7f) << 14 | (header[8] & 0x7f) << 7 | header[9] & 0x7f
+        offset += 10 + tag_size + (10 if header[5] & 0x10 else 0)
+
+
+def frame_header(data, position):
+    """En-tête de trame MPEG audio à `position`, ou None s'il n'est pas valide"""
+    if position + 4 > len(data):
+        return None
+    b1, b2, b3 = data[position + 1], data[position + 2], data[position + 3]
+    if data[position] != 0xff or b1 & 0xe0 != 0xe0:
+        return None
+    version = (2.5, None, 2, 1)[b1 >> 3 & 3]
+    layer = 4 - (b1 >> 1 & 3)
+    bitrate_index, rate_index = b2 >> 4, b2 >> 2 & 3
+    # Strict, comme mutagen : version, couche, débit libre ou interdit, fréquence réservée
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = BITRATES[(min(version, 2), layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = b2 >> 1 & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and version != 1 else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return Frame(version, layer, bitrate, sample_rate, b3 >> 6, samples, length)
+
+
+def stream_duration(data, offset, size):
+    """
+    Durée d'un flux MPEG depuis ses premiers octets
+
+    Args:
+        data (bytes): Premiers octets après les tags ID3
+        offset (int): Position de `data` dans le fichier
+        size (int): Taille du fichier
+    """
+    at_eof = offset + len(data) >= size
+    position = data.find(b'\xff')
+    while position != -1:
+        frame = frame_header(data, position)
+        if frame is not None:
+            duration = vbr_duration(data, position, frame)
+            if duration is not None:
+                return duration
+            if frames_follow(data, position, frame, at_eof):
+                # CBR : débit de la première trame sur tout le flux
+                return 8 * (size - offset - position) / frame.bitrate
+        position = data.find(b'\xff', position + 1)
+    return None
+
+
+def frames_follow(data, position, frame, at_eof):
+    """Les trames suivantes commencent là où la première l'annonce (pas un faux en-tête)"""
+    verified = 0
+    for _ in range(CHECKED_FRAMES):
+        position += frame.length
+        if position + 4 > len(data):
+            # Suite hors du tampon : faire confiance à l'en-tête, sauf si le fichier s'arrête là
+            return verified > 0 or not at_eof
+        frame = frame_header(data, position)
+        if frame is None:
+            return False
+        verified += 1
+    return True
+
+
+def vbr_duration(data, position, frame):
+    """Durée depuis l'en-tête Xing/Info ou VBRI de la première trame (couche III), ou None"""
+    if frame.layer != 3:
+        return None
+
+    if frame.version == 1:
+        xing = position + (21 if frame.mode == MONO else 36)
+    else:
+        xing = position + (13 if frame.mode == MONO else 21)
+    if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 8:
+        flags = int.from_bytes(data[xing + 4:xing + 8], 'big')
+        if not flags & 1:
+            return None  # Pas de nombre de trames : estimation par la taille
+        cursor = xing + 8
+        frames = int.from_bytes(data[cursor:cursor + 4], 'big')
+        # Champs optionnels : octets, table des matières, qualité
+        cursor += 4 + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+        samples = frames * frame.samples - sum(lame_gapless(data, cursor))
+        return max(0, samples) / frame.sample_rate
+
+    vbri = position + 36
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        if int.from_bytes(data[vbri + 4:vbri + 6], 'big') != 1:
+            return None
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], 'big')
+        return frames * frame.samples / frame.sample_rate
+    return None
+
+
+def lame_gapless(data, position):
+    """
+    Délai de l'encodeur et remplissage final (échantillons) de l'en-tête LAME
+
+    Returns:
+        tuple: (délai, remplissage), (0, 0) sans en-tête LAME étendu (avant 3.90)
+    """
+    version = re.match(rb'(?:LAME|L)(\d)\.(\d+)', data[position:position + 20])
+    if not version or (int(version[1]), int(version[2])) < (3, 90) or len(data) < position + 36:
+        return 0, 0
+    extended = data[position + 9:position + 36]
+    if extended[0] >> 4 != 0:  # Révision de l'en-tête étendu
+        return 0, 0
+    delay = extended[12] << 4 | extended[13] >> 4
+    padding = (extended[13] & 0x0f) << 8 | extended[14]
+    return delay, padding
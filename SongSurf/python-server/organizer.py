@@ -7,6 +7,8 @@ FONCTIONNALITÉ:
   - Organise les MP3 en structure Artist/Album/Title.mp3
   - Met à jour les tags ID3
   - Gère les doublons
+  - Cache LRU des pochettes d'album (servies par /api/cover)
+  - Statistiques et structure de la bibliothèque (parcours parallèle, library_scan.py)
 """
 
 from pathlib import Path
@@ -14,18 +16,44 @@ from mutagen.easyid3 import EasyID3
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, TIT2, TPE1, TALB, TDRC, APIC
 import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import mimetypes
+import re
 from PIL import Image
 import io
 
+import featuring
+from tracing import StageTrace
+from library_scan import scan_library
+from logs import get_logger
+
+
+logger = get_logger('organizer')
+
+# Suffixe ajouté par organize() quand le fichier existe déjà : « Titre (1).mp3 »
+DUPLICATE_SUFFIX = re.compile(r' \(\d+\)$')
+
 
 class MusicOrganizer:
     """Organisateur de fichiers musicaux"""
     
-    def __init__(self, music_dir):
+    COVER_CACHE_BYTES = 32 * 1024 * 1024  # Taille totale des pochettes gardées en mémoire
+    COVER_ENTRY_BYTES = 512               # Clé et signature d'une entrée (albums sans pochette compris)
+    SCAN_WORKERS = 8        # Dossiers lus en parallèle par get_stats / get_library_structure
+    
+    def __init__(self, music_dir, scan_workers=None):
         self.music_dir = Path(music_dir)
+        self.scan_workers = scan_workers or self.SCAN_WORKERS
         self.music_dir.mkdir(exist_ok=True, parents=True)
+        
+        # Cache des pochettes : dossier d'album -> (signature du 1er MP3, (données, type MIME) ou None)
+        self._cover_cache = OrderedDict()
+        self._cover_cache_bytes = 0
+        self._cover_lock = threading.Lock()
+        self.cover_cache_hits = 0
+        self.cover_cache_misses = 0
     
     def detect_featuring(self, title, artist):
         """
@@ -39,55 +67,13 @@ class MusicOrganizer:
                 'has_feat': bool
             }
         """
-        import re
-        
-        # Patterns to detect featuring
-        feat_patterns = [
-            r'\(feat\.?\s+([^)]+)\)',
-            r'\(ft\.?\s+([^)]+)\)',
-            r'\(featuring\s+([^)]+)\)',
-            r'\[feat\.?\s+([^\]]+)\]',
-            r'\[ft\.?\s+([^\]]+)\]',
-            r'feat\.?\s+([^-\(\[]+)',
-            r'ft\.?\s+([^-\(\[]+)',
-        ]
-        
-        feat_artists = []
-        clean_title = title
-        
-        # Check title for featuring
-        for pattern in feat_patterns:
-            match = re.search(pattern, title, re.IGNORECASE)
-            if match:
-                feat_artist = match.group(1).strip()
-                # Clean up multiple artists (separated by &, and, ,)
-                feat_list = re.split(r'\s*(?:&|and|,)\s*', feat_artist)
-                feat_artists.extend([a.strip() for a in feat_list if a.strip()])
-                # Remove feat from title
-                clean_title = re.sub(pattern, '', clean_title, flags=re.IGNORECASE).strip()
-        
-        # Check artist field for multiple artists
-        if ' & ' in artist or ' and ' in artist or ', ' in artist or ' et ' in artist:
-            # Split by common separators
-            artist_list = re.split(r'\s*(?:&|and|et|,)\s*', artist, flags=re.IGNORECASE)
-            main_artist = artist_list[0].strip()
-            # Others are featuring
-            feat_artists.extend([a.strip() for a in artist_list[1:] if a.strip()])
-            
-            print(f"   🔍 Multiple artists detected: {artist}")
-            print(f"      → Main: {main_artist}")
-            print(f"      → Feat: {', '.join(artist_list[1:])}")
-        else:
-            main_artist = artist
-        
-        return {
-            'main_artist': main_artist,
-            'feat_artists': list(set(feat_artists)),  # Remove duplicates
-            'clean_title': clean_title,
-            'has_feat': len(feat_artists) > 0
-        }
+        feat_info = featuring.detect(title, artist)
+        if feat_info['main_artist'] != artist:
+            logger.debug(f"🔍 Multiple artists detected: {artist} "
+                         f"(main: {feat_info['main_artist']}, feat: {', '.join(feat_info['feat_artists'])})")
+        return feat_info
     
-    def organize(self, file_path, metadata):
+    def organize(self, file_path, metadata, trace=None):
         """
         Organise un fichier MP3 dans la structure Artist/Album/Title.mp3
         Auto-détecte les featuring et organise correctement
@@ -95,17 +81,20 @@ class MusicOrganizer:
         Args:
             file_path (str): Chemin du fichier MP3 temporaire
             metadata (dict): {artist, album, title, year}
+            trace (StageTrace): Chronologie du job (étapes cover, tag, move)
             
         Returns:
             dict: {success, final_path, error}
         """
+        if trace is None:
+            trace = StageTrace()
         try:
             file_path = Path(file_path)
             
             if not file_path.exists():
                 raise FileNotFoundError(f"Fichier non trouvé: {file_path}")
             
-            print(f"\n📁 Organisation du fichier: {file_path.name}")
+            logger.info(f"📁 Organisation du fichier: {file_path.name}")
             
             # Extraire les métadonnées
             raw_artist = metadata.get('artist', 'Unknown Artist')
@@ -122,20 +111,16 @@ class MusicOrganizer:
             
             # Si featuring détecté, ajouter au titre
             if feat_info['has_feat']:
-                feat_str = ', '.join(feat_info['feat_artists'])
-                title = f"{title} (feat. {feat_str})"
-                print(f"   🎭 Featuring détecté: {feat_str}")
-                print(f"   ✅ Organisation sous: {artist}")
+                title = featuring.format_title(title, feat_info['feat_artists'])
+                logger.debug(f"🎭 Featuring détecté: {', '.join(feat_info['feat_artists'])}, "
+                             f"organisation sous: {artist}")
             
             # Nettoyer les noms (caractères interdits)
             artist = self._clean_filename(artist)
             album = self._clean_filename(album)
             title = self._clean_filename(title)
             
-            print(f"   🎤 Artiste principal: {artist}")
-            print(f"   💿 Album: {album}")
-            print(f"   🎵 Titre: {title}")
-            print(f"   📅 Année: {year}")
+            logger.debug(f"🎤 {artist} / 💿 {album} / 🎵 {title} / 📅 {year}")
             
             # Créer la structure de dossiers
             artist_dir = self.music_dir / artist
@@ -147,39 +132,43 @@ class MusicOrganizer:
             
             # Gérer les doublons
             if final_path.exists():
-                print(f"   ⚠️ Fichier existant, ajout d'un suffixe...")
+                logger.debug("⚠️ Fichier existant, ajout d'un suffixe...")
                 counter = 1
                 while final_path.exists():
                     final_path = album_dir / f"{title} ({counter}).mp3"
                     counter += 1
             
-            # Copier le fichier
-            print(f"   📋 Copie vers: {final_path}")
-            shutil.copy2(file_path, final_path)
-            
             # Chercher la pochette (image téléchargée par yt-dlp)
             thumbnail_path = self._find_thumbnail(file_path)
             
             # Mettre à jour les tags ID3 avec les métadonnées corrigées
-            print(f"   🏷️ Mise à jour des tags ID3...")
+            # (sur le fichier temporaire : il n'arrive dans la bibliothèque que complet)
+            logger.debug("🏷️ Mise à jour des tags ID3...")
             corrected_metadata = {
                 'artist': artist,  # Artiste principal
                 'album': album,
                 'title': title,    # Titre avec feat si nécessaire
                 'year': year
             }
-            self._update_tags(final_path, corrected_metadata, thumbnail_path)
+            cover = (None, None)
+            if thumbnail_path and thumbnail_path.exists():
+                # Convertir en JPEG (pour compatibilité maximale)
+                with trace.span('cover'):
+                    cover = self._convert_image_to_jpeg(thumbnail_path)
+            with trace.span('tag'):
+                self._update_tags(file_path, corrected_metadata, cover)
             
-            # Supprimer le fichier temporaire
-            file_path.unlink()
-            print(f"   🗑️ Fichier temporaire supprimé")
+            # Déplacer le fichier (renommage atomique si même disque)
+            logger.debug(f"📋 Déplacement vers: {final_path}")
+            with trace.span('move'):
+                shutil.move(str(file_path), str(final_path))
             
             # Supprimer la pochette temporaire si elle existe
             if thumbnail_path and thumbnail_path.exists():
                 thumbnail_path.unlink()
-                print(f"   🗑️ Pochette temporaire supprimée")
+                logger.debug("🗑️ Pochette temporaire supprimée")
             
-            print(f"   ✅ Organisation terminée!")
+            logger.info(f"✅ Organisation terminée: {final_path.relative_to(self.music_dir)}")
             
             return {
                 'success': True,
@@ -188,7 +177,7 @@ class MusicOrganizer:
             }
             
         except Exception as e:
-            print(f"   ❌ Erreur: {str(e)}")
+            logger.error(f"❌ Erreur: {str(e)}")
             return {
                 'success': False,
                 'error': str(e),
@@ -221,8 +210,8 @@ class MusicOrganizer:
             title = audio.get('TIT2', ['Unknown'])[0] if 'TIT2' in audio else 'Unknown'
             album = audio.get('TALB', ['Unknown'])[0] if 'TALB' in audio else 'Unknown'
             
-            # Nouveau titre avec feat
-            new_title = f"{title} (feat. {feat_artist})"
+            # Nouveau titre avec feat (ajouté à ceux déjà présents, sans doublon)
+            new_title = featuring.add_featuring(title, feat_artist, target_artist)
             
             # Créer le nouveau chemin
             artist_dir = self.music_dir / target_artist
@@ -245,7 +234,7 @@ class MusicOrganizer:
             # Supprimer les dossiers vides
             self._cleanup_empty_dirs(source_file.parent)
             
-            print(f"✅ Déplacé: {source_file.name} → {new_path}")
+            logger.info(f"✅ Déplacé: {source_file.name} → {new_path}")
             
             return {
                 'success': True,
@@ -254,12 +243,120 @@ class MusicOrganizer:
             }
             
         except Exception as e:
-            print(f"❌ Erreur lors du déplacement: {e}")
+            logger.error(f"❌ Erreur lors du déplacement: {e}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def featuring_corrections(self, batches):
+        """
+        Corrections de featuring pour toute la bibliothèque, sans ouvrir les MP3
+        
+        Seules les mentions explicites de featuring sont relevées : dossier
+        d'artiste « A feat. B », featuring mal formé ou abîmé par l'ancienne
+        détection. Les noms de groupes (« Simon & Garfunkel », « Earth, Wind
+        & Fire ») ne sont jamais coupés.
+        
+        Args:
+            batches: Lots de morceaux [(artiste, album, fichier), ...]
+                     (LibraryIndex.tracks)
+            
+        Returns:
+            list: [{song_path, target_artist, feat_artist, reason}, ...],
+                  à envoyer tels quels à /api/apply-corrections
+        """
+        corrections = []
+        for batch in batches:
+            # Le suffixe des doublons (« Titre (1) ») ne fait pas partie du titre
+            titles = [DUPLICATE_SUFFIX.sub('', Path(file).stem) for _, _, file in batch]
+            detected = featuring.detect_batch(
+                ((title, artist) for title, (artist, _, _) in zip(titles, batch)), split=False
+            )
+            for (artist, album, file), title, feat_info in zip(batch, titles, detected):
+                target_artist = self._clean_filename(feat_info['main_artist'])
+                expected_title = self._clean_filename(
+                    featuring.format_title(feat_info['clean_title'], feat_info['feat_artists'])
+                )
+                if target_artist == artist and expected_title == title:
+                    continue
+                corrections.append({
+                    'song_path': f"{artist}/{album}/{file}",
+                    'target_artist': target_artist,
+                    'feat_artist': ', '.join(feat_info['feat_artists']),
+                    'reason': 'artist' if target_artist != artist else 'title'
+                })
+        return corrections
+    
+    def get_album_cover(self, artist, album):
+        """
+        Pochette d'un album (extraite du premier MP3), mise en cache
+        
+        Le cache est invalidé si le premier MP3 de l'album change (ajout,
+        suppression, nouveaux tags). Il est borné en octets (COVER_CACHE_BYTES) :
+        les pochettes les moins récemment demandées sont retirées.
+        
+        Returns:
+            tuple: (données, type MIME) ou None si pas de pochette
+        """
+        album_dir = self.music_dir / artist / album
+        if not album_dir.is_dir():
+            return None
+        
+        songs = sorted(album_dir.glob('*.mp3'))
+        if not songs:
+            return None
+        
+        stat = songs[0].stat()
+        signature = [songs[0].name, stat.st_mtime_ns, stat.st_size]
+        key = str(album_dir)
+        
+        with self._cover_lock:
+            cached = self._cover_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                self._cover_cache.move_to_end(key)
+                self.cover_cache_hits += 1
+                return cached[1]
+            self.cover_cache_misses += 1
+        
+        cover = None
+        audio = MP3(songs[0], ID3=ID3)
+        if audio.tags:
+            for tag in audio.tags.values():
+                if isinstance(tag, APIC):
+                    cover = (tag.data, tag.mime)
+                    break
+        
+        entry = (signature, cover)
+        size = self._cover_size(entry)
+        if size > self.COVER_CACHE_BYTES:
+            return cover  # Plus grande que tout le cache : non gardée
+        
+        with self._cover_lock:
+            previous = self._cover_cache.pop(key, None)
+            if previous is not None:
+                self._cover_cache_bytes -= self._cover_size(previous)
+            self._cover_cache[key] = entry
+            self._cover_cache_bytes += size
+            while self._cover_cache_bytes > self.COVER_CACHE_BYTES:
+                _, evicted = self._cover_cache.popitem(last=False)
+                self._cover_cache_bytes -= self._cover_size(evicted)
+        return cover
+    
+    def _cover_size(self, entry):
+        cover = entry[1]
+        return self.COVER_ENTRY_BYTES + (len(cover[0]) if cover else 0)
+    
+    def cover_cache_stats(self):
+        """Statistiques du cache des pochettes : {hits, misses, entries, bytes}"""
+        with self._cover_lock:
+            return {
+                'hits': self.cover_cache_hits,
+                'misses': self.cover_cache_misses,
+                'entries': len(self._cover_cache),
+                'bytes': self._cover_cache_bytes
+            }
+    
     def _cleanup_empty_dirs(self, directory):
         """Supprime les dossiers vides récursivement"""
         try:
@@ -273,12 +370,12 @@ class MusicOrganizer:
             if directory.exists() and directory.is_dir():
                 if not any(directory.iterdir()):
                     directory.rmdir()
-                    print(f"🗑️  Dossier vide supprimé: {directory}")
+                    logger.debug(f"🗑️ Dossier vide supprimé: {directory}")
                     
                     # Vérifier le parent
                     self._cleanup_empty_dirs(directory.parent)
         except Exception as e:
-            print(f"⚠️  Erreur lors du nettoyage: {e}")
+            logger.warning(f"⚠️ Erreur lors du nettoyage: {e}")
     
     def _clean_filename(self, name):
         """Nettoie un nom de fichier (supprime les caractères interdits)"""
@@ -293,26 +390,27 @@ class MusicOrganizer:
         mp3_path = Path(mp3_path)
         base_name = mp3_path.stem
         
-        print(f"   🔍 Recherche de pochette pour: {base_name}")
+        logger.debug(f"🔍 Recherche de pochette pour: {base_name}")
         
-        # Extensions d'images possibles
+        # Extensions d'images possibles (recherche directe, sans lister le dossier du job)
         image_extensions = ['.jpg', '.jpeg', '.png', '.webp']
         
-        # Lister tous les fichiers dans le dossier temp
-        temp_files = list(mp3_path.parent.glob('*'))
-        print(f"   📂 Fichiers dans temp/: {[f.name for f in temp_files]}")
-        
         for ext in image_extensions:
             thumbnail = mp3_path.parent / f"{base_name}{ext}"
             if thumbnail.exists():
-                print(f"   ✅ Pochette trouvée: {thumbnail.name}")
+                logger.debug(f"✅ Pochette trouvée: {thumbnail.name}")
                 return thumbnail
         
-        print(f"   ⚠️ Aucune pochette trouvée")
+        logger.debug("⚠️ Aucune pochette trouvée")
         return None
     
-    def _update_tags(self, file_path, metadata, thumbnail_path=None):
-        """Met à jour les tags ID3 d'un fichier MP3 avec pochette"""
+    def _update_tags(self, file_path, metadata, cover=(None, None)):
+        """
+        Met à jour les tags ID3 d'un fichier MP3 avec pochette
+        
+        Args:
+            cover (tuple): (données, type MIME) de la pochette convertie, ou (None, None)
+        """
         try:
             # Charger le fichier MP3
             audio = MP3(file_path, ID3=ID3)
@@ -326,7 +424,7 @@ class MusicOrganizer:
             # Vérifier si une pochette existe déjà (intégrée par yt-dlp)
             has_existing_cover = 'APIC:' in audio.tags or any(key.startswith('APIC') for key in audio.tags.keys())
             if has_existing_cover:
-                print(f"      ℹ️ Pochette existante détectée (sera remplacée pour compatibilité)")
+                logger.debug("ℹ️ Pochette existante détectée (sera remplacée pour compatibilité)")
             
             # Mettre à jour les tags textuels
             audio.tags['TIT2'] = TIT2(encoding=3, text=metadata.get('title', ''))
@@ -337,33 +435,30 @@ class MusicOrganizer:
                 audio.tags['TDRC'] = TDRC(encoding=3, text=metadata.get('year', ''))
             
             # Ajouter/Remplacer la pochette si disponible (pour compatibilité maximale)
-            if thumbnail_path and thumbnail_path.exists():
-                # Convertir en JPEG si nécessaire (pour compatibilité maximale)
-                img_data, mime_type = self._convert_image_to_jpeg(thumbnail_path)
+            img_data, mime_type = cover
+            if img_data:
+                # Supprimer les pochettes existantes pour éviter les doublons
+                audio.tags.delall('APIC')
                 
-                if img_data:
-                    # Supprimer les pochettes existantes pour éviter les doublons
-                    audio.tags.delall('APIC')
-                    
-                    # Ajouter la pochette avec le bon format
-                    audio.tags.add(
-                        APIC(
-                            encoding=3,          # UTF-8
-                            mime=mime_type,      # Type MIME de l'image
-                            type=3,              # Cover (front)
-                            desc='Cover',        # Description
-                            data=img_data        # Données de l'image
-                        )
+                # Ajouter la pochette avec le bon format
+                audio.tags.add(
+                    APIC(
+                        encoding=3,          # UTF-8
+                        mime=mime_type,      # Type MIME de l'image
+                        type=3,              # Cover (front)
+                        desc='Cover',        # Description
+                        data=img_data        # Données de l'image
                     )
-                    print(f"      🖼️ Pochette intégrée au MP3 ({len(img_data)} bytes, {mime_type})")
+                )
+                logger.debug(f"🖼️ Pochette intégrée au MP3 ({len(img_data)} bytes, {mime_type})")
             
             # Sauvegarder
             audio.save()
             
-            print(f"      ✅ Tags ID3 mis à jour")
+            logger.debug("✅ Tags ID3 mis à jour")
             
         except Exception as e:
-            print(f"      ⚠️ Erreur lors de la mise à jour des tags: {str(e)}")
+            logger.warning(f"⚠️ Erreur lors de la mise à jour des tags: {str(e)}")
     
     def _convert_image_to_jpeg(self, image_path):
         """
@@ -394,18 +489,18 @@ class MusicOrganizer:
             max_size = 1000
             if img.width > max_size or img.height > max_size:
                 img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                print(f"      📐 Image redimensionnée à {img.width}x{img.height}")
+                logger.debug(f"📐 Image redimensionnée à {img.width}x{img.height}")
             
             # Sauvegarder en JPEG dans un buffer
             buffer = io.BytesIO()
             img.save(buffer, format='JPEG', quality=90, optimize=True)
             img_data = buffer.getvalue()
             
-            print(f"      🔄 Image convertie en JPEG ({len(img_data)} bytes)")
+            logger.debug(f"🔄 Image convertie en JPEG ({len(img_data)} bytes)")
             return img_data, 'image/jpeg'
             
         except Exception as e:
-            print(f"      ⚠️ Erreur conversion image: {str(e)}")
+            logger.warning(f"⚠️ Erreur conversion image: {str(e)}")
             # Fallback: utiliser l'image originale
             try:
                 with open(image_path, 'rb') as f:
@@ -418,27 +513,12 @@ class MusicOrganizer:
     def get_stats(self):
         """Retourne les statistiques de la bibliothèque musicale"""
         try:
-            artists = [d for d in self.music_dir.iterdir() if d.is_dir()]
+            # Dossiers lus en parallèle, durées depuis les en-têtes MPEG (sans lire les tags)
+            artists = scan_library(self.music_dir, workers=self.scan_workers, durations=True)
             
-            total_albums = 0
-            total_songs = 0
-            total_duration = 0  # en secondes
-            
-            for artist_dir in artists:
-                albums = [d for d in artist_dir.iterdir() if d.is_dir()]
-                total_albums += len(albums)
-                
-                for album_dir in albums:
-                    songs = list(album_dir.glob('*.mp3'))
-                    total_songs += len(songs)
-                    
-                    # Calculer la durée totale
-                    for song in songs:
-                        try:
-                            audio = MP3(song)
-                            total_duration += audio.info.length
-                        except:
-                            pass  # Ignorer les fichiers corrompus
+            total_albums = sum(len(artist['albums']) for artist in artists)
+            total_songs = sum(len(album['songs']) for artist in artists for album in artist['albums'])
+            total_duration = sum(album['duration'] for artist in artists for album in artist['albums'])  # en secondes
             
             # Convertir en format lisible
             hours = int(total_duration // 3600)
@@ -470,20 +550,14 @@ class MusicOrganizer:
                 'songs': []
             }
             
-            for artist_dir in self.music_dir.iterdir():
-                if not artist_dir.is_dir():
-                    continue
-                
-                artist_name = artist_dir.name
-                artist_albums = []
+            # Dossiers lus en parallèle, avec la pochette du premier MP3 de chaque album
+            for artist in scan_library(self.music_dir, workers=self.scan_workers, covers=True):
+                artist_name = artist['name']
                 artist_songs_count = 0
                 
-                for album_dir in artist_dir.iterdir():
-                    if not album_dir.is_dir():
-                        continue
-                    
-                    album_name = album_dir.name
-                    songs = list(album_dir.glob('*.mp3'))
+                for album in artist['albums']:
+                    album_name = album['name']
+                    songs = album['songs']
                     artist_songs_count += len(songs)
                     
                     # Ajouter l'album
@@ -493,37 +567,26 @@ class MusicOrganizer:
                         'songs_count': len(songs)
                     })
                     
-                    artist_albums.append(album_name)
-                    
-                    # Extraire la pochette du premier MP3 de l'album
+                    # Pochette servie par /api/cover si le premier MP3 en a une
                     album_art_url = None
-                    if songs:
-                        try:
-                            audio = MP3(songs[0], ID3=ID3)
-                            if audio.tags:
-                                for tag in audio.tags.values():
-                                    if isinstance(tag, APIC):
-                                        # Créer un chemin pour la pochette
-                                        cover_filename = f"{artist_name}_{album_name}.jpg".replace('/', '_').replace('\\', '_')
-                                        album_art_url = f"/api/cover/{cover_filename}"
-                                        break
-                        except:
-                            pass
+                    if album['has_cover']:
+                        cover_filename = f"{artist_name}_{album_name}.jpg".replace('/', '_').replace('\\', '_')
+                        album_art_url = f"/api/cover/{cover_filename}"
                     
                     # Ajouter les chansons
-                    for song_path in songs:
+                    for song in songs:
                         structure['songs'].append({
-                            'title': song_path.stem,
+                            'title': Path(song).stem,
                             'artist': artist_name,
                             'album': album_name,
-                            'path': str(song_path.relative_to(self.music_dir)),
+                            'path': str(Path(artist_name, album_name, song)),
                             'album_art': album_art_url
                         })
                 
                 # Ajouter l'artiste
                 structure['artists'].append({
                     'name': artist_name,
-                    'albums_count': len(artist_albums),
+                    'albums_count': len(artist['albums']),
                     'songs_count': artist_songs_count
                 })
             
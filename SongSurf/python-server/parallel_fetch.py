@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+parallel_fetch.py - Téléchargement multi-connexions pour yt-dlp
+
+FONCTIONNALITÉ:
+  - Découpe un fichier HTTP en plages d'octets téléchargées en parallèle
+  - Réassemble les plages directement dans le fichier .part
+  - Plafond global de connexions partagé entre tous les téléchargements
+  - Progression agrégée (somme des plages) envoyée aux progress_hooks yt-dlp
+  - Reprise après redémarrage grâce à un fichier d'état <fichier>.part.ranges
+  - Débit total des plages limité par le Throttle du job ('songsurf_throttle')
+
+Les formats fragmentés (DASH/HLS) passent par les downloaders natifs de
+yt-dlp avec 'concurrent_fragment_downloads'. Les formats HTTP simples
+(cas habituel de YouTube) passent par RangeDownloader.
+"""
+
+import json
+import os
+import threading
+import time
+
+import yt_dlp
+from yt_dlp.downloader.common import FileDownloader
+from yt_dlp.networking import Request
+
+
+class RangesUnsupported(Exception):
+    """Le serveur ignore l'en-tête Range (réponse 200 au lieu de 206)"""
+
+
+class ConnectionBudget:
+    """
+    Plafond global de connexions HTTP simultanées
+
+    Chaque téléchargement demande N connexions et en obtient au moins une,
+    au plus ce qu'il reste dans le budget. Ainsi le parallélisme interne
+    d'un morceau ne concurrence jamais les autres workers.
+    """
+
+    def __init__(self, max_connections):
+        self.max_connections = max(1, int(max_connections))
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, wanted, cancelled=None, poll_interval=0.5):
+        """
+        Réserve jusqu'à `wanted` connexions (bloque tant qu'aucune n'est libre)
+
+        Args:
+            cancelled (callable): Relu toutes les `poll_interval` secondes pendant
+                l'attente ; s'il retourne True, l'attente s'arrête
+
+        Returns:
+            int: Connexions obtenues (0 si l'attente a été interrompue)
+        """
+        wanted = max(1, int(wanted))
+        with self._cond:
+            while self._in_use >= self.max_connections:
+                if cancelled is not None and cancelled():
+                    return 0
+                self._cond.wait(poll_interval)
+            granted = min(wanted, self.max_connections - self._in_use)
+            self._in_use += granted
+            return granted
+
+    def release(self, count):
+        """Rend des connexions au budget"""
+        with self._cond:
+            self._in_use = max(0, self._in_use - count)
+            self._cond.notify_all()
+
+    def in_use(self):
+        with self._cond:
+            return self._in_use
+
+
+def split_ranges(total, connections, min_size):
+    """
+    Découpe [0, total) en plages contiguës (start, end inclus)
+
+    Les plages font au moins `min_size` octets, quitte à en créer moins
+    que `connections`.
+    """
+    count = max(1, min(connections, total // max(1, min_size)))
+    size = total // count
+    ranges = []
+    start = 0
+    for index in range(count):
+        end = total - 1 if index == count - 1 else start + size - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+class RangeDownloader(FileDownloader):
+    """Downloader yt-dlp qui récupère un fichier HTTP en plusieurs plages parallèles"""
+
+    FD_NAME = 'songsurf_ranges'
+
+    MIN_RANGE_SIZE = 1024 * 1024  # Pas de découpage en dessous de 1 Mo par plage
+    BLOCK_SIZE = 64 * 1024
+    REPORT_INTERVAL = 0.25  # secondes entre deux appels aux progress_hooks
+    RANGE_RETRIES = 3
+
+    @classmethod
+    def can_download(cls, info, connections):
+        """Le format est-il un fichier HTTP unique de taille connue ?"""
+        if connections < 2 or info.get('requested_formats') or info.get('is_live'):
+            return False
+        if info.get('protocol') not in ('http', 'https'):
+            return False
+        filesize = info.get('filesize') or 0
+        return filesize >= 2 * cls.MIN_RANGE_SIZE
+
+    def real_download(self, filename, info_dict):
+        url = info_dict['url']
+        total = int(info_dict['filesize'])
+        headers = dict(info_dict.get('http_headers') or {})
+        connections = self.params.get('songsurf_connections', 1)
+        throttle = self.params.get('songsurf_throttle')
+        tmpfilename = self.temp_name(filename)
+
+        state_file = tmpfilename + '.ranges'
+        format_id = info_dict.get('format_id')
+
+        resumed = self._load_state(state_file, tmpfilename, total, format_id)
+        if resumed:
+            ranges, counters = resumed
+            self.to_screen(f'[download] Reprise de {len(ranges)} plages ({sum(counters)}/{total} octets)')
+        else:
+            ranges = split_ranges(total, connections, self.MIN_RANGE_SIZE)
+            counters = [0] * len(ranges)
+            # Préallouer le fichier pour que chaque plage écrive à sa position
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(total)
+        errors = []
+        stop = threading.Event()
+        already_downloaded = sum(counters)
+
+        def run(index, start, end):
+            try:
+                self._fetch_range(url, headers, tmpfilename, index, start, end, counters, stop, throttle)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        threads = [
+            threading.Thread(target=run, args=(index, start, end), daemon=True)
+            for index, (start, end) in enumerate(ranges)
+        ]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(self.REPORT_INTERVAL)
+                self._save_state(state_file, total, format_id, ranges, counters)
+                self._report(filename, tmpfilename, info_dict, counters, total, len(ranges), started, already_downloaded)
+        except BaseException:
+            # Un progress_hook a levé une exception (annulation...) : arrêter les plages
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self._save_state(state_file, total, format_id, ranges, counters)
+            raise
+
+        if errors:
+            if isinstance(errors[0], RangesUnsupported):
+                self.try_remove(tmpfilename)
+                self.try_remove(state_file)
+            else:
+                # Garder le .part et son état pour une reprise ultérieure
+                self._save_state(state_file, total, format_id, ranges, counters)
+            raise errors[0]
+
+        downloaded = sum(counters)
+        if downloaded != total:
+            raise OSError(f'Téléchargement incomplet: {downloaded}/{total} octets')
+
+        self.try_rename(tmpfilename, filename)
+        self.try_remove(state_file)
+        self._hook_progress({
+            'status': 'finished',
+            'filename': filename,
+            'downloaded_bytes': total,
+            'total_bytes': total,
+            'elapsed': time.time() - started,
+        }, info_dict)
+        return True
+
+    def _load_state(self, state_file, tmpfilename, total, format_id):
+        """
+        Relit l'état des plages d'un téléchargement interrompu
+
+        Returns:
+            tuple: (ranges, counters) ou None si rien à reprendre
+        """
+        if not (os.path.isfile(state_file) and os.path.isfile(tmpfilename)):
+            return None
+        try:
+            with open(state_file, encoding='utf-8') as f:
+                state = json.load(f)
+            if state['total'] != total or state.get('format_id') != format_id:
+                return None
+            if os.path.getsize(tmpfilename) != total:
+                return None
+            ranges = [(start, end) for start, end, _ in state['ranges']]
+            counters = [min(done, end - start + 1) for start, end, done in state['ranges']]
+            return ranges, counters
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save_state(self, state_file, total, format_id, ranges, counters):
+        """Écrit l'avancement de chaque plage (écriture atomique)"""
+        state = {
+            'total': total,
+            'format_id': format_id,
+            'ranges': [[start, end, done] for (start, end), done in zip(ranges, counters)],
+        }
+        try:
+            with open(state_file + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(state_file + '.tmp', state_file)
+        except OSError:
+            pass
+
+    def _report(self, filename, tmpfilename, info_dict, counters, total, fragment_count, started, already_downloaded=0):
+        """Envoie la progression agrégée de toutes les plages aux hooks"""
+        downloaded = sum(counters)
+        elapsed = time.time() - started
+        speed = (downloaded - already_downloaded) / elapsed if elapsed > 0 else None
+        eta = int((total - downloaded) / speed) if speed else None
+        self._hook_progress({
+            'status': 'downloading',
+            'filename': filename,
+            'tmpfilename': tmpfilename,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,
+            'eta': eta,
+            'elapsed': elapsed,
+            'fragment_count': fragment_count,
+            'songsurf_throttled': True,  # Déjà limité plage par plage
+        }, info_dict)
+
+    def _fetch_range(self, url, headers, tmpfilename, index, start, end, counters, stop, throttle=None):
+        """Télécharge une plage [start, end] avec reprise en cas de coupure"""
+        attempt = 0
+        while not stop.is_set():
+            position = start + counters[index]
+            if position > end:
+                return
+            try:
+                request = Request(url, headers={**headers, 'Range': f'bytes={position}-{end}'})
+                with self.ydl.urlopen(request) as response:
+                    if response.status != 206:
+                        raise RangesUnsupported(f'HTTP {response.status}')
+                    with open(tmpfilename, 'r+b') as f:
+                        f.seek(position)
+                        while position <= end and not stop.is_set():
+                            chunk = response.read(min(self.BLOCK_SIZE, end - position + 1))
+                            if not chunk:
+                                break
+                            f.write(chunk)
+                            position += len(chunk)
+                            counters[index] += len(chunk)
+                            if throttle is not None:
+                                throttle.consume(len(chunk))
+                if position <= end and not stop.is_set():
+                    raise OSError(f'Plage {index} interrompue à {position}/{end}')
+            except RangesUnsupported:
+                raise
+            except Exception:
+                attempt += 1
+                if attempt > self.RANGE_RETRIES:
+                    raise
+                time.sleep(min(2 ** attempt, 10))
+
+
+class ParallelYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL qui utilise RangeDownloader quand 'songsurf_connections' > 1
+
+    Si le serveur ne supporte pas les plages, on revient au downloader
+    classique de yt-dlp. Un .part laissé par RangeDownloader (fichier
+    préalloué) est toujours repris par RangeDownloader : le downloader
+    classique le prendrait pour un fichier complet.
+    """
+
+    def dl(self, name, info, subtitle=False, test=False):
+        connections = self.params.get('songsurf_connections', 1)
+        if os.path.isfile(f'{name}.part.ranges'):
+            connections = max(connections, 2)
+        if not subtitle and not test and RangeDownloader.can_download(info, connections):
+            new_info = self._copy_infodict(info)
+            if new_info.get('http_headers') is None:
+                new_info['http_headers'] = self._calc_headers(new_info)
+
+            fd = RangeDownloader(self, self.params)
+            for ph in self._progress_hooks:
+                fd.add_progress_hook(ph)
+            try:
+                return fd.download(name, new_info, subtitle)
+            except RangesUnsupported as e:
+                self.to_screen(f'[download] Plages HTTP non supportées ({e}), téléchargement classique')
+
+        return super().dl(name, info, subtitle, test)
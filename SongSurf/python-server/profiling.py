@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+profiling.py - Profilage CPU et mémoire à la demande (serveur en production)
+
+FONCTIONNALITÉ:
+  - Profilage CPU par échantillonnage : toutes les quelques millisecondes,
+    la pile de chaque thread est relevée (sys._current_frames), sans
+    ralentir le code profilé comme le ferait cProfile
+  - Résultat en piles repliées (flamegraph.pl, speedscope) ou au format
+    pstats (python -m pstats, snakeviz)
+  - Instantanés tracemalloc écrits sur disque, comparables entre eux pour
+    trouver une fuite sans redémarrer
+  - Les commandes passent par la queue persistante : le serveur API et
+    chaque processus worker profilent leurs propres threads, les
+    résultats sont déposés dans STATE_DIR/profiles/
+  - Journal de commandes numérotées : chaque processus exécute, dans
+    l'ordre, toutes celles publiées depuis sa dernière lecture (deux
+    commandes rapprochées ne se remplacent pas)
+"""
+
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from config import log_message
+
+
+KEY = 'profiling'            # Journal des commandes, dans la queue persistante (kv)
+RESULTS_KEY = 'profiling:{}'  # Processus ayant répondu à une commande
+COMMANDS_KEEP = 50           # Commandes (et réponses) conservées
+
+# Allocations de tracemalloc lui-même et de l'import des modules : du bruit
+MEMORY_IGNORED = ('<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>', '<unknown>',
+                  tracemalloc.__file__)
+
+
+def frame_label(func):
+    """Nom d'une fonction dans les piles repliées : 'download (downloader.py:117)'"""
+    filename, line, name = func
+    return f'{name} ({Path(filename).name}:{line})'
+
+
+# ============================================
+# CPU
+# ============================================
+
+class SamplingProfiler:
+    """Relève périodiquement la pile de chaque thread du processus"""
+
+    def __init__(self, interval=0.01, thread_prefix=None):
+        """
+        Args:
+            interval (float): Secondes entre deux relevés
+            thread_prefix (str): Ne profiler que les threads dont le nom commence ainsi
+        """
+        self.interval = interval
+        self.thread_prefix = thread_prefix
+        self.samples = {}  # (thread, ((fichier, ligne, fonction), ...)) -> nombre de relevés
+        self.sample_count = 0
+        self.started_at = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, duration=None, on_done=None):
+        """
+        Démarre l'échantillonnage dans un thread séparé
+
+        Args:
+            duration (float): Arrêt automatique après ce nombre de secondes
+            on_done (callable): Appelé avec le profileur une fois arrêté
+        """
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._loop, args=(duration, on_done), name='profiler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Arrête l'échantillonnage (attend la fin du relevé en cours)"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self, duration, on_done):
+        started = time.perf_counter()
+        deadline = started + duration if duration else None
+        while not self._stop.is_set():
+            self.sample()
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self._stop.wait(self.interval)
+        self.elapsed = time.perf_counter() - started
+        if on_done is not None:
+            try:
+                on_done(self)
+            except Exception as e:
+                log_message('WARNING', f"Enregistrement du profil CPU impossible: {e}")
+
+    def sample(self):
+        """Relève la pile de chaque thread (sauf celui du profileur)"""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, f'thread-{ident}')
+            if ident == own or (self.thread_prefix and not name.startswith(self.thread_prefix)):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            key = (name, tuple(reversed(stack)))
+            self.samples[key] = self.samples.get(key, 0) + 1
+        self.sample_count += 1
+
+    def to_dict(self, process):
+        """Résultat sérialisable (JSON) : une entrée par pile distincte"""
+        return {
+            'process': process,
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at or time.time()).isoformat(),
+            'seconds': round(self.elapsed, 3),
+            'interval': self.interval,
+            'sample_count': self.sample_count,
+            'stacks': [
+                {'thread': thread, 'frames': [list(func) for func in stack], 'count': count}
+                for (thread, stack), count in self.samples.items()
+            ]
+        }
+
+
+def _stack_entries(profiles):
+    """(processus, thread, pile, poids en secondes) de chaque pile des profils"""
+    for profile in profiles:
+        weight = profile['seconds'] / profile['sample_count'] if profile['sample_count'] else profile['interval']
+        for entry in profile['stacks']:
+            stack = tuple(tuple(func) for func in entry['frames'])
+            yield profile['process'], entry['thread'], stack, entry['count'], weight
+
+
+def collapsed_stacks(profiles):
+    """
+    Piles repliées (une ligne par pile : 'processus;thread;f1;f2 nombre')
+
+    Format lu par flamegraph.pl, speedscope et inferno.
+    """
+    lines = {}
+    for process, thread, stack, count, _ in _stack_entries(profiles):
+        line = ';'.join([process, thread] + [frame_label(func) for func in stack])
+        lines[line] = lines.get(line, 0) + count
+    return ''.join(f'{line} {count}\n' for line, count in sorted(lines.items()))
+
+
+def pstats_data(profiles):
+    """
+    Profils au format de pstats (marshal), chargeable par pstats.Stats
+
+    Chaque relevé compte pour un « appel » ; le temps propre d'une fonction
+    est celui où elle était en haut de la pile, son temps cumulé celui où
+    elle y figurait.
+    """
+    stats = {}
+
+    def add(func, calls, own, cumulative, caller=None):
+        cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+        if caller is not None:
+            c_cc, c_nc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+            callers[caller] = (c_cc + calls, c_nc + calls, c_tt + own, c_ct + cumulative)
+        stats[func] = (cc + calls, nc + calls, tt + own, ct + cumulative, callers)
+
+    for _, _, stack, count, weight in _stack_entries(profiles):
+        seconds = count * weight
+        seen = set()
+        for index, func in enumerate(stack):
+            own = seconds if index == len(stack) - 1 else 0.0
+            caller = stack[index - 1] if index else None
+            # Récursion : ne compter le temps cumulé qu'une fois par pile
+            cumulative = seconds if func not in seen else 0.0
+            seen.add(func)
+            add(func, count, own, cumulative, caller)
+
+    return marshal.dumps(stats)
+
+
+def top_functions(profiles, limit=30):
+    """Fonctions les plus présentes : temps propre et cumulé (secondes, part des relevés)"""
+    own, cumulative = {}, {}
+    total = 0.0
+    for _, _, stack, count, weight in _stack_entries(profiles):
+        seconds = count * weight
+        total += seconds
+        if stack:
+            own[stack[-1]] = own.get(stack[-1], 0.0) + seconds
+        for func in set(stack):
+            cumulative[func] = cumulative.get(func, 0.0) + seconds
+    ranked = sorted(cumulative, key=lambda func: (own.get(func, 0.0), cumulative[func]), reverse=True)
+    return [
+        {
+            'function': frame_label(func),
+            'own_seconds': round(own.get(func, 0.0), 3),
+            'cumulative_seconds': round(cumulative[func], 3),
+            'own_percent': round(100 * own.get(func, 0.0) / total, 1) if total else 0.0
+        }
+        for func in ranked[:limit]
+    ]
+
+
+# ============================================
+# MÉMOIRE
+# ============================================
+
+def memory_diff(snapshot, base=None, group_by='lineno', limit=20):
+    """
+    Plus grosses allocations d'un instantané tracemalloc, ou évolution depuis `base`
+
+    Args:
+        snapshot (tracemalloc.Snapshot): Instantané à analyser
+        base (tracemalloc.Snapshot): Instantané de référence (même processus)
+        group_by (str): lineno, filename ou traceback
+
+    Returns:
+        list: [{location, size, count, size_diff, count_diff}, ...]
+    """
+    filters = [tracemalloc.Filter(False, pattern) for pattern in MEMORY_IGNORED]
+    snapshot = snapshot.filter_traces(filters)
+    if base is not None:
+        stats = snapshot.compare_to(base.filter_traces(filters), group_by)
+    else:
+        stats = snapshot.statistics(group_by)
+
+    result = []
+    for stat in stats[:limit]:
+        # Du plus ancien au plus récent : l'allocation elle-même est le dernier
+        frames = [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback]
+        entry = {
+            'location': frames[-1] if frames else '?',
+            'size': stat.size,
+            'count': stat.count,
+        }
+        if base is not None:
+            entry['size_diff'] = stat.size_diff
+            entry['count_diff'] = stat.count_diff
+        if group_by == 'traceback':
+            entry['traceback'] = frames
+        result.append(entry)
+    return result
+
+
+# ============================================
+# COMMANDES (API ↔ WORKERS)
+# ============================================
+
+def issue_command(store, action, **params):
+    """
+    Publie une commande de profilage pour tous les processus
+
+    Args:
+        action (str): cpu_start, cpu_stop, memory_snapshot ou memory_stop
+
+    Returns:
+        dict: La commande (avec son numéro 'id')
+    """
+    pruned = []
+
+    def change(log):
+        log = command_log(log)
+        command = {
+            'id': log['last_id'] + 1,
+            'action': action,
+            'params': params,
+            'issued_at': time.time()
+        }
+        log['commands'].append(command)
+        log['last_id'] = command['id']
+        pruned.extend(old['id'] for old in log['commands'][:-COMMANDS_KEEP])
+        log['commands'] = log['commands'][-COMMANDS_KEEP:]
+        return log
+
+    log = store.update_value(KEY, change, None)
+    # Les réponses des commandes sorties du journal ne sont plus consultées
+    for command_id in pruned:
+        store.set_value(RESULTS_KEY.format(command_id), None)
+    return log['commands'][-1]
+
+
+def command_log(value):
+    """Journal des commandes {'last_id', 'commands'} (vide, ou ancienne commande unique)"""
+    if not value:
+        return {'last_id': 0, 'commands': []}
+    if 'commands' not in value:
+        return {'last_id': value['id'], 'commands': []}
+    return value
+
+
+def find_command(store, command_id):
+    """Commande encore présente dans le journal, ou None"""
+    for command in command_log(store.get_value(KEY))['commands']:
+        if command['id'] == command_id:
+            return command
+    return None
+
+
+def command_results(store, command_id):
+    """Processus ayant exécuté une commande : {processus: résultat}"""
+    return store.get_value(RESULTS_KEY.format(command_id)) or {}
+
+
+def prune_profiles(profiles_dir, keep):
+    """Ne garde que les `keep` fichiers de profil les plus récents"""
+    files = sorted(Path(profiles_dir).glob('*-*-*.*'), key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+class ProfilingAgent:
+    """Exécute dans un processus (API ou worker) les commandes de profilage publiées dans la queue"""
+
+    def __init__(self, store, process, profiles_dir, poll_interval=1.0):
+        """
+        Args:
+            store (JobStore): Queue persistante (commandes et réponses)
+            process (str): Nom du processus (api, worker-1...)
+            profiles_dir (Path): Dossier des profils et instantanés
+        """
+        self.store = store
+        self.process = process
+        self.profiles_dir = Path(profiles_dir)
+        self.poll_interval = poll_interval
+        self.profiler = None
+        self._lock = threading.Lock()
+        self._thread = None
+        # Un processus (re)lancé n'exécute pas les commandes publiées avant lui
+        self._last_id = command_log(store.get_value(KEY))['last_id']
+
+    def profile_path(self, kind, command_id, process=None):
+        suffix = 'json' if kind == 'cpu' else 'snapshot'
+        return self.profiles_dir / f'{kind}-{command_id}-{process or self.process}.{suffix}'
+
+    def _report(self, command_id, **result):
+        result.update(pid=os.getpid(), at=datetime.now().isoformat())
+
+        def change(results):
+            results[self.process] = result
+            return results
+        self.store.update_value(RESULTS_KEY.format(command_id), change, {})
+
+    def poll(self):
+        """Exécute dans l'ordre les commandes publiées depuis la dernière lecture"""
+        with self._lock:
+            log = command_log(self.store.get_value(KEY))
+            for command in log['commands']:
+                if command['id'] <= self._last_id:
+                    continue
+                self._last_id = command['id']
+                try:
+                    getattr(self, '_' + command['action'])(command)
+                except Exception as e:
+                    log_message('ERROR', f"Profilage ({command['action']}) impossible: {e}")
+                    self._report(command['id'], error=str(e))
+            self._last_id = max(self._last_id, log['last_id'])
+
+    def _cpu_start(self, command):
+        if self.profiler is not None and self.profiler.running():
+            self.profiler.stop()
+        params = command['params']
+        # Temps restant : un worker peut recevoir la commande avec un peu de retard
+        remaining = command['issued_at'] + params['duration'] - time.time()
+        if remaining <= 0:
+            return
+        command_id = command['id']
+        path = self.profile_path('cpu', command_id)
+
+        def done(profiler):
+            self.profiles_dir.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(profiler.to_dict(self.process)))
+            self._report(command_id, file=path.name, samples=profiler.sample_count,
+                         seconds=round(profiler.elapsed, 3))
+
+        self.profiler = SamplingProfiler(params['interval'], params.get('threads'))
+        self.profiler.start(remaining, on_done=done)
+        self._report(command_id, running=True)
+
+    def _cpu_stop(self, command):
+        if self.profiler is not None and self.profiler.running():
+            self.profiler.stop()
+
+    def _memory_snapshot(self, command):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(command['params']['frames'])
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        path = self.profile_path('memory', command['id'])
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        snapshot.dump(str(path))
+        self._report(command['id'], file=path.name, traced_bytes=current, peak_bytes=peak)
+
+    def _memory_stop(self, command):
+        tracemalloc.stop()
+        self._report(command['id'], stopped=True)
+
+    def start(self):
+        """Surveille les commandes dans un thread séparé"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name=f'{self.process}-profiling', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                log_message('WARNING', f"Lecture des commandes de profilage impossible: {e}")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+retry_policy.py - Nouvelles tentatives et disjoncteur du moteur de téléchargement
+
+FONCTIONNALITÉ:
+  - Classe les erreurs yt-dlp : temporaires (réseau, 5xx), limitation de
+    débit (429, vérification anti-bot) ou définitives (vidéo privée,
+    supprimée, URL invalide...)
+  - Délai de nouvelle tentative exponentiel avec gigue ("full jitter")
+  - Disjoncteur global : après une série d'échecs, la distribution des jobs
+    est suspendue un temps, puis un seul job sert de test avant de reprendre
+  - L'état du disjoncteur est stocké dans la queue persistante : il est
+    partagé par tous les workers (threads ou processus)
+"""
+
+import random
+import re
+import time
+
+
+# Classes d'erreurs
+TRANSIENT = 'transient'
+THROTTLED = 'throttled'
+PERMANENT = 'permanent'
+
+PERMANENT_PATTERNS = re.compile('|'.join([
+    r'video unavailable',
+    r'private video',
+    r'this video is not available',
+    r'video has been removed',
+    r'account associated with this video has been terminated',
+    r'confirm your age',
+    r'members[- ]only',
+    r'copyright',
+    r'unsupported url',
+    r'is not a valid url',
+    r'no video formats found',
+    r'requested format is not available',
+    r'http error 404',
+    r'http error 410',
+    r'url manquante',
+]), re.IGNORECASE)
+
+THROTTLED_PATTERNS = re.compile('|'.join([
+    r'http error 429',
+    r'too many requests',
+    r'rate[- ]limit',
+    r'not a bot',
+]), re.IGNORECASE)
+
+
+def classify_error(message):
+    """
+    Classe un message d'erreur
+
+    Les erreurs inconnues sont considérées temporaires : une piste n'est
+    abandonnée que sur une erreur reconnue comme définitive ou après
+    épuisement des tentatives.
+    """
+    message = message or ''
+    if THROTTLED_PATTERNS.search(message):
+        return THROTTLED
+    if PERMANENT_PATTERNS.search(message):
+        return PERMANENT
+    return TRANSIENT
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    """
+    Délai avant la tentative suivante (secondes)
+
+    Exponentiel plafonné, tiré uniformément entre base et la borne pour
+    que les jobs en échec ne repartent pas tous en même temps.
+
+    Args:
+        attempt (int): Nombre de tentatives déjà échouées (1 pour la première)
+    """
+    ceiling = min(cap, base * 2 ** max(0, attempt - 1))
+    return rng.uniform(min(base, ceiling), ceiling)
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur partagé : suspend la distribution des jobs après trop d'échecs
+
+    États :
+      closed    : distribution normale, les échecs consécutifs sont comptés
+      open      : distribution suspendue jusqu'à 'open_until'
+      half_open : un seul job de test ; succès → closed, échec → open
+                  avec un temps de pause doublé ; sans verdict (échec
+                  définitif, annulation...), le job de test est libéré et
+                  le prochain worker en obtient un autre
+    """
+
+    KEY = 'circuit_breaker'
+
+    def __init__(self, store, failure_threshold=5, cooldown=60, max_cooldown=1800):
+        """
+        Args:
+            store (JobStore): Queue persistante (état partagé)
+            failure_threshold (int): Échecs consécutifs avant ouverture
+            cooldown (int): Première pause (secondes)
+            max_cooldown (int): Pause maximale (secondes)
+        """
+        self.store = store
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+    @staticmethod
+    def _initial():
+        return {'state': 'closed', 'failures': 0, 'open_until': 0, 'openings': 0, 'probe': None}
+
+    def _update(self, change):
+        return self.store.update_value(self.KEY, change, self._initial())
+
+    def status(self):
+        state = self.store.get_value(self.KEY) or self._initial()
+        state['retry_in'] = max(0, round(state['open_until'] - time.time())) if state['state'] == 'open' else 0
+        return state
+
+    def allow(self, worker):
+        """
+        Le worker peut-il réserver un job maintenant ?
+
+        Passe de open à half_open à la fin de la pause : seul le premier
+        worker qui le demande obtient le job de test. L'état partagé n'est
+        écrit qu'à ce changement (pas à chaque interrogation).
+        """
+        state = self.store.get_value(self.KEY) or self._initial()
+        if state['state'] == 'closed':
+            return True
+        if state['state'] == 'half_open' and state['probe'] == worker:
+            return True
+        if not self._probe_available(state):
+            return False
+
+        allowed = [False]
+
+        def change(state):
+            # Revérifié dans la transaction : un autre worker a pu prendre le job de test
+            if self._probe_available(state):
+                state['state'] = 'half_open'
+                state['probe'] = worker
+                allowed[0] = True
+            return state
+
+        self._update(change)
+        return allowed[0]
+
+    @staticmethod
+    def _probe_available(state):
+        """Pause terminée, ou job de test libéré sans verdict"""
+        if state['state'] == 'open':
+            return time.time() >= state['open_until']
+        return state['state'] == 'half_open' and state['probe'] is None
+
+    def release_probe(self, worker):
+        """
+        Job du worker terminé : s'il était le job de test et n'a donné ni
+        succès ni échec temporaire (échec définitif, annulation, job bloqué),
+        un autre worker pourra réserver le prochain job de test
+        """
+        state = self.store.get_value(self.KEY)
+        if state is None or state['state'] != 'half_open' or state['probe'] != worker:
+            return
+
+        def change(state):
+            if state['state'] == 'half_open' and state['probe'] == worker:
+                state['probe'] = None
+            return state
+
+        self._update(change)
+
+    def wait_time(self):
+        """Secondes avant la fin de la pause (0 si le disjoncteur n'est pas ouvert)"""
+        return self.status()['retry_in']
+
+    def record_success(self):
+        state = self.store.get_value(self.KEY)
+        if state is None or (state['state'] == 'closed' and not state['failures']):
+            return  # Cas courant : rien à écrire
+
+        def change(state):
+            if state['state'] != 'closed' or state['failures']:
+                state.update(self._initial())
+            return state
+        self._update(change)
+
+    def record_failure(self):
+        """
+        Compte un échec temporaire
+
+        Returns:
+            bool: True si le disjoncteur vient de s'ouvrir
+        """
+        opened = [False]
+
+        def change(state):
+            state['failures'] += 1
+            if state['state'] == 'half_open' or (
+                state['state'] == 'closed' and state['failures'] >= self.failure_threshold
+            ):
+                state['openings'] += 1
+                pause = min(self.max_cooldown, self.cooldown * 2 ** (state['openings'] - 1))
+                state['state'] = 'open'
+                state['open_until'] = time.time() + pause
+                state['probe'] = None
+                opened[0] = True
+            return state
+
+        self._update(change)
+        return opened[0]
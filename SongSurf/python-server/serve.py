@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+serve.py - Lancement de SongSurf en production
+
+FONCTIONNALITÉ:
+  - Sert l'API Flask avec waitress (serveur WSGI multi-threads)
+  - Fait tourner le moteur de téléchargement/organisation dans des
+    processus workers séparés : une conversion FFmpeg ou un tagging
+    lourd ne ralentit plus l'API
+  - API et workers ne communiquent que par la queue persistante (SQLite)
+  - Un worker mort ou muet (plus de battement de cœur) est relancé et
+    son job remis en queue
+  - Un worker recyclé (trop de jobs ou trop de mémoire) termine son job
+    en cours, s'arrête, et un processus neuf le remplace
+  - Mode adaptatif (--adaptive) : --workers devient la concurrence maximale,
+    le nombre de jobs simultanés est ajusté selon le débit, les latences
+    et les erreurs (voir concurrency.py)
+
+UTILISATION:
+  python serve.py [--workers 2] [--threads 16] [--max-jobs 200] [--max-rss-mb 512]
+                  [--adaptive [--min-workers 1]] [--host localhost] [--port 8080]
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+
+import config
+from config import log_message
+from engine import worker_main
+from concurrency import ConcurrencyController
+
+
+class WorkerPool:
+    """Processus workers qui traitent la queue persistante"""
+
+    MONITOR_INTERVAL = 1  # Secondes entre deux vérifications des processus
+
+    def __init__(self, store, size, max_connections, max_jobs=None, max_rss_bytes=None):
+        """
+        Args:
+            store (JobStore): Queue persistante (pour remettre en queue les jobs d'un worker mort)
+            size (int): Nombre de processus workers
+            max_connections (int): Plafond de connexions HTTP de chaque worker
+            max_jobs (int): Jobs traités avant recyclage d'un worker
+            max_rss_bytes (int): Mémoire résidente au-delà de laquelle un worker est recyclé
+        """
+        self.store = store
+        self.size = size
+        self.max_connections = max_connections
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_bytes
+        self.recycled = 0
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = {}
+        self._spawned_at = {}
+        self._stopping = False
+
+    def _spawn(self, name):
+        process = self._context.Process(
+            target=worker_main,
+            args=(name, self.max_connections, self.max_jobs, self.max_rss_bytes),
+            name=name, daemon=True
+        )
+        process.start()
+        self._processes[name] = process
+        self._spawned_at[name] = time.time()
+        log_message('INFO', f'Worker démarré: {name} (pid {process.pid})')
+
+    def start(self):
+        for index in range(1, self.size + 1):
+            self._spawn(f'worker-{index}')
+        threading.Thread(target=self._monitor, name='worker-monitor', daemon=True).start()
+
+    def _kill_unresponsive(self):
+        """Tue les workers vivants qui ne publient plus de battement de cœur (bloqués)"""
+        now = time.time()
+        for worker in self.store.workers():
+            process = self._processes.get(worker['name'])
+            if process is None or not process.is_alive() or worker['pid'] != process.pid:
+                continue
+            if now - self._spawned_at[worker['name']] < config.WORKER_HEARTBEAT_TIMEOUT:
+                continue
+            if now - (worker['heartbeat_at'] or 0) > config.WORKER_HEARTBEAT_TIMEOUT:
+                log_message('ERROR', f"🐕 Worker {worker['name']} sans battement de cœur, arrêt forcé", {
+                    'pid': process.pid,
+                    'job_id': worker['job_id']
+                })
+                process.kill()
+
+    def _monitor(self):
+        while not self._stopping:
+            time.sleep(self.MONITOR_INTERVAL)
+            try:
+                self._kill_unresponsive()
+            except Exception as e:
+                log_message('WARNING', f"Surveillance des workers impossible: {e}")
+            for name, process in list(self._processes.items()):
+                if process.is_alive() or self._stopping:
+                    continue
+                requeued = self.store.requeue_worker(name)
+                if process.exitcode == 0:
+                    # Recyclage volontaire : le job en cours était terminé
+                    self.recycled += 1
+                    log_message('INFO', f'♻️ Worker {name} recyclé, nouveau processus')
+                else:
+                    log_message('ERROR', f'Worker {name} arrêté (code {process.exitcode}), relance', {
+                        'requeued_jobs': requeued
+                    })
+                self._spawn(name)
+
+    def stop(self):
+        self._stopping = True
+        for process in self._processes.values():
+            process.terminate()
+        for process in self._processes.values():
+            process.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SongSurf - serveur de production')
+    parser.add_argument('--workers', type=int, default=config.WORKER_PROCESSES, help='Processus workers')
+    parser.add_argument('--threads', type=int, default=config.SERVER_THREADS, help='Threads HTTP')
+    parser.add_argument('--max-jobs', type=int, default=config.WORKER_MAX_JOBS,
+                        help='Jobs avant recyclage d\'un worker (0 = jamais)')
+    parser.add_argument('--max-rss-mb', type=int, default=config.WORKER_MAX_RSS_BYTES // 1024 ** 2,
+                        help='Mémoire (Mo) au-delà de laquelle un worker est recyclé (0 = jamais)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Ajuster le nombre de jobs simultanés entre --min-workers et --workers')
+    parser.add_argument('--min-workers', type=int, default=config.MIN_CONCURRENCY,
+                        help='Concurrence minimale en mode adaptatif')
+    parser.add_argument('--host', default=config.HOST)
+    parser.add_argument('--port', type=int, default=config.PORT)
+    args = parser.parse_args()
+
+    try:
+        from waitress import serve
+    except ImportError:
+        print("❌ waitress n'est pas installé : pip install -r requirements.txt")
+        raise SystemExit(1)
+
+    import app as api
+    api.HOST, api.PORT = args.host, args.port
+
+    mode = f'{args.min_workers}-{args.workers} worker(s) adaptatif' if args.adaptive else f'{args.workers} worker(s)'
+    api.print_banner(f'production ({mode}, {args.threads} threads HTTP)')
+    api.start_services()
+
+    if args.adaptive:
+        controller = ConcurrencyController(
+            api.job_store,
+            min_limit=args.min_workers,
+            max_limit=max(1, args.workers),
+            interval=config.ADAPTIVE_INTERVAL,
+            backoff=config.ADAPTIVE_BACKOFF,
+            max_load=config.ADAPTIVE_MAX_LOAD,
+            min_gain=config.ADAPTIVE_MIN_GAIN,
+            breaker=api.breaker
+        )
+        controller.start()
+
+    # Le plafond global de connexions est réparti entre les workers
+    pool = WorkerPool(
+        api.job_store, max(1, args.workers),
+        max_connections=max(1, config.MAX_CONNECTIONS // max(1, args.workers)),
+        max_jobs=args.max_jobs or None,
+        max_rss_bytes=args.max_rss_mb * 1024 ** 2 or None
+    )
+    pool.start()
+
+    try:
+        # Chaque connexion /events occupe un thread : en prévoir assez
+        serve(api.app, host=args.host, port=args.port, threads=args.threads, channel_timeout=120)
+    finally:
+        print("\n⏹️  Arrêt des workers...")
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
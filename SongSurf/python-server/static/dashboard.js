@@ -12,6 +12,7 @@ document.addEventListener('DOMContentLoaded', () => {
   console.log('🎵 Dashboard SongSurf initialisé');
   loadData();
   loadLibrary();
+  subscribeToEvents();
 });
 
 async function loadData() {
@@ -42,6 +43,25 @@ function updateStatus(status) {
   console.log('📊 Status:', status);
 }
 
+// Événements temps réel : la bibliothèque est rechargée à chaque morceau terminé
+function subscribeToEvents() {
+  if (typeof EventSource === 'undefined') return;
+  
+  const source = new EventSource(`${API_BASE}/events`);
+  
+  source.addEventListener('status', (e) => updateStatus(JSON.parse(e.data)));
+  
+  source.addEventListener('job_completed', (e) => {
+    console.log('✅ Job terminé:', JSON.parse(e.data));
+    loadData();
+    loadLibrary();
+  });
+  
+  source.onerror = () => {
+    console.warn('⚠️ Flux /events interrompu, reconnexion automatique...');
+  };
+}
+
 async function loadLibrary() {
   try {
     const response = await fetch(`${API_BASE}/api/library`);
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tracing.py - Chronologie des étapes d'un job
+
+FONCTIONNALITÉ:
+  - Chaque étape d'un job (attente en queue, extraction yt-dlp, transfert
+    réseau, conversion FFmpeg, pochette Pillow, tags, déplacement) est
+    enregistrée avec son heure de début et sa durée
+  - La chronologie est gardée avec le job dans la queue persistante
+    (toutes tentatives confondues) : /api/jobs/<id> et export en JSON lines
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class StageTrace:
+    """Étapes chronométrées d'une tentative de job"""
+
+    def __init__(self, **fields):
+        """
+        Args:
+            **fields: Champs ajoutés à chaque étape (attempt, worker...)
+        """
+        self.fields = fields
+        self.spans = []
+
+    def add(self, stage, started_at, seconds):
+        """
+        Ajoute une étape déjà mesurée
+
+        Args:
+            started_at (float): Début (timestamp)
+            seconds (float): Durée
+        """
+        self.spans.append({
+            'stage': stage,
+            'started_at': datetime.fromtimestamp(started_at).isoformat(),
+            'seconds': round(max(0.0, seconds), 4),
+            **self.fields
+        })
+
+    @contextmanager
+    def span(self, stage):
+        """Chronomètre le bloc comme une étape (enregistrée même en cas d'erreur)"""
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, started_at, time.perf_counter() - started)
+
+    def durations(self):
+        """Durée totale par étape : {étape: secondes}"""
+        return stage_durations(self.spans)
+
+
+def stage_durations(spans):
+    """Durée totale par étape d'une liste d'étapes (toutes tentatives)"""
+    totals = {}
+    for span in spans or []:
+        totals[span['stage']] = round(totals.get(span['stage'], 0) + span['seconds'], 4)
+    return totals